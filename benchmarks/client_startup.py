@@ -0,0 +1,91 @@
+"""
+Startup budget for the CXS client.
+
+Measures, in fresh interpreters:
+- the time to import `cxs.core.client.cxs_client`
+- the latency of the first event, from creating the client to the event being accepted by a local endpoint.
+  This includes the deferred imports (aiohttp, the SemanticEvent models) and starting the client.
+
+Usage:
+    python benchmarks/client_startup.py [--runs 5]
+
+Exits with a non-zero status when the median of a measure exceeds its budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORT_BUDGET_MS = 150.0
+FIRST_EVENT_BUDGET_MS = 1000.0
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import cxs.core.client.cxs_client
+print((time.perf_counter() - started) * 1000)
+"""
+
+FIRST_EVENT_SCRIPT = """
+import asyncio
+import time
+import uuid
+
+async def respond(reader, writer):
+    while (await reader.readline()) not in (b"\\r\\n", b""):
+        pass
+    writer.write(b"HTTP/1.1 200 OK\\r\\nContent-Length: 0\\r\\nConnection: close\\r\\n\\r\\n")
+    await writer.drain()
+    writer.close()
+
+async def main():
+    server = await asyncio.start_server(respond, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    started = time.perf_counter()
+    from cxs.core.client.cxs_client import CXSClient
+    client = CXSClient(write_key="benchmark", endpoint=f"http://127.0.0.1:{port}/v1", log_file_path=None, send_interval=0.05)
+    from cxs.schema.pydantic.semantic_event import EventType
+    event = await client._send_event(EventType.track, {"type": "track", "event": "Benchmark Event", "entity_gid": str(uuid.uuid4())})
+    elapsed = (time.perf_counter() - started) * 1000
+
+    await client.close()
+    server.close()
+    assert event is not None, "The first event was not sent"
+    print(elapsed)
+
+asyncio.run(main())
+"""
+
+
+def measure(script: str, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    within_budget = True
+    for name, script, budget in (
+        ("import", IMPORT_SCRIPT, IMPORT_BUDGET_MS),
+        ("first event", FIRST_EVENT_SCRIPT, FIRST_EVENT_BUDGET_MS),
+    ):
+        timings = measure(script, args.runs)
+        median = statistics.median(timings)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        print(f"{name:<12} median {median:8.1f} ms  min {min(timings):8.1f} ms  budget {budget:8.1f} ms  {status}")
+        within_budget = within_budget and median <= budget
+    return 0 if within_budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
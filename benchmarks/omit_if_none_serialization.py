@@ -0,0 +1,65 @@
+"""
+Serialization cost of the CXSBase children of a SemanticEvent (Product, Involved, Classification, ...).
+
+Measures per instance:
+- the OmitIfNone field lookup: rebuilt from the field metadata (as every serialization used to) and cached per class
+- `model_dump` of a single Product and Involved
+and `model_dump(mode="json")` of an event with many products, per event.
+
+Usage:
+    python benchmarks/omit_if_none_serialization.py [--number 2000] [--repeat 5] [--products 200]
+
+Prints the best time of each measure in microseconds.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from cxs.schema.pydantic.base import OmitIfNone, omit_if_none_fields  # noqa: E402
+from cxs.schema.pydantic.semantic_event import Involved, Product, SemanticEvent  # noqa: E402
+
+ENTITY_GID = "4f1b2c3d-0000-4000-8000-000000000001"
+
+PRODUCT = {"entry_type": "Line Item", "product_id": "p1", "sku": "SKU-1", "product": "Coffee", "units": 2.0, "unit_price": 4.5}
+INVOLVED = {"label": "Jane Doe", "role": "Buyer", "entity_type": "Person", "entity_gid": ENTITY_GID, "id": "c-1"}
+
+
+def rebuild_fields(model_cls) -> set:
+    return {k for k, v in model_cls.model_fields.items() if any(isinstance(m, OmitIfNone) for m in v.metadata)}
+
+
+def best(statement, number: int, repeat: int) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--products", type=int, default=200)
+    args = parser.parse_args()
+
+    product, involved = Product(**PRODUCT), Involved(**INVOLVED)
+    event = SemanticEvent(
+        type="track", event="Order Completed", timestamp="2024-01-01T12:00:00+00:00", entity_gid=ENTITY_GID,
+        commerce={"order_id": "order-1", "products": [PRODUCT] * args.products}, involves=[INVOLVED] * 10,
+    )
+    per_instance = {
+        "field set, rebuilt (Product)": lambda: rebuild_fields(Product),
+        "field set, cached (Product)": lambda: omit_if_none_fields(Product),
+        "model_dump, Product": product.model_dump,
+        "model_dump, Involved": involved.model_dump,
+    }
+    for name, statement in per_instance.items():
+        print(f"{name:<36} {best(statement, args.number, args.repeat):8.2f} us/instance")
+
+    number = max(args.number // args.products, 10)
+    dump = lambda: event.model_dump(mode="json", by_alias=True, exclude_none=True)  # noqa: E731
+    print(f"{f'model_dump, event with {args.products} products':<36} {best(dump, number, args.repeat):8.1f} us/event")
+
+
+if __name__ == "__main__":
+    main()
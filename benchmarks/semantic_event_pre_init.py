@@ -0,0 +1,90 @@
+"""
+Construction cost of SemanticEvent.
+
+Measures `SemanticEvent.pre_init` alone, the full construction (pre_init and validation), the
+trusted construction without validation (`SemanticEvent.from_trusted`, rows only) and a lazy view
+reading `event`, `timestamp`, `entity_gid` and `metrics` (`SemanticEvent.lazy`) for:
+- flat rows, as read back from ClickHouse (dotted keys for the context objects and the Nested groups)
+- nested input, as sent by clients (no dotted keys)
+
+Usage:
+    python benchmarks/semantic_event_pre_init.py [--number 2000] [--repeat 5]
+
+Prints the best per-event time of each measure in microseconds.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from cxs.schema.pydantic.semantic_event import SemanticEvent  # noqa: E402
+
+ENTITY_GID = "4f1b2c3d-0000-4000-8000-000000000001"
+EVENT_GID = "4f1b2c3d-0000-4000-8000-000000000002"
+
+FLAT_ROW = {
+    "type": "track", "event": "Order Completed", "timestamp": "2024-01-01T12:00:00+00:00",
+    "entity_gid": ENTITY_GID, "event_gid": EVENT_GID, "message_id": "msg-1",
+    "source.type": "Web", "source.label": "Storefront",
+    "app.name": "orders", "app.namespace": "commerce", "app.version": "2.4.1", "app.build": "1187",
+    "context.ip": "10.0.0.1", "context.locale": "is-IS", "context.timezone": "Atlantic/Reykjavik",
+    "library.name": "python-cxs-client", "library.version": "0.1.0",
+    "os.name": "Linux", "os.version": "6.1",
+    "page.url": "https://shop.example.com/checkout", "page.path": "/checkout", "page.title": "Checkout",
+    "device.type": "desktop", "device.manufacturer": "Apple", "device.model": "MacBookPro18,1",
+    "traits.email": "jane@example.com", "traits.name": "Jane Doe",
+    "commerce.order_id": "order-1", "commerce.revenue": 120.0, "commerce.currency": "ISK",
+    "commerce.products.product_id": ["p1", "p2"], "commerce.products.units": [1.0, 2.0],
+    "involves.label": ["Jane Doe"], "involves.role": ["Buyer"], "involves.entity_type": ["Person"],
+    "involves.entity_gid": [ENTITY_GID], "involves.id": ["c-1"], "involves.id_type": ["CRM"],
+    "classification.type": ["Intent"], "classification.value": ["buy"], "classification.reasoning": [""],
+    "classification.score": [0.5], "classification.confidence": [0.9], "classification.weight": [1.0],
+}
+
+NESTED_INPUT = {
+    "type": "track", "event": "Order Completed", "timestamp": "2024-01-01T12:00:00+00:00",
+    "entity_gid": ENTITY_GID, "event_gid": EVENT_GID, "message_id": "msg-1",
+    "app": {"name": "orders", "namespace": "commerce", "version": "2.4.1", "build": "1187"},
+    "context": {"ip": "10.0.0.1", "locale": "is-IS", "timezone": "Atlantic/Reykjavik"},
+    "library": {"name": "python-cxs-client", "version": "0.1.0"},
+    "page": {"url": "https://shop.example.com/checkout", "path": "/checkout", "title": "Checkout"},
+    "commerce": {"order_id": "order-1", "revenue": 120.0, "currency": "ISK",
+                 "products": [{"product_id": "p1", "units": 1.0}, {"product_id": "p2", "units": 2.0}]},
+    "involves": [{"label": "Jane Doe", "role": "Buyer", "entity_type": "Person", "entity_gid": ENTITY_GID,
+                  "id": "c-1", "id_type": "CRM"}],
+    "dimensions": {"channel": "web"}, "metrics": {"items": 3.0},
+}
+
+
+def read_fields(event):
+    return event.event, event.timestamp, event.entity_gid, event.metrics
+
+
+def best_per_event(statement, number: int, repeat: int) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pre_init = SemanticEvent.pre_init
+    measures = {
+        "pre_init, flat row": lambda: pre_init(dict(FLAT_ROW)),
+        "pre_init, nested input": lambda: pre_init(dict(NESTED_INPUT)),
+        "construction, flat row": lambda: SemanticEvent(**FLAT_ROW),
+        "construction, nested input": lambda: SemanticEvent(**NESTED_INPUT),
+        "from_trusted, flat row": lambda: SemanticEvent.from_trusted(FLAT_ROW),
+        "lazy, 4 fields, flat row": lambda: read_fields(SemanticEvent.lazy(FLAT_ROW)),
+        "lazy, 4 fields, nested input": lambda: read_fields(SemanticEvent.lazy(NESTED_INPUT)),
+    }
+    for name, statement in measures.items():
+        print(f"{name:<30} {best_per_event(statement, args.number, args.repeat):8.1f} us/event")
+
+
+if __name__ == "__main__":
+    main()
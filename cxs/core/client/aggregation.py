@@ -0,0 +1,142 @@
+"""
+Client-side pre-aggregation of high-frequency metric events.
+
+`MetricAggregator` folds `track` events carrying `metrics` into one summary event per
+(`event`, `dimensions`) key and tumbling window. Each metric `m` becomes `m_sum`, `m_count`,
+`m_min` and `m_max` on the summary, which links its inputs through `underscore_process`.
+"""
+from __future__ import annotations
+
+import enum
+import math
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Hashable, Iterable, TYPE_CHECKING
+
+from cxs.core.utils.event_utils import calculate_event_id
+
+if TYPE_CHECKING:
+    from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+AGGREGATION_KEY = "aggregation" # Key of the aggregation details in `underscore_process`
+
+
+@dataclass
+class MetricSummary:
+    """
+    The running aggregate of one key in one window.
+    """
+    template: SemanticEvent
+    window_start: float
+    count: int = 0
+    sums: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    minimums: dict[str, float] = field(default_factory=dict)
+    maximums: dict[str, float] = field(default_factory=dict)
+    message_ids: list[str] = field(default_factory=list)
+
+    def add(self, event: SemanticEvent, max_linked_inputs: int) -> None:
+        self.count += 1
+        for name, value in event.metrics.items():
+            if value is None:
+                continue
+            self.sums[name] = self.sums.get(name, 0.0) + value
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.minimums[name] = min(self.minimums.get(name, value), value)
+            self.maximums[name] = max(self.maximums.get(name, value), value)
+        if len(self.message_ids) < max_linked_inputs:
+            self.message_ids.append(event.messageId)
+
+
+class MetricAggregator:
+    """
+    Aggregates metric events over tumbling windows of `window` seconds.
+
+    Only `track` events with metrics are aggregated, restricted to `event_names` when given.
+    Events for different entities or write keys are never folded together.
+    Summaries link at most `max_linked_inputs` input message IDs.
+    """
+
+    def __init__(self, window: float = 10.0, event_names: Iterable[str] | None = None,
+                 max_linked_inputs: int = 100, clock: Callable[[], float] = time.time):
+        self.window = window
+        self.event_names = set(event_names) if event_names is not None else None
+        self.max_linked_inputs = max_linked_inputs
+        self.clock = clock
+        self._open: dict[tuple[Hashable, float], MetricSummary] = {}
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def accepts(self, event: SemanticEvent) -> bool:
+        event_type = event.type.value if isinstance(event.type, enum.Enum) else event.type
+        if event_type != "track" or not event.metrics:
+            return False
+        return self.event_names is None or event.event in self.event_names
+
+    def key(self, event: SemanticEvent) -> Hashable:
+        dimensions = tuple(sorted((event.dimensions or {}).items()))
+        return event.write_key, str(event.entity_gid), event.event, dimensions
+
+    def window_start(self, event: SemanticEvent) -> float:
+        timestamp = event.timestamp.timestamp() if event.timestamp else self.clock()
+        return math.floor(timestamp / self.window) * self.window
+
+    def add(self, event: SemanticEvent) -> None:
+        """
+        Folds an accepted event into the summary of its key and window.
+        """
+        group = (self.key(event), self.window_start(event))
+        summary = self._open.get(group)
+        if summary is None:
+            summary = self._open[group] = MetricSummary(template=event, window_start=group[1])
+        summary.add(event, self.max_linked_inputs)
+
+    def next_deadline(self) -> float | None:
+        """
+        Seconds until the earliest open window closes, None when no window is open.
+        """
+        if not self._open:
+            return None
+        earliest = min(summary.window_start for summary in self._open.values())
+        return max(0.0, earliest + self.window - self.clock())
+
+    def flush(self, force: bool = False) -> list[SemanticEvent]:
+        """
+        Returns the summary events of every closed window, or of every window with `force` (e.g. on shutdown).
+        """
+        now = self.clock()
+        closed = [group for group, summary in self._open.items() if force or summary.window_start + self.window <= now]
+        return [self._summary_event(self._open.pop(group)) for group in closed]
+
+    def _summary_event(self, summary: MetricSummary) -> SemanticEvent:
+        template = summary.template
+        metrics: dict[str, float] = {}
+        for name in summary.sums:
+            metrics[f"{name}_sum"] = summary.sums[name]
+            metrics[f"{name}_count"] = float(summary.counts[name]) # model_copy does not validate, metrics are floats
+            metrics[f"{name}_min"] = summary.minimums[name]
+            metrics[f"{name}_max"] = summary.maximums[name]
+
+        tzinfo = template.timestamp.tzinfo if template.timestamp else None
+        window_start = datetime.fromtimestamp(summary.window_start, tz=tzinfo)
+        window_end = datetime.fromtimestamp(summary.window_start + self.window, tz=tzinfo)
+        aggregation: dict[str, Any] = {
+            "count": summary.count,
+            "window_start": window_start.isoformat(),
+            "window_end": window_end.isoformat(),
+            "message_ids": summary.message_ids,
+        }
+        if summary.count > len(summary.message_ids):
+            aggregation["message_ids_truncated"] = True
+
+        message_id = str(uuid.uuid4())
+        return template.model_copy(deep=True, update={
+            "messageId": message_id,
+            "event_gid": uuid.UUID(calculate_event_id({"messageId": message_id}, template.event, window_start, template.entity_gid)),
+            "timestamp": window_start,
+            "metrics": metrics,
+            "underscore_process": {**(template.underscore_process or {}), AGGREGATION_KEY: aggregation},
+        })
@@ -0,0 +1,149 @@
+"""
+A batching queue for the CXS client.
+
+`BatchingQueue` keeps the subset of the `asyncio.Queue` interface the client uses and adds the
+two primitives the queue processor needs to build batches:
+- `wait_for_batch(max_items, linger, timeout)`: waits until a batch is ready, i.e. `max_items`
+  are queued or the oldest queued item has waited `linger` seconds (Kafka style linger).
+- `drain(max_items, max_bytes)`: takes up to `max_items` items (or about `max_bytes`) in one call.
+Waiting uses a single event that is only set when the waiter has something to re-check, so there
+is no per-item timer or future.
+
+Subclasses change the storage and the order items leave in by overriding `_push`, `_pop` and
+`_oldest_arrival`, and when a batch is due by overriding `_batch_deadline`.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable
+
+
+class BatchingQueue:
+
+    def __init__(self):
+        self._items: deque = deque() # (arrival time, item)
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._batch_threshold = 0 # Queue size that wakes up `wait_for_batch`
+        self._interrupted = False
+
+    # Storage, overridden by subclasses
+
+    def _push(self, item: Any) -> bool:
+        """
+        Stores an item, returns False if the item was refused.
+        """
+        self._items.append((time.monotonic(), item))
+        return True
+
+    def _pop(self) -> Any:
+        return self._items.popleft()[1]
+
+    def _oldest_arrival(self) -> float | None:
+        return self._items[0][0] if self._items else None
+
+    def _batch_deadline(self, linger: float) -> float | None:
+        """
+        When the queued items are due to be sent even if the batch is not full (monotonic time), None when empty.
+        """
+        oldest = self._oldest_arrival()
+        return None if oldest is None else oldest + linger
+
+    # asyncio.Queue interface
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def put_nowait(self, item: Any) -> None:
+        if not self._push(item):
+            return
+        self._size += 1
+        if self._size == 1:
+            self._not_empty.set()
+            self._wakeup.set() # A new oldest item, the linger deadline changed
+        elif self._size == self._batch_threshold:
+            self._wakeup.set()
+
+    async def put(self, item: Any) -> None:
+        self.put_nowait(item)
+
+    def get_nowait(self) -> Any:
+        if not self._size:
+            raise asyncio.QueueEmpty
+        item = self._pop()
+        self._size -= 1
+        if not self._size:
+            self._not_empty.clear()
+        return item
+
+    async def get(self) -> Any:
+        while not self._size:
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def task_done(self) -> None:
+        pass # Kept for asyncio.Queue compatibility, the client never joins the queue
+
+    # Batching
+
+    def drain(self, max_items: int, max_bytes: int | None = None, size_of: Callable[[Any], int] | None = None) -> list:
+        """
+        Removes and returns up to `max_items` items. With `max_bytes` (and `size_of`), draining stops
+        once the items reach `max_bytes`, so a batch exceeds it by at most one item.
+        """
+        batch = []
+        batch_bytes = 0
+        while self._size and len(batch) < max_items:
+            item = self._pop()
+            self._size -= 1
+            batch.append(item)
+            if max_bytes and size_of:
+                batch_bytes += size_of(item)
+                if batch_bytes >= max_bytes:
+                    break
+        if not self._size:
+            self._not_empty.clear()
+        return batch
+
+    async def wait_for_batch(self, max_items: int, linger: float = 0.0, timeout: float | None = None) -> bool:
+        """
+        Waits until `max_items` are queued or the oldest item has been queued for `linger` seconds.
+        Returns False if no batch is ready after `timeout` seconds or when interrupted.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._interrupted:
+                self._interrupted = False
+                return False
+            if self._size >= max_items:
+                return True
+
+            now = time.monotonic()
+            due = self._batch_deadline(linger)
+            wait = None
+            if due is not None:
+                wait = due - now
+                if wait <= 0:
+                    return True
+            if deadline is not None:
+                if deadline <= now:
+                    return False
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+
+            self._batch_threshold = max_items
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def interrupt(self) -> None:
+        """
+        Makes a pending (or the next) `wait_for_batch` return False, e.g. on shutdown.
+        """
+        self._interrupted = True
+        self._wakeup.set()
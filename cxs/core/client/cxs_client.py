@@ -1,27 +1,69 @@
+from __future__ import annotations
+
 import os
-import platform
 import asyncio
-import aiohttp
+import importlib
 import logging
 import json # Main import for JSON operations
 import sys # For stderr fallback
+import time
+import contextlib
 from datetime import datetime
-from typing import Any # For timestamp type hint
+from typing import Any, Hashable, TYPE_CHECKING
 import uuid
 # Removed duplicate json import from original list
 
-from pydantic import ValidationError
+from cxs.core.client.enrichment import EnrichmentPipeline
+from cxs.core.client.endpoints import EndpointPool
+from cxs.core.client.serialization import COMPRESSORS, SizeEstimator, encode_batch, event_payload, iter_batch
+from cxs.core.client.batching_queue import BatchingQueue
+from cxs.core.client.envelope import ENVELOPE_HEADER
+from cxs.core.client.lanes import PriorityLanes
+from cxs.core.client.tenants import TenantQueues, split_by_tenant
+
+if TYPE_CHECKING:
+    import aiohttp
+    from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType
+
+# aiohttp and the SemanticEvent model graph account for most of the cost of importing the client.
+# They are imported when the client starts (on first use), the names below stay importable from this module.
+_LAZY_ATTRIBUTES = {
+    "SemanticEvent": ("cxs.schema.pydantic.semantic_event", "SemanticEvent"),
+    "EventType": ("cxs.schema.pydantic.semantic_event", "EventType"),
+    "CXSLibrary": ("cxs.schema.pydantic.semantic_event", "Library"),
+    "BaseEventInfo": ("cxs.schema.pydantic.semantic_event", "BaseEventInfo"),
+    "ValidationError": ("pydantic", "ValidationError"),
+    "aiohttp": ("aiohttp", None),
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute) if attribute else module
+
+RETRYABLE_STATUSES = {500, 502, 503, 504, 429} # 429 Too Many Requests is often retryable
+DEFAULT_ENDPOINT = "https://inbox.contextsuite.com/v1"
+
+_shared_clients: dict[Hashable, CXSClient] = {} # Registry key -> shared client, see `CXSClient.shared`
+
+
+def _registry_value(value: Any) -> Hashable:
+    """
+    A hashable stand-in for a client option: containers by content, unhashable objects by identity.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted(((str(k), _registry_value(v)) for k, v in value.items()), key=lambda item: item[0]))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_registry_value(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return "id", id(value)
+    return value
 
-from cxs.schema.pydantic.semantic_event import (
-    SemanticEvent,
-    EventType,
-    Context as CXSContext,
-    Library as CXSLibrary,
-    BaseEventInfo,
-    App as CXSApp,
-    OS as CXSOS,
-    Traits as CXSTraits,
-)
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
@@ -34,42 +76,176 @@ class JsonFormatter(logging.Formatter):
             log_record['event_data'] = record.event_data
         if hasattr(record, 'reason') and record.reason:
             log_record['reason'] = record.reason
-        return json.dumps(log_record)
+        return json.dumps(log_record, default=str) # Raw event payloads may hold datetimes, UUIDs or models
+
+
+class ClientLogger(logging.LoggerAdapter):
+    """
+    A client's view of a shared logger with a fixed name: its records carry the client's id (`client_id`),
+    and the level and handlers set through it apply to the client's own records only. Loggers named per
+    client would stay in the logging registry after the client is closed.
+    """
+
+    def __init__(self, logger: logging.Logger, client_id: str, level: int | str = logging.NOTSET):
+        super().__init__(logger, {"client_id": client_id})
+        self.handlers: list[logging.Handler] = []
+        self.setLevel(level)
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **(kwargs.get("extra") or {})} # Merged, the adapter would replace them
+        return msg, kwargs
+
+    def setLevel(self, level: int | str) -> None:
+        self.level = level if isinstance(level, int) else logging.getLevelName(level)
+
+    def getEffectiveLevel(self) -> int:
+        return self.level or self.logger.getEffectiveLevel()
+
+    def isEnabledFor(self, level: int) -> bool:
+        return level > self.logger.manager.disable and level >= self.getEffectiveLevel()
+
+    def log(self, level, msg, *args, **kwargs):
+        if self.isEnabledFor(level):
+            msg, kwargs = self.process(msg, kwargs)
+            self.logger._log(level, msg, args, **kwargs) # Gated by the client's level, not the shared logger's
+
+    def _own_record(self, record: logging.LogRecord) -> bool:
+        return getattr(record, "client_id", None) == self.extra["client_id"]
+
+    def addHandler(self, handler: logging.Handler) -> None:
+        handler.addFilter(self._own_record)
+        self.logger.addHandler(handler)
+        self.handlers.append(handler)
+
+    def removeHandler(self, handler: logging.Handler) -> None:
+        self.logger.removeHandler(handler)
+        handler.removeFilter(self._own_record)
+        if handler in self.handlers:
+            self.handlers.remove(handler)
+
 
 class CXSClient:
 
-    def __init__(self, write_key: str, endpoint: str = "https://inbox.contextsuite.com/v1", application: str = None,
+    def __init__(self, write_key: str | None, endpoint: str | list[str] = DEFAULT_ENDPOINT, application: str = None,
                  max_batch_size: int = 100, send_interval: float = 10.0,
                  log_file_path: str = "cxs_unsent_events.log", **kwargs: Any):
 
-        # General logger for operational messages
-        # Use a more unique suffix based on object ID if multiple clients can exist, or fixed if singleton.
-        # For this example, using a short UUID suffix.
-        logger_name_suffix = uuid.uuid4().hex[:6]
-        self.logger = logging.getLogger(f"CXSClient_{logger_name_suffix}")
-        self.logger.setLevel(kwargs.get('log_level', logging.INFO)) # Allow configuring log level
+        # General logger for operational messages, all clients log through the "cxs.client" logger
+        # and their records carry a short id of the client (`client_id`).
+        self.client_id = uuid.uuid4().hex[:6]
+        self._registry_key: Hashable | None = None # Set on shared clients, see `shared`
+        self._references = 0
+        self.logger = ClientLogger(logging.getLogger("cxs.client"), self.client_id, kwargs.get('log_level', logging.INFO))
 
         # Basic console handler for self.logger if no other config is set by user (e.g. root logger)
-        if not self.logger.handlers and not logging.getLogger().handlers: # Check root handlers too
+        if not logging.getLogger().handlers:
             ch = logging.StreamHandler(sys.stdout) # Use stdout for info, stderr for errors generally
-            ch.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+            ch.setFormatter(logging.Formatter('%(asctime)s - %(name)s[%(client_id)s] - %(levelname)s - %(message)s'))
             self.logger.addHandler(ch)
-            # Prevent propagation if we add a handler, to avoid duplicate messages if root logger also has handlers
-            self.logger.propagate = False
 
         try:
             self.write_key = write_key
-            self.endpoint = endpoint
+            # A multi-tenant client sends on behalf of many write keys, taken from each event (`write_key`),
+            # falling back to the client's own write_key. Batches never mix tenants and tenants get a fair send share.
+            self.multi_tenant = kwargs.get('multi_tenant', write_key is None)
+            # `endpoint` may be a list of endpoints, requests are routed to them sticky per tenant with failover.
+            # With hedge_requests a slow request gets a second attempt on another endpoint.
+            endpoints = [endpoint] if isinstance(endpoint, str) else list(endpoint)
+            self.endpoint = endpoints[0]
+            self.endpoint_pool = EndpointPool(
+                endpoints,
+                failure_threshold=kwargs.get('endpoint_failure_threshold', 3),
+                cooldown=kwargs.get('endpoint_cooldown', 30.0),
+            )
+            self.hedge_requests = kwargs.get('hedge_requests', False)
+            self.hedge_percentile = kwargs.get('hedge_percentile', 0.95)
             self.client_version = "0.1.0"
             self.max_batch_size = max_batch_size
             self.send_interval = send_interval
 
-            self.event_queue = asyncio.Queue() # Unbounded queue
+            # Deferred validation: build events with model_construct on the caller's path and validate them
+            # in the sender stage (or in `validation_executor`). This implies queued rather than direct sends.
+            self.deferred_validation = kwargs.get('deferred_validation', False)
+            self.validation_executor = kwargs.get('validation_executor')
+            self.direct_send = kwargs.get('direct_send', True) and not self.deferred_validation
+            self._pending_validation: dict[str, dict] = {} # messageId -> raw input of not yet validated events
+
+            # Batches with more than `inline_serialization_max_events` events are serialized (and compressed) in
+            # `serialization_executor` when one is configured, so large batches do not stall the event loop.
+            self.compression = kwargs.get('compression')
+            if self.compression and self.compression not in COMPRESSORS:
+                raise ValueError(f"Unsupported compression '{self.compression}'. Supported: {', '.join(COMPRESSORS)}")
+            self.serialization_executor = kwargs.get('serialization_executor')
+            # With batch_envelope the shared context, app, library, OS and write_key blocks are sent once per batch
+            self.batch_envelope = kwargs.get('batch_envelope', False)
+            # With minimize_payload empty containers and default values are not sent, the server restores them
+            self.minimize_payload = kwargs.get('minimize_payload', False)
+            self.inline_serialization_max_events = kwargs.get('inline_serialization_max_events', 50)
+            # Batches of at least `stream_min_events` events are streamed to the socket as a chunked body, encoded
+            # (and compressed) `stream_chunk_size` bytes at a time instead of in one buffer. Not with batch_envelope.
+            self.stream_min_events = kwargs.get('stream_min_events')
+            self.stream_chunk_size = kwargs.get('stream_chunk_size', 64 * 1024)
+            self.loop_time_stats: dict[str, dict] = {} # stage -> {"seconds": float, "calls": int}
+
+            # Metric events accepted by the aggregator are folded into one summary event per key and window,
+            # summaries are queued by the processor once their window has closed.
+            self.aggregator = kwargs.get('aggregator')
+
+            # Queued events are sent in batches grouped and sorted by (partition, entity_gid, timestamp), under-filled
+            # groups are held back for at most the batcher's max_group_wait.
+            self.partition_batcher = kwargs.get('partition_batcher')
+
+            # The delivery ledger keeps per-interval digests of acknowledged events (and the events themselves, bounded),
+            # see `delivery_digests` and `reconcile`.
+            self.delivery_ledger = kwargs.get('delivery_ledger')
+            # Events re-queued by `reconcile` were enriched, aggregated and routed when first sent, they are
+            # only delivered again: (write key, messageId) of the re-sent events until they are acknowledged
+            self._reconciled: set[tuple[str | None, str]] = set()
+
+            # content values above the offloader's threshold are replaced by hash references and uploaded,
+            # gzipped and deduplicated, to content_endpoint before the events referencing them are sent
+            self.content_offloader = kwargs.get('content_offloader')
+            self.content_endpoint = kwargs.get('content_endpoint', f"{self.endpoint.rstrip('/')}/content")
+
+            # Events accepted by the endpoint are fanned out by the router to the integration sinks they are enabled for
+            self.router = kwargs.get('router')
+
+            # With priority_lanes the queue keeps one lane per event importance. Lanes are drained by weighted priority
+            # and the least important ones are shed first under backpressure (max_queue_size) or while degraded.
+            self.degraded = False
+            self._consecutive_batch_failures = 0
+            self.degraded_after_failures = kwargs.get('degraded_after_failures', 3)
+            self.degraded_min_importance = kwargs.get('degraded_min_importance', 3)
+            if kwargs.get('priority_lanes', False) and self.multi_tenant:
+                # The lanes would replace the per-tenant queues, and with them the tenants' fair share and caps
+                raise ValueError("priority_lanes can not be combined with a multi-tenant client, pass multi_tenant=False")
+            if kwargs.get('priority_lanes', False):
+                self.event_queue = PriorityLanes(
+                    weights=kwargs.get('lane_weights'),
+                    latency_targets=kwargs.get('lane_latency_targets'),
+                    max_size=kwargs.get('max_queue_size', 0),
+                    on_shed=self._on_event_shed,
+                )
+            elif self.multi_tenant:
+                self.event_queue = TenantQueues(
+                    quantum=kwargs.get('tenant_quantum', max_batch_size),
+                    max_size_per_tenant=kwargs.get('max_queue_size_per_tenant', 0),
+                    on_shed=self._on_event_shed,
+                )
+            else:
+                self.event_queue = BatchingQueue() # Unbounded queue
             self._shutdown_event = asyncio.Event()
 
-            # Setup logger for unsent events
-            self.unsent_events_logger = logging.getLogger(f"CXSClientUnsentEvents_{logger_name_suffix}")
-            self.unsent_events_logger.setLevel(logging.WARNING)
+            # A batch is sent once max_batch_size events are queued or the oldest one has waited `linger` seconds
+            # (0: as soon as possible). max_batch_bytes additionally caps batches by their estimated JSON size.
+            self.linger = kwargs.get('linger', 0.0)
+            self.max_batch_bytes = kwargs.get('max_batch_bytes')
+            self._size_estimator = SizeEstimator() # Samples event sizes, serializing every queued event would double the cost
+
+            # Setup logger for unsent events, isolated from the operational messages
+            unsent_events_logger = logging.getLogger("cxs.client.unsent_events")
+            unsent_events_logger.propagate = False
+            self.unsent_events_logger = ClientLogger(unsent_events_logger, self.client_id, logging.WARNING)
 
             if log_file_path: # Only configure file handler if path is provided
                 # Check if a handler for this specific file path already exists
@@ -81,7 +257,11 @@ class CXSClient:
                 )
                 if not handler_exists:
                     try:
-                        fh = logging.FileHandler(log_file_path, mode='a') # Append mode
+                        log_dir = os.path.dirname(os.path.abspath(log_file_path))
+                        if not os.access(log_dir, os.W_OK):
+                            raise PermissionError(f"Directory {log_dir} is not writable")
+                        # The file is only opened when the first unsent event is logged
+                        fh = logging.FileHandler(log_file_path, mode='a', delay=True) # Append mode
                         fh.setFormatter(JsonFormatter())
                         self.unsent_events_logger.addHandler(fh)
                     except (IOError, OSError) as e:
@@ -93,9 +273,9 @@ class CXSClient:
                             self.unsent_events_logger.addHandler(sh)
                             self.logger.warning(f"Logging unsent events to stderr as file logger setup failed for {log_file_path}.")
 
-            self.unsent_events_logger.propagate = False # Isolate this logger
-
-            self.queue_processor_task = asyncio.create_task(self._process_event_queue())
+            # The queue processor task and the HTTP session need a running loop, they are started on first use (see `start`)
+            self.queue_processor_task: asyncio.Task | None = None
+            self._session: aiohttp.ClientSession | None = None
             self.logger.info(f"CXSClient initialized. Max batch: {self.max_batch_size}, Interval: {self.send_interval}s. Unsent events log: '{log_file_path if log_file_path else 'Disabled/Default'}'.")
 
             self.pod_ip = os.getenv('MY_POD_IP', kwargs.get('pod_ip', ''))
@@ -115,10 +295,122 @@ class CXSClient:
         self.app_version = os.getenv('MY_APP_VERSION', kwargs.get('app_version', ''))
         self.app_build = os.getenv('MY_APP_BUILD', kwargs.get('app_build', ''))
 
+        self.library_info = None # Set in `start`, it needs the SemanticEvent models
+
+        # Enrichment runs on whole batches just before serialization. Custom stages passed via
+        # `enrichers` run after the built-in runtime context and event type stages, which are added in `start`.
+        self.enrichment_pipeline = EnrichmentPipeline(
+            kwargs.get('enrichers', []),
+            executor=kwargs.get('enrichment_executor'),
+            logger=self.logger,
+        )
+
+    @classmethod
+    def shared(cls, write_key: str | None, endpoint: str | list[str] = DEFAULT_ENDPOINT, **kwargs: Any) -> CXSClient:
+        """
+        The process-wide client for this write key, endpoint and configuration, created on first use, so
+        libraries sending to the same destination share one queue, task, session and set of loggers.
+        Every call must be paired with a `close()`, the client is only closed when its last user closes it.
+        Clients are shared per event loop (their task and session belong to it), clients of closed loops are dropped.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for stale_key in [key for key in _shared_clients if key[0] is not None and key[0].is_closed()]:
+            _shared_clients.pop(stale_key)._registry_key = None
+        key = (loop, write_key, _registry_value(endpoint), _registry_value(kwargs))
+        client = _shared_clients.get(key)
+        if client is None:
+            client = _shared_clients[key] = cls(write_key, endpoint, **kwargs)
+            client._registry_key = key
+        client._references += 1
+        return client
+
+    @property
+    def started(self) -> bool:
+        return self.queue_processor_task is not None
+
+    def start(self) -> None:
+        """
+        Starts the client: imports the event models, sets up the built-in enrichment stages and spawns the
+        queue processor task. Called on first use; call it explicitly (from a running event loop) to pay
+        the startup cost up front instead of on the first event.
+        """
+        if self.started:
+            return
+
+        from cxs.schema.pydantic.semantic_event import Library as CXSLibrary
+        from cxs.core.client.enrichment import RuntimeContextEnricher, EventTypeEnricher
+
         self.library_info = CXSLibrary(
             name="python-cxs-client",
             version=self.client_version
         )
+        self.enrichment_pipeline.stages[:0] = [
+            RuntimeContextEnricher(
+                library=self.library_info,
+                hostname=self.pod_hostname,
+                pod_ip=self.pod_ip,
+                pod_name=self.pod_name,
+                pod_namespace=self.pod_namespace,
+                app_name=self.app_name,
+                app_namespace=self.app_namespace,
+                app_version=self.app_version,
+                app_build=self.app_build,
+            ),
+            EventTypeEnricher(),
+        ]
+        if self.content_offloader is not None:
+            self.enrichment_pipeline.add_stage(self.content_offloader) # Last, so content set by other stages is offloaded too
+        self.queue_processor_task = asyncio.create_task(self._process_event_queue())
+        if self.router is not None:
+            self.router.start()
+        self.logger.debug("CXSClient started.")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        The HTTP session shared by all requests of this client, created on first use.
+        """
+        if self._session is None or self._session.closed:
+            import aiohttp
+            auth = aiohttp.BasicAuth(self.write_key, self.write_key) if self.write_key else None
+            self._session = aiohttp.ClientSession(auth=auth)
+        return self._session
+
+    def _request_auth(self, write_key: str) -> dict:
+        """
+        Per request auth for events of other tenants, the session authenticates with the client's own write_key.
+        """
+        if not write_key or write_key == self.write_key:
+            return {}
+        import aiohttp
+        return {'auth': aiohttp.BasicAuth(write_key, write_key)}
+
+    @contextlib.contextmanager
+    def _loop_timer(self, stage: str):
+        """
+        Accounts the time spent in a synchronous section that runs on the event loop.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.loop_time_stats.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            stats["seconds"] += time.perf_counter() - started
+            stats["calls"] += 1
+
+    def get_loop_time_stats(self) -> dict:
+        """
+        Returns how much event loop time the client has consumed, per stage and in total.
+        Work offloaded to executors is not counted.
+        """
+        stats = {stage: dict(values) for stage, values in self.loop_time_stats.items()}
+        stats["total"] = {
+            "seconds": sum(values["seconds"] for values in self.loop_time_stats.values()),
+            "calls": sum(values["calls"] for values in self.loop_time_stats.values()),
+        }
+        return stats
 
     def _log_unsent_event(self, level: int, message: str, event_data_dict: dict | None, reason: str):
         """
@@ -148,17 +440,34 @@ class CXSClient:
 
 
     async def _send_event(self, event_type_enum: EventType, event_data: dict, root_event: SemanticEvent = None, **kwargs) -> SemanticEvent | None:
+        import aiohttp
+        from pydantic import ValidationError
+        from cxs.schema.pydantic.semantic_event import SemanticEvent, BaseEventInfo
+        from cxs.core.client.deferred import fast_construct
+
+        self.start()
         semantic_event = None # Ensure semantic_event is defined for the final except block
+        event_input = {**event_data, **kwargs} # Allow kwargs to override event_data
+        write_key = (self.multi_tenant and event_input.get('write_key')) or self.write_key
+        if not write_key:
+            raise ValueError("Events sent through a multi-tenant client without a write_key of its own must have a write_key")
         try:
-            semantic_event = SemanticEvent(**{**event_data, **kwargs}) # Allow kwargs to override event_data
-            semantic_event.type = event_type_enum.value
+            with self._loop_timer("event_construction"):
+                if self.deferred_validation:
+                    semantic_event = fast_construct(event_input) # Validated later, in the sender stage
+                else:
+                    semantic_event = SemanticEvent(**event_input)
+            semantic_event.type = event_type_enum # Assign the enum member, the serializer expects EventType
             semantic_event.library = self.library_info
             semantic_event.timestamp = datetime.now() # this is automatically set, always.
-            semantic_event.write_key = self.write_key
+            semantic_event.write_key = write_key
 
             if not semantic_event.messageId:
                 semantic_event.messageId = str(uuid.uuid4())
 
+            if self.deferred_validation:
+                self._pending_validation[semantic_event.messageId] = event_input
+
             if root_event:
                 semantic_event.base_events = [
                     BaseEventInfo(
@@ -171,40 +480,6 @@ class CXSClient:
                     )
                 ] # Link to the root event if one is provided
 
-            semantic_event.os = CXSOS(
-                name=platform.system(),
-                version=platform.release()
-            ) # Basic OS info
-
-            # Only get the CXSContext values from typical kubernetes environment variables, not from parameters or kwargs
-            semantic_event.context = CXSContext(
-                hostname=self.pod_hostname,
-                pod_ip=self.pod_ip,
-                pod_name=self.pod_name,
-                pod_namespace=self.pod_namespace,
-                application=self.app_name,
-                library=self.library_info
-            )
-            semantic_event.app = CXSApp(
-                name=self.app_name,
-                namespace=self.app_namespace,
-                version=self.app_version,
-                build=self.app_build
-            )
-
-            if event_type_enum == EventType.identify:
-                user_traits = event_data.pop('traits', {})
-                semantic_event.traits = CXSTraits(**user_traits) if isinstance(user_traits, dict) else user_traits
-                semantic_event.event = "User Identified"
-
-            if event_type_enum == EventType.page:
-                semantic_event.event = "Page Viewed"
-                # warning this is a server-side client, page is not a server-side event, so this should hardly be used.
-
-            if event_type_enum == EventType.screen:
-                semantic_event.event = "Screen Viewed"
-                # warning this is a server-side client, screen is not a server-side event, so this should hardly be used.
-
         except ValidationError as e:
             self.logger.error(f"Event data validation failed for event type {event_type_enum.value if event_type_enum else 'unknown'}: {e}", exc_info=True)
             raise # Propagate error to caller, as it's a usage error
@@ -220,33 +495,45 @@ class CXSClient:
             self.logger.error("SemanticEvent object is None before attempting to send, cannot proceed.")
             return None
 
+        if self.aggregator is not None and not self.deferred_validation and self.aggregator.accepts(semantic_event):
+            self.aggregator.add(semantic_event) # Deferred events are aggregated once validated, in the processor
+            return semantic_event
+
+        if not self.direct_send:
+            await self.event_queue.put(semantic_event)
+            return semantic_event
+
+        enriched_events = await self.enrichment_pipeline.run([semantic_event])
+        if not enriched_events:
+            self.logger.debug(f"Event {semantic_event.messageId} was dropped by the enrichment pipeline.")
+            return None
+        semantic_event = enriched_events[0]
+
         try:
-            async with aiohttp.ClientSession(auth=aiohttp.BasicAuth(self.write_key, self.write_key)) as session:
-                async with session.post(
-                    self.endpoint,
-                    json=semantic_event.model_dump(by_alias=True, exclude_none=True),
-                    headers={'Content-Type': 'application/json'}
-                ) as response:
-                    response.raise_for_status() # Raises ClientResponseError for 4xx/5xx
-                    self.logger.info(f"Event {semantic_event.messageId} sent directly.")
-                    return semantic_event
+            await self._upload_content(write_key)
+            await self._deliver(
+                write_key,
+                json=event_payload(semantic_event, self.minimize_payload),
+                headers={'Content-Type': 'application/json'},
+            )
+            self.logger.info(f"Event {semantic_event.messageId} sent directly.")
         except aiohttp.ClientResponseError as http_err: # Raised by response.raise_for_status()
-            retryable_statuses = {500, 502, 503, 504, 429} # 429 Too Many Requests is often retryable
-            if http_err.status in retryable_statuses:
+            if http_err.status in RETRYABLE_STATUSES:
                 self.logger.warning(f"Retryable HTTP error {http_err.status} for event {semantic_event.messageId} ('{http_err.message}'). Queuing event.")
                 await self.event_queue.put(semantic_event)
                 return semantic_event
             else:
                 error_details_text = "No response body"
-                if http_err.response: # Check if response object exists
+                response = getattr(http_err, 'response', None) # aiohttp does not attach the response, other callers may
+                if response: # Check if response object exists
                     try:
-                        error_details_text = await http_err.response.text()
+                        error_details_text = await response.text()
                     except Exception as texterr:
                         self.logger.debug(f"Could not get text from error response for event {semantic_event.messageId}: {texterr}")
 
                 log_message = f"Non-retryable HTTP error for event {semantic_event.messageId}: {http_err.status} - Message: {http_err.message} - Details: {error_details_text}"
                 self.logger.error(log_message)
-                self._log_unsent_event(logging.WARNING, log_message, semantic_event.model_dump(exclude_none=True), 'NonRetryableHTTPError')
+                self._log_unsent_event(logging.WARNING, log_message, self._unsent_event_data(semantic_event), 'NonRetryableHTTPError')
                 return None
         except aiohttp.ClientConnectorError as conn_err: # More specific network error, subclass of ClientError
             self.logger.warning(f"Network connector error for event {semantic_event.messageId} ('{conn_err}'). Queuing event.")
@@ -260,9 +547,252 @@ class CXSClient:
             log_message = f"Unexpected error sending event {semantic_event.messageId}: {err}"
             self.logger.error(log_message, exc_info=True)
             # semantic_event should be defined here if this block is reached after its creation
-            self._log_unsent_event(logging.ERROR, log_message, semantic_event.model_dump(exclude_none=True), 'UnexpectedSendError')
+            self._log_unsent_event(logging.ERROR, log_message, self._unsent_event_data(semantic_event), 'UnexpectedSendError')
             return None
 
+        self._acknowledge([semantic_event]) # Outside the try, the event is sent whatever happens after
+        return semantic_event
+
+    async def _post(self, endpoint: str, write_key: str | None, **request_kwargs) -> None:
+        """
+        Posts to one endpoint, recording its health and latency in the endpoint pool.
+        Raises ClientResponseError for 4xx/5xx responses and ClientError for connection errors.
+        """
+        import aiohttp
+        body_factory = request_kwargs.pop('body_factory', None)
+        if body_factory is not None: # Streamed bodies are consumed by a request, each attempt gets its own
+            request_kwargs['data'] = body_factory()
+        session = await self._get_session()
+        started = time.perf_counter()
+        try:
+            async with session.post(endpoint, **request_kwargs, **self._request_auth(write_key)) as response:
+                response.raise_for_status() # Raises ClientResponseError for 4xx/5xx
+        except aiohttp.ClientResponseError as http_err:
+            if http_err.status in RETRYABLE_STATUSES:
+                self.endpoint_pool.record_failure(endpoint)
+            else:
+                self.endpoint_pool.record_success(endpoint) # The endpoint is up, it refused the request
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.endpoint_pool.record_failure(endpoint)
+            raise
+        self.endpoint_pool.record_success(endpoint, time.perf_counter() - started)
+
+    async def _deliver(self, write_key: str | None, **request_kwargs) -> None:
+        """
+        Posts a request to the sticky endpoint of its tenant.
+
+        With `hedge_requests`, a second attempt goes to another endpoint once the first one has been running
+        longer than the `hedge_percentile` of recent latencies, the first attempt to succeed wins. Without a
+        hedged attempt, a retryable failure is retried once on another endpoint (failover).
+        """
+        import aiohttp
+        primary = self.endpoint_pool.primary(write_key)
+        alternate = self.endpoint_pool.alternate(write_key, exclude=primary)
+        hedge_delay = self.endpoint_pool.latency_percentile(self.hedge_percentile) if self.hedge_requests else None
+
+        attempts = {asyncio.ensure_future(self._post(primary, write_key, **request_kwargs))}
+        hedged = False
+        try:
+            if alternate and hedge_delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=hedge_delay)
+                if not done:
+                    self.logger.debug(f"Request to {primary} slower than {hedge_delay:.3f}s, hedging to {alternate}.")
+                    attempts.add(asyncio.ensure_future(self._post(alternate, write_key, **request_kwargs)))
+                    hedged = True
+
+            error = None
+            while attempts:
+                done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return
+                    error = attempt.exception()
+        finally:
+            for attempt in attempts: # The losing hedged attempt, or all of them if we are cancelled
+                attempt.cancel()
+
+        retryable = not isinstance(error, aiohttp.ClientResponseError) or error.status in RETRYABLE_STATUSES
+        if hedged or not alternate or not retryable or not isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+            raise error
+        self.logger.warning(f"Request to {primary} failed ({error}), failing over to {alternate}.")
+        await self._post(alternate, write_key, **request_kwargs)
+
+    def _acknowledge(self, events: list[SemanticEvent]) -> None:
+        """
+        Called with the events the endpoint accepted. Failures of the post-send hooks are logged only:
+        the events were delivered, re-queueing them would send duplicates.
+        """
+        first_sent = events
+        if self._reconciled:
+            first_sent = [event for event in events if not self._is_reconciled(event)]
+            self._reconciled.difference_update((event.write_key, event.messageId) for event in events)
+        hooks = [(self.enrichment_pipeline.acknowledge, first_sent)]
+        if self.delivery_ledger is not None:
+            hooks.append((self.delivery_ledger.record, events))
+        if self.router is not None:
+            routed = first_sent # The sinks got the re-sent events the first time
+            if self.content_offloader is not None and routed: # Sinks can not resolve content references, resolved before `on_sent` forgets the values
+                routed = self.content_offloader.with_content(routed)
+            hooks.append((self.router.route, routed))
+        for hook, hook_events in hooks:
+            if not hook_events:
+                continue
+            try:
+                hook(hook_events)
+            except Exception as e:
+                self.logger.error(f"Post-send hook {hook.__qualname__} failed for {len(hook_events)} delivered events: {e}", exc_info=True)
+
+    def _is_reconciled(self, event: SemanticEvent) -> bool:
+        return (event.write_key, event.messageId) in self._reconciled
+
+    def delivery_digests(self, write_key: str | None = None) -> dict[int, dict]:
+        """
+        The delivery digests of a write key (the client's own by default): {interval start: {"count", "xor"}}.
+        Requires a `delivery_ledger`.
+        """
+        if self.delivery_ledger is None:
+            raise ValueError("Delivery digests require a delivery_ledger")
+        return {start: digest.as_dict() for start, digest in self.delivery_ledger.digests(write_key or self.write_key).items()}
+
+    async def reconcile(self, server_digests: dict, write_key: str | None = None) -> dict[str, list[int]]:
+        """
+        Compares the delivery digests of a write key with the server's and re-queues the events of the
+        intervals that differ. Returns the re-sent intervals and those whose events were no longer retained.
+        """
+        if self.delivery_ledger is None:
+            raise ValueError("Reconciliation requires a delivery_ledger")
+        write_key = write_key or self.write_key
+        mismatched = self.delivery_ledger.mismatched(server_digests, write_key)
+        events, unrecoverable = self.delivery_ledger.take(mismatched, write_key)
+        self.start()
+        for event in events:
+            self._reconciled.add((event.write_key, event.messageId))
+            await self.event_queue.put(event)
+        if mismatched:
+            self.logger.warning(f"Reconciliation: {len(mismatched)} intervals differ from the server, re-queued {len(events)} events. "
+                                f"Unrecoverable intervals: {unrecoverable}")
+        return {"resent": [start for start in mismatched if start not in unrecoverable], "unrecoverable": unrecoverable}
+
+    async def _upload_content(self, write_key: str | None) -> None:
+        """
+        Uploads the offloaded content of a tenant that has not been uploaded yet, in one bulk request.
+        Raises like `_post`, the events referencing the content must not be sent before it is uploaded.
+        """
+        if self.content_offloader is None:
+            return
+        contents = self.content_offloader.pending_uploads(write_key)
+        if not contents:
+            return
+        from cxs.core.client.offload import encode_content_upload
+        session = await self._get_session()
+        async with session.post(self.content_endpoint, data=encode_content_upload(contents),
+                                headers={'Content-Type': 'application/json'}, **self._request_auth(write_key)) as response:
+            response.raise_for_status()
+        self.content_offloader.mark_uploaded(write_key, list(contents))
+        self.logger.debug(f"Uploaded {len(contents)} offloaded content bodies.")
+
+    def _unsent_event_data(self, event: SemanticEvent) -> dict:
+        """
+        The data logged for an event that leaves the client unsent. Events still awaiting deferred validation
+        are logged with their raw input (they can not be dumped), which is forgotten with them, offloaded
+        content is logged with its original value.
+        """
+        if self._reconciled:
+            self._reconciled.discard((event.write_key, event.messageId))
+        raw_input = self._pending_validation.pop(event.messageId, None)
+        if raw_input is not None:
+            return raw_input
+        if self.deferred_validation:
+            from cxs.core.client.deferred import DeferredSemanticEvent, validation_input
+            if isinstance(event, DeferredSemanticEvent): # Not validated, can not be dumped
+                return validation_input(event, {})
+        event_data = event.model_dump(exclude_none=True)
+        content = self.content_offloader.restore_content(event) if self.content_offloader is not None else None
+        if content is not None:
+            event_data['content'] = content
+        return event_data
+
+    def _on_event_shed(self, event: SemanticEvent, reason: str) -> None:
+        """
+        Called by the priority lanes and the tenant queues for every event they drop.
+        """
+        self._log_unsent_event(logging.WARNING, f"Event shed from the queue ({reason}): {event.messageId}",
+                               self._unsent_event_data(event), reason)
+
+    def _update_degraded_state(self, endpoint_reached: bool) -> None:
+        """
+        Tracks consecutive batch failures. After `degraded_after_failures` failures the client is degraded:
+        with priority lanes, queued events below `degraded_min_importance` are shed and new ones are refused
+        until a batch reaches the endpoint again. Batches the endpoint refused (auth, other 4xx) reached it,
+        they are a problem of their tenant or events, not of the endpoint, and do not count as failures.
+        """
+        has_lanes = isinstance(self.event_queue, PriorityLanes)
+        if endpoint_reached:
+            self._consecutive_batch_failures = 0
+            if self.degraded:
+                self.logger.info("Batch sent successfully, leaving degraded mode.")
+                self.degraded = False
+                if has_lanes:
+                    self.event_queue.min_importance = None
+            return
+
+        self._consecutive_batch_failures += 1
+        if not self.degraded and self._consecutive_batch_failures >= self.degraded_after_failures:
+            self.degraded = True
+            self.logger.warning(f"{self._consecutive_batch_failures} consecutive batch failures, entering degraded mode.")
+            if has_lanes:
+                self.event_queue.min_importance = self.degraded_min_importance
+                shed_events = self.event_queue.shed_below(self.degraded_min_importance)
+                self.logger.warning(f"Shed {len(shed_events)} queued events with importance below {self.degraded_min_importance}.")
+
+    def _batch_headers(self) -> dict:
+        headers = {'Content-Type': 'application/json'}
+        if self.compression:
+            headers['Content-Encoding'] = self.compression
+        if self.batch_envelope:
+            headers[ENVELOPE_HEADER] = 'envelope'
+        return headers
+
+    def _streams(self, batch: list[SemanticEvent]) -> bool:
+        """
+        Whether a batch is sent as a streamed body. Envelopes need the whole batch up front and are never streamed.
+        """
+        return bool(self.stream_min_events) and len(batch) >= self.stream_min_events and not self.batch_envelope
+
+    async def _stream_batch(self, batch: list[SemanticEvent]):
+        """
+        The chunks of a streamed batch body, encoded as the request is written: chunk by chunk in the
+        serialization executor like `_encode_batch`, or inline on the loop, accounted in the loop time stats.
+        """
+        chunks = iter_batch(batch, self.compression, self.minimize_payload, self.stream_chunk_size)
+        offload = self.serialization_executor and len(batch) > self.inline_serialization_max_events
+        loop = asyncio.get_running_loop()
+        while True:
+            if offload: # next() with a default, StopIteration can not be raised through a future
+                chunk = await loop.run_in_executor(self.serialization_executor, next, chunks, None)
+            else:
+                with self._loop_timer("serialization"):
+                    chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def _encode_batch(self, batch: list[SemanticEvent]) -> tuple[bytes, dict]:
+        """
+        Serializes (and compresses) a batch, inline for small batches and in the serialization executor otherwise.
+        Returns the request body and its headers.
+        """
+        headers = self._batch_headers()
+        if self.serialization_executor and len(batch) > self.inline_serialization_max_events:
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(self.serialization_executor, encode_batch, batch, self.compression,
+                                              self.batch_envelope, self.minimize_payload)
+        else:
+            with self._loop_timer("serialization"):
+                body = encode_batch(batch, self.compression, self.batch_envelope, self.minimize_payload)
+        return body, headers
+
     async def _send_batch_events(self, batch: list[SemanticEvent]) -> bool:
         """
         Sends a batch of events to the endpoint.
@@ -271,88 +801,194 @@ class CXSClient:
         if not batch:
             return True
 
+        import aiohttp
+        self.start()
+        batch = await self._validate_deferred_events(batch) # Unvalidated events are never sent
+        if not batch:
+            return True
         # Assuming the endpoint can handle a list of event objects directly.
         # If the endpoint expects a different structure for batches (e.g., a JSON object with an "events" key),
         # this part will need to be adjusted.
-        payload = [event.model_dump(by_alias=True, exclude_none=True) for event in batch]
+        for event in batch:
+            if not event.messageId: # The endpoint deduplicates on messageId, which makes hedged and failed over batches safe
+                event.messageId = str(uuid.uuid4()) # Set before enrichment, stages track events by messageId
+        if self._reconciled: # Re-sent events were enriched the first time, the stages must not see them again
+            resent = [event for event in batch if self._is_reconciled(event)]
+            batch = resent + await self.enrichment_pipeline.run([event for event in batch if not self._is_reconciled(event)])
+        else:
+            batch = await self.enrichment_pipeline.run(batch)
+        if not batch:
+            return True
+
         batch_event_ids = [event.messageId for event in batch] # For logging
 
         try:
-            async with aiohttp.ClientSession(auth=aiohttp.BasicAuth(self.write_key, self.write_key)) as session:
-                async with session.post(
-                    self.endpoint, # Or a specific batch endpoint if available
-                    json=payload,
-                    headers={'Content-Type': 'application/json'}
-                ) as response:
-                    response.raise_for_status() # Raises ClientResponseError for 4xx/5xx
-                    self.logger.info(f"Successfully sent batch of {len(batch)} events. IDs: {batch_event_ids}")
-                    return True
+            await self._upload_content(batch[0].write_key)
+            if self._streams(batch):
+                await self._deliver(batch[0].write_key, body_factory=lambda: self._stream_batch(batch), headers=self._batch_headers())
+            else:
+                body, headers = await self._encode_batch(batch)
+                await self._deliver(batch[0].write_key, data=body, headers=headers) # Batches hold the events of a single tenant
+            self.logger.info(f"Successfully sent batch of {len(batch)} events. IDs: {batch_event_ids}")
         except aiohttp.ClientResponseError as http_err: # Raised by response.raise_for_status()
             error_details_text = "No response body"
-            if http_err.response:
+            response = getattr(http_err, 'response', None) # aiohttp does not attach the response, other callers may
+            if response:
                 try:
-                    error_details_text = await http_err.response.text()
+                    error_details_text = await response.text()
                 except Exception as texterr:
                     self.logger.debug(f"Could not get text from error response for batch (IDs: {batch_event_ids}): {texterr}")
 
             self.logger.error(f"HTTP error sending batch (IDs: {batch_event_ids}): {http_err.status} - Message: {http_err.message} - Details: {error_details_text}", exc_info=True)
+            self._update_degraded_state(http_err.status not in RETRYABLE_STATUSES)
             # Specific event logging for this failure is handled in _process_event_queue before re-queueing
             return False
         except aiohttp.ClientError as client_err: # Includes ClientConnectorError, ClientTimeoutError etc.
             self.logger.error(f"AIOHTTP client error sending batch (IDs: {batch_event_ids}): {client_err}", exc_info=True)
+            self._update_degraded_state(False)
             return False
         except Exception as err: # Other unexpected errors
             self.logger.error(f"Unexpected error sending batch (IDs: {batch_event_ids}): {err}", exc_info=True)
+            self._update_degraded_state(False)
             return False
 
+        # Outside the try: the batch was accepted, a failure from here on must not get it re-queued and sent twice
+        self._acknowledge(batch)
+        try:
+            self._update_degraded_state(True)
+        except Exception as e:
+            self.logger.error(f"Failed to update the degraded state after a sent batch: {e}", exc_info=True)
+        return True
+
+    async def _validate_deferred_events(self, batch: list[SemanticEvent]) -> list[SemanticEvent]:
+        """
+        Runs full validation for events that were fast-constructed in deferred validation mode.
+        Events that fail are diverted to the unsent events log (dead-letter path) with their error.
+        Returns the batch with validated events in place and failed events removed.
+        Every fast-constructed event is validated, also when its raw input is no longer known.
+        """
+        if not self.deferred_validation:
+            return batch
+        from cxs.core.client.deferred import DeferredSemanticEvent, validation_input, validate_inputs
+
+        deferred = [(idx, event) for idx, event in enumerate(batch) if isinstance(event, DeferredSemanticEvent)]
+        if not deferred:
+            return batch
+
+        inputs = [validation_input(event, self._pending_validation.pop(event.messageId, None) or {}) for _, event in deferred]
+        if self.validation_executor:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.validation_executor, validate_inputs, inputs)
+        else:
+            with self._loop_timer("validation"):
+                results = validate_inputs(inputs)
+
+        validated_batch = list(batch)
+        failed_indexes = set()
+        for (idx, event), (validated_event, error), values in zip(deferred, results, inputs):
+            if validated_event is None:
+                log_message = f"Deferred validation failed for event {event.messageId}: {error}"
+                self.logger.error(log_message)
+                self._log_unsent_event(logging.ERROR, log_message, values, 'DeferredValidationFailed')
+                failed_indexes.add(idx)
+            else:
+                validated_batch[idx] = validated_event
+        return [event for idx, event in enumerate(validated_batch) if idx not in failed_indexes]
+
+    def _tenant_batches(self, batch: list[SemanticEvent]) -> list[list[SemanticEvent]]:
+        """
+        The batch split per write key for multi-tenant clients, as a single batch otherwise.
+        """
+        return split_by_tenant(batch) if self.multi_tenant else [batch]
+
+    def _aggregate(self, batch: list[SemanticEvent]) -> list[SemanticEvent]:
+        """
+        Folds the events accepted by the aggregator and returns the others.
+        """
+        remaining = []
+        for event in batch:
+            if self.aggregator.accepts(event) and not self._is_reconciled(event):
+                self.aggregator.add(event)
+            else:
+                remaining.append(event)
+        return remaining
+
+    async def _flush_aggregates(self, force: bool = False) -> None:
+        """
+        Queues the summary events of closed aggregation windows (of all windows with `force`).
+        """
+        if self.aggregator is None:
+            return
+        summaries = self.aggregator.flush(force=force)
+        for summary in summaries:
+            await self.event_queue.put(summary)
+        if summaries:
+            self.logger.debug(f"Queued {len(summaries)} aggregated metric events.")
+
+    def _drain_batch(self) -> list[SemanticEvent]:
+        """
+        Takes the next batch from the queue: up to max_batch_size events and, when set, about max_batch_bytes.
+        """
+        with self._loop_timer("batching"):
+            return self.event_queue.drain(self.max_batch_size, self.max_batch_bytes, self._size_estimator if self.max_batch_bytes else None)
+
+    def _queue_wait_timeout(self) -> float:
+        """
+        How long the processor waits for the next event: the send interval, or less when a held partition group
+        or an aggregation window is due sooner.
+        """
+        deadlines = [self.send_interval]
+        for component in (self.partition_batcher, self.aggregator):
+            deadline = component.next_deadline() if component is not None else None
+            if deadline is not None:
+                deadlines.append(deadline)
+        return min(deadlines)
+
     async def _process_event_queue(self):
         self.logger.info("Event queue processor started.")
         try:
             while not self._shutdown_event.is_set():
+                await self._flush_aggregates()
                 batch = []
                 try:
-                    # Wait for the first event or until shutdown is signaled or timeout
-                    first_event = await asyncio.wait_for(self.event_queue.get(), timeout=self.send_interval)
-                    if first_event: # Should always be true if no exception
-                        batch.append(first_event)
-                        self.event_queue.task_done()
-                except asyncio.TimeoutError:
-                    # No event received within the send_interval.
-                    # This is normal, allows checking _shutdown_event.
-                    if self._shutdown_event.is_set():
-                        self.logger.debug("Shutdown signaled, no new events in interval, proceeding to stop.")
-                        break
-                    continue # Continue to next iteration of while loop to check shutdown_event again
+                    # Wait until a full batch is queued, the oldest event has lingered long enough or a priority lane is due,
+                    # at most until the send interval (or a held partition group) is due
+                    if await self.event_queue.wait_for_batch(self.max_batch_size, linger=self.linger, timeout=self._queue_wait_timeout()):
+                        batch = self._drain_batch()
                 except asyncio.CancelledError:
                     self.logger.info("Event queue processor task cancelled while waiting for event.")
                     break # Exit loop if task is cancelled
                 except Exception as e_get:
                     self.logger.error(f"Error getting from event queue: {e_get}", exc_info=True)
-                    await asyncio.sleep(0.1) # Prevent tight loop on continuous error from queue.get()
+                    await asyncio.sleep(0.1) # Prevent tight loop on continuous error from the queue
                     continue # Try to continue processing
 
-                # If we got an event, try to fill the rest of the batch without waiting longer
+                if not batch:
+                    # No event within the send interval, this is normal and allows checking _shutdown_event.
+                    if self._shutdown_event.is_set():
+                        self.logger.debug("Shutdown signaled, no new events in interval, proceeding to stop.")
+                        break
+                    if self.partition_batcher is None or not len(self.partition_batcher): # Held partition groups may be due
+                        continue # Continue to next iteration of while loop to check shutdown_event again
+
+                if self.partition_batcher is not None:
+                    batch = self.partition_batcher.arrange(batch, max_events=self.max_batch_size)
+
                 if batch:
-                    while len(batch) < self.max_batch_size:
-                        try:
-                            event = self.event_queue.get_nowait()
-                            batch.append(event)
-                            self.event_queue.task_done()
-                        except asyncio.QueueEmpty:
-                            break # Queue is empty, proceed with current batch
-                        except Exception as e_get_nowait:
-                            self.logger.error(f"Error during non-blocking get from event queue: {e_get_nowait}", exc_info=True)
-                            break # Stop filling batch on unexpected error
+                    batch = await self._validate_deferred_events(batch)
+                    if self.aggregator is not None and self.deferred_validation:
+                        batch = self._aggregate(batch)
 
                 if batch:
                     self.logger.info(f"Processing batch of {len(batch)} events.")
-                    success = await self._send_batch_events(batch)
-                    if not success:
-                        self.logger.warning(f"Failed to send batch (first event ID: {batch[0].messageId if batch else 'N/A'}). Re-queueing {len(batch)} events.")
-                        for event_item in reversed(batch):
-                            self._log_unsent_event(logging.WARNING, f"Event from failed batch being re-queued: {event_item.messageId}",
-                                                   event_item.model_dump(exclude_none=True), 'BatchSendFailed_ReQueued')
-                            await self.event_queue.put(event_item) # Re-queueing
+                    for tenant_batch in self._tenant_batches(batch):
+                        success = await self._send_batch_events(tenant_batch)
+                        if not success:
+                            self.logger.warning(f"Failed to send batch (first event ID: {tenant_batch[0].messageId}). Re-queueing {len(tenant_batch)} events.")
+                            for event_item in reversed(tenant_batch):
+                                self._log_unsent_event(logging.WARNING, f"Event from failed batch being re-queued: {event_item.messageId}",
+                                                       event_item.model_dump(exclude_none=True), 'BatchSendFailed_ReQueued')
+                                await self.event_queue.put(event_item) # Re-queueing
                 elif self._shutdown_event.is_set(): # if batch is empty and shutdown is set
                     break # Exit if shutdown and no batch formed (e.g. from timeout)
                 else: # No batch and not shutting down (should be rare if timeout leads to continue)
@@ -366,33 +1002,40 @@ class CXSClient:
 
         # Shutdown processing: try to process any remaining events from the queue
         self.logger.info("Event queue processor shutting down. Processing any remaining events...")
+        await self._flush_aggregates(force=True)
+        if self.partition_batcher is not None:
+            for event in self.partition_batcher.release(): # Held groups go out with the final batches
+                self.event_queue.put_nowait(event)
         final_events_processed_count = 0
         final_events_logged_count = 0
         # Attempt to process in batches as long as there are items and shutdown is active
         while not self.event_queue.empty() and self._shutdown_event.is_set(): # Ensure we only process if shutdown is indeed active
-            final_batch = []
-            while not self.event_queue.empty() and len(final_batch) < self.max_batch_size:
-                try:
-                    event = self.event_queue.get_nowait()
-                    final_batch.append(event)
-                    self.event_queue.task_done()
-                except asyncio.QueueEmpty:
-                    break
-                except Exception as e_final_get:
-                    self.logger.error(f"Error getting event from queue during final shutdown processing: {e_final_get}", exc_info=True)
-                    break
+            try:
+                final_batch = self._drain_batch()
+            except Exception as e_final_get:
+                self.logger.error(f"Error getting events from queue during final shutdown processing: {e_final_get}", exc_info=True)
+                break
 
             if final_batch:
-                self.logger.info(f"Sending final batch of {len(final_batch)} events during shutdown.")
-                success = await self._send_batch_events(final_batch)
-                if success:
-                    final_events_processed_count += len(final_batch)
-                else:
-                    self.logger.error(f"Failed to send final batch (first ID: {final_batch[0].messageId}) during shutdown. Logging {len(final_batch)} events.")
-                    for event_item in final_batch:
-                        self._log_unsent_event(logging.ERROR, f"Event not sent during shutdown (final batch failure): {event_item.messageId}",
-                                               event_item.model_dump(exclude_none=True), 'NotSent_Shutdown_FinalBatchFailed')
-                        final_events_logged_count +=1
+                if self.partition_batcher is not None:
+                    final_batch = self.partition_batcher.arrange(final_batch, flush=True)
+                final_batch = await self._validate_deferred_events(final_batch)
+                if self.aggregator is not None and self.deferred_validation:
+                    final_batch = self._aggregate(final_batch)
+                    final_batch.extend(self.aggregator.flush(force=True))
+                if not final_batch:
+                    continue
+                for tenant_batch in self._tenant_batches(final_batch):
+                    self.logger.info(f"Sending final batch of {len(tenant_batch)} events during shutdown.")
+                    success = await self._send_batch_events(tenant_batch)
+                    if success:
+                        final_events_processed_count += len(tenant_batch)
+                    else:
+                        self.logger.error(f"Failed to send final batch (first ID: {tenant_batch[0].messageId}) during shutdown. Logging {len(tenant_batch)} events.")
+                        for event_item in tenant_batch:
+                            self._log_unsent_event(logging.ERROR, f"Event not sent during shutdown (final batch failure): {event_item.messageId}",
+                                                   self._unsent_event_data(event_item), 'NotSent_Shutdown_FinalBatchFailed')
+                            final_events_logged_count +=1
             else: # No more items could be batched
                 break
 
@@ -402,7 +1045,7 @@ class CXSClient:
             try:
                 event = self.event_queue.get_nowait()
                 self._log_unsent_event(logging.ERROR, f"Event found in queue post final processing, logging: {event.messageId}",
-                                       event.model_dump(exclude_none=True), 'NotSent_Shutdown_Orphaned')
+                                       self._unsent_event_data(event), 'NotSent_Shutdown_Orphaned')
                 self.event_queue.task_done()
                 final_events_logged_count +=1
             except asyncio.QueueEmpty:
@@ -418,10 +1061,19 @@ class CXSClient:
         """
         Gracefully shuts down the CXSClient, processing any remaining queued events and logging unsent ones.
         """
+        if self._registry_key is not None:
+            self._references -= 1
+            if self._references > 0:
+                self.logger.debug(f"Shared client still has {self._references} users, not closing it.")
+                return
+            _shared_clients.pop(self._registry_key, None)
+            self._registry_key = None
+
         self.logger.info("Initiating CXSClient shutdown sequence...")
         try:
             if self.queue_processor_task and not self.queue_processor_task.done() and not self._shutdown_event.is_set():
                 self._shutdown_event.set() # Signal the processor to stop
+                self.event_queue.interrupt() # Stop waiting for the next batch
                 self.logger.info("Shutdown event set for queue processor. Waiting for completion...")
 
                 try:
@@ -467,7 +1119,7 @@ class CXSClient:
                 try:
                     event = self.event_queue.get_nowait()
                     self._log_unsent_event(logging.ERROR, f"Event found in queue after shutdown sequence, logging: {event.messageId}",
-                                           event.model_dump(exclude_none=True), 'NotSent_PostShutdownCleanup')
+                                           self._unsent_event_data(event), 'NotSent_PostShutdownCleanup')
                     self.event_queue.task_done()
                     missed_events_count += 1
                 except asyncio.QueueEmpty:
@@ -478,6 +1130,12 @@ class CXSClient:
             if missed_events_count > 0:
                 self.logger.warning(f"Logged {missed_events_count} events during post-shutdown fallback cleanup.")
 
+            if self.router is not None:
+                await self.router.close(timeout=self.send_interval + 5.0)
+
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+
             # Close file handlers for the unsent_events_logger
             self.logger.info("Closing unsent event log file handlers...")
             closed_handlers = 0
@@ -498,3 +1156,13 @@ class CXSClient:
             self.logger.error(f"Unexpected error during CXSClient close sequence: {e_close_main}", exc_info=True)
 
         self.logger.info("CXSClient shutdown sequence complete.")
+        self._release_loggers()
+
+    def _release_loggers(self) -> None:
+        """
+        Detaches and closes the handlers of the client's loggers, so a closed client holds no files or streams.
+        """
+        for logger in (self.logger, self.unsent_events_logger):
+            for handler in list(logger.handlers):
+                handler.close() # Stream handlers leave their stream open
+                logger.removeHandler(handler)
@@ -0,0 +1,53 @@
+"""
+Deferred validation helpers for the CXS client.
+
+In deferred mode events are built with `model_construct` on the caller's path, which skips
+pydantic validation and `SemanticEvent.pre_init`. Full validation runs later in the sender
+stage (optionally in a worker pool); events that fail are dead-lettered with their error.
+Fast-constructed events are `DeferredSemanticEvent`s, so an event that has not been validated
+yet can always be told apart from a validated `SemanticEvent`.
+"""
+from pydantic import ValidationError
+
+from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+
+class DeferredSemanticEvent(SemanticEvent):
+    """
+    A SemanticEvent built without validation, see `fast_construct`. Never sent as such.
+    """
+
+
+def fast_construct(data: dict) -> DeferredSemanticEvent:
+    """
+    Builds a SemanticEvent without validation. Only for trusted producers.
+    The event is incomplete (no event_gid, nested values are still raw) until validated.
+    """
+    return DeferredSemanticEvent.model_construct(**data)
+
+
+def validation_input(event: SemanticEvent, raw_data: dict) -> dict:
+    """
+    Combines the raw producer data with every attribute set on the constructed event since
+    (type, timestamp, library, enrichments...). Field names are mapped to their aliases,
+    as SemanticEvent validates by alias.
+    """
+    values = dict(raw_data)
+    for name in event.model_fields_set:
+        field = SemanticEvent.model_fields[name]
+        values[field.alias or name] = getattr(event, name)
+    return values
+
+
+def validate_inputs(inputs: list[dict]) -> list[tuple[SemanticEvent | None, str | None]]:
+    """
+    Validates a list of deferred event inputs.
+    Returns one (event, error) pair per input; module level so it can run in a process pool.
+    """
+    results = []
+    for values in inputs:
+        try:
+            results.append((SemanticEvent.model_validate(values), None))
+        except (ValidationError, ValueError, TypeError) as e:
+            results.append((None, str(e)))
+    return results
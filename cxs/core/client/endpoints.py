@@ -0,0 +1,92 @@
+"""
+Endpoint selection for the CXS client.
+
+`EndpointPool` tracks the health and the request latency of a list of ingestion endpoints.
+Requests are routed sticky (by rendezvous hashing of a routing key, e.g. the write key), so
+connections to an endpoint are reused, and move to the next endpoint when one becomes unhealthy.
+The latency percentile is the threshold after which the client sends a hedged second attempt.
+"""
+import hashlib
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+
+@dataclass
+class EndpointHealth:
+    consecutive_failures: int = 0
+    unhealthy_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+
+class EndpointPool:
+    """
+    A list of endpoints with health tracking.
+
+    An endpoint failing `failure_threshold` times in a row is skipped for `cooldown` seconds, after
+    which it gets traffic again. When every endpoint is unhealthy, all of them are used.
+    """
+
+    def __init__(self, endpoints: list[str], failure_threshold: int = 3, cooldown: float = 30.0,
+                 latency_window: int = 200, min_latency_samples: int = 20, clock: Callable[[], float] = time.monotonic):
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = list(endpoints)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.min_latency_samples = min_latency_samples
+        self.clock = clock
+        self.health = {endpoint: EndpointHealth() for endpoint in self.endpoints}
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+
+    def is_healthy(self, endpoint: str) -> bool:
+        return self.health[endpoint].unhealthy_until <= self.clock()
+
+    def healthy_endpoints(self) -> list[str]:
+        healthy = [endpoint for endpoint in self.endpoints if self.is_healthy(endpoint)]
+        return healthy or list(self.endpoints)
+
+    def _ranked(self, key: Hashable) -> list[str]:
+        """
+        The healthy endpoints by rendezvous hash weight for `key`: stable as long as the healthy set is.
+        """
+        def weight(endpoint: str) -> bytes:
+            return hashlib.md5(f"{endpoint}|{key}".encode("utf-8")).digest()
+        return sorted(self.healthy_endpoints(), key=weight, reverse=True)
+
+    def primary(self, key: Hashable = None) -> str:
+        return self._ranked(key)[0]
+
+    def alternate(self, key: Hashable = None, exclude: str | None = None) -> str | None:
+        """
+        The next endpoint for `key` other than `exclude`, for hedged attempts and failover.
+        """
+        return next((endpoint for endpoint in self._ranked(key) if endpoint != exclude), None)
+
+    def record_success(self, endpoint: str, latency: float | None = None) -> None:
+        health = self.health[endpoint]
+        health.requests += 1
+        health.consecutive_failures = 0
+        health.unhealthy_until = 0.0
+        if latency is not None:
+            self._latencies.append(latency)
+
+    def record_failure(self, endpoint: str) -> None:
+        health = self.health[endpoint]
+        health.requests += 1
+        health.failures += 1
+        health.consecutive_failures += 1
+        if health.consecutive_failures >= self.failure_threshold:
+            health.unhealthy_until = self.clock() + self.cooldown
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        """
+        The `percentile` (0..1) of recent successful request latencies, None until there are enough samples.
+        """
+        if len(self._latencies) < self.min_latency_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(percentile * len(ordered)) - 1)]
@@ -0,0 +1,294 @@
+"""
+Batch-level enrichment middleware for the CXS client.
+
+Enrichers run on whole batches just before serialization. Each stage receives the full
+list of events, so it can do its work once per batch (or once per distinct key, such as a
+user agent or an IP) instead of once per event.
+"""
+from __future__ import annotations
+
+import asyncio
+import enum
+import hashlib
+import json
+import logging
+import platform
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Hashable, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING: # The models are imported by the stages that build them, importing the pipeline stays cheap
+    from cxs.schema.pydantic.semantic_event import SemanticEvent, Library as CXSLibrary
+
+
+def event_type_value(event: SemanticEvent) -> str:
+    """
+    Returns the event type as a plain string, whether it is stored as an EventType or a str.
+    """
+    event_type = event.type
+    return event_type.value if isinstance(event_type, enum.Enum) else event_type
+
+
+class BatchEnricher:
+    """
+    Base class for batch enrichment stages.
+
+    Subclasses implement `enrich(events)`, which receives the whole batch and returns the
+    (possibly modified or filtered) list of events.
+    Stages must be idempotent: events from a failed batch are re-queued and enriched again.
+    Set `offload = True` on stages doing blocking work so they run in the pipeline executor.
+    """
+    offload: bool = False
+
+    def enrich(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        raise NotImplementedError
+
+    def on_sent(self, events: list[SemanticEvent]) -> None:
+        """
+        Called with the enriched events once they have been accepted by the endpoint.
+        """
+        pass
+
+    def __call__(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        return self.enrich(events)
+
+
+class KeyedEnricher(BatchEnricher):
+    """
+    Enricher that resolves a value once per distinct key in the batch.
+
+    Subclasses implement `key(event)`, `lookup_many(keys)` and `apply(event, value)`.
+    Events whose key is None are left untouched.
+    """
+
+    def key(self, event: SemanticEvent) -> Hashable | None:
+        raise NotImplementedError
+
+    def lookup_many(self, keys: set[Hashable]) -> dict[Hashable, Any]:
+        raise NotImplementedError
+
+    def apply(self, event: SemanticEvent, value: Any) -> None:
+        raise NotImplementedError
+
+    def enrich(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        keyed = [(self.key(event), event) for event in events]
+        distinct_keys = {key for key, _ in keyed if key is not None}
+        if not distinct_keys:
+            return events
+
+        resolved = self.lookup_many(distinct_keys)
+        for key, event in keyed:
+            if key is not None and key in resolved:
+                self.apply(event, resolved[key])
+        return events
+
+
+class RuntimeContextEnricher(BatchEnricher):
+    """
+    Stamps the OS, runtime context and app information of the sending process onto events.
+
+    The values only depend on the process environment, so the sub-models are built once
+    and shared by every event in every batch.
+    """
+
+    def __init__(self, library: CXSLibrary, hostname: str = "", pod_ip: str = "", pod_name: str = "",
+                 pod_namespace: str = "", app_name: str = "", app_namespace: str = "",
+                 app_version: str = "", app_build: str = ""):
+        from cxs.schema.pydantic.semantic_event import Context as CXSContext, App as CXSApp, OS as CXSOS
+
+        self.os = CXSOS(
+            name=platform.system(),
+            version=platform.release()
+        )
+        # Only get the CXSContext values from typical kubernetes environment variables, not from parameters or kwargs
+        self.context = CXSContext(
+            hostname=hostname,
+            pod_ip=pod_ip,
+            pod_name=pod_name,
+            pod_namespace=pod_namespace,
+            application=app_name,
+            library=library
+        )
+        self.app = CXSApp(
+            name=app_name,
+            namespace=app_namespace,
+            version=app_version,
+            build=app_build
+        )
+
+    def enrich(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        for event in events:
+            event.os = self.os
+            event.context = self.context
+            event.app = self.app
+        return events
+
+
+class EventTypeEnricher(BatchEnricher):
+    """
+    Applies the identify, page and screen conventions to events of those types.
+    """
+    event_names = { # Keyed by EventType value
+        "identify": "User Identified",
+        "page": "Page Viewed", # warning this is a server-side client, page is not a server-side event
+        "screen": "Screen Viewed", # warning this is a server-side client, screen is not a server-side event
+    }
+
+    def enrich(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        from cxs.schema.pydantic.semantic_event import EventType, Traits as CXSTraits
+
+        for event in events:
+            event_type = event_type_value(event)
+            if event_type not in self.event_names:
+                continue
+
+            if event_type == EventType.identify.value:
+                if event.traits is None:
+                    event.traits = CXSTraits()
+                elif isinstance(event.traits, dict):
+                    event.traits = CXSTraits(**event.traits)
+            event.event = self.event_names[event_type]
+        return events
+
+
+class IdentifyCoalescer(BatchEnricher):
+    """
+    Coalesces identify events per user within a batch (the flush window).
+
+    Consecutive identify events for the same `user_id` (or `anonymous_id` when there is no user_id)
+    are merged into the last one, later traits overriding earlier ones. Any other event of the user
+    ends the run, so events are never delivered next to a traits state that did not exist when they
+    happened. With `suppress_unchanged`, identify
+    events whose traits are identical to the last ones sent for that user are dropped; the traits
+    hashes of the last `max_users` users are kept, recorded only once their batch has been sent.
+    Only effective on queued events, direct sends are batches of one event.
+    """
+
+    def __init__(self, suppress_unchanged: bool = True, max_users: int = 10000):
+        self.suppress_unchanged = suppress_unchanged
+        self.max_users = max_users
+        self._sent_traits: OrderedDict[Hashable, str] = OrderedDict() # user key -> hash of the last traits sent
+
+    @classmethod
+    def identity(cls, event: SemanticEvent) -> Hashable | None:
+        if event_type_value(event) != "identify":
+            return None
+        return cls.user_key(event)
+
+    @staticmethod
+    def user_key(event: SemanticEvent) -> Hashable | None:
+        if event.user_id:
+            return event.write_key, "user_id", event.user_id
+        if event.anonymous_id:
+            return event.write_key, "anonymous_id", event.anonymous_id
+        return None
+
+    @staticmethod
+    def traits_values(traits: Any) -> dict:
+        if traits is None:
+            return {}
+        if isinstance(traits, dict):
+            return {k: v for k, v in traits.items() if v is not None}
+        return traits.model_dump(exclude_unset=True, exclude_none=True) # Unset traits must not override earlier values
+
+    def traits_hash(self, event: SemanticEvent) -> str:
+        values = json.dumps(self.traits_values(event.traits), sort_keys=True, default=str)
+        return hashlib.sha1(values.encode("utf-8")).hexdigest()
+
+    def enrich(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        from cxs.schema.pydantic.semantic_event import Traits as CXSTraits
+
+        runs: list[tuple[Hashable, list[int]]] = [] # Runs of consecutive identify events per user, in batch order
+        open_runs: dict[Hashable, list[int]] = {}
+        for idx, event in enumerate(events):
+            user = self.user_key(event)
+            if user is None:
+                continue
+            if self.identity(event) is None: # Another event of the user ends its run
+                open_runs.pop(user, None)
+                continue
+            run = open_runs.get(user)
+            if run is None:
+                run = open_runs[user] = []
+                runs.append((user, run))
+            run.append(idx)
+
+        dropped = set()
+        batch_traits: dict[Hashable, str] = {} # Traits hash of the user's last run kept in this batch
+        for identity, indexes in runs:
+            last = events[indexes[-1]]
+            if len(indexes) > 1:
+                merged_traits = {}
+                for idx in indexes:
+                    merged_traits.update(self.traits_values(events[idx].traits))
+                last.traits = CXSTraits(**merged_traits)
+                last.underscore_process = {
+                    **(last.underscore_process or {}),
+                    "coalesced_message_ids": [events[idx].messageId for idx in indexes[:-1]],
+                }
+                dropped.update(indexes[:-1])
+
+            if self.suppress_unchanged:
+                traits_hash = self.traits_hash(last)
+                if batch_traits.get(identity, self._sent_traits.get(identity)) == traits_hash:
+                    dropped.add(indexes[-1])
+                else:
+                    batch_traits[identity] = traits_hash
+
+        if not dropped:
+            return events
+        return [event for idx, event in enumerate(events) if idx not in dropped]
+
+    def on_sent(self, events: list[SemanticEvent]) -> None:
+        if not self.suppress_unchanged:
+            return
+        for event in events:
+            identity = self.identity(event)
+            if identity is None:
+                continue
+            self._sent_traits[identity] = self.traits_hash(event)
+            self._sent_traits.move_to_end(identity)
+            if len(self._sent_traits) > self.max_users:
+                self._sent_traits.popitem(last=False)
+
+
+class EnrichmentPipeline:
+    """
+    Runs a chain of batch enrichers over a list of events.
+
+    Stages with `offload = True` run in `executor` (the loop's default executor if None).
+    A failing stage is logged and skipped, so one broken enrichment does not block delivery.
+    """
+
+    def __init__(self, stages: Iterable[BatchEnricher] = (), executor: Executor | None = None,
+                 logger: logging.Logger | None = None):
+        self.stages = list(stages)
+        self.executor = executor
+        self.logger = logger or logging.getLogger(__name__)
+
+    def add_stage(self, stage: BatchEnricher) -> None:
+        self.stages.append(stage)
+
+    def acknowledge(self, events: list[SemanticEvent]) -> None:
+        """
+        Notifies the stages that `events` have been sent.
+        """
+        for stage in self.stages:
+            try:
+                stage.on_sent(events)
+            except Exception as e:
+                self.logger.error(f"Enrichment stage {type(stage).__name__} failed to acknowledge sent events: {e}", exc_info=True)
+
+    async def run(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        loop = asyncio.get_running_loop()
+        for stage in self.stages:
+            if not events:
+                break
+            try:
+                if stage.offload:
+                    events = await loop.run_in_executor(self.executor, stage, events)
+                else:
+                    events = stage(events)
+            except Exception as e:
+                self.logger.error(f"Enrichment stage {type(stage).__name__} failed, skipping it for this batch: {e}", exc_info=True)
+        return events
@@ -0,0 +1,68 @@
+"""
+Batch envelope format for the CXS client.
+
+Events sent by one client carry identical `context`, `app`, `library`, `operating_system` and
+`write_key` blocks. The envelope sends each distinct combination of those blocks once per batch
+and each event only with its own fields plus a reference to its shared block:
+
+    {"envelope": 1, "shared": [{"context": {...}, "app": {...}, ...}], "events": [{..., "_shared": 0}]}
+
+`expand_batch` turns a batch body (an envelope or a plain list) back into full event dicts.
+"""
+import json
+from typing import Any, Iterable
+
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER = "X-CXS-Batch-Format" # Set to "envelope" on requests with an envelope body
+SHARED_FIELDS = ("context", "app", "library", "operating_system", "write_key") # Wire (alias) names
+SHARED_REF = "_shared"
+
+
+def is_envelope(payload: Any) -> bool:
+    return isinstance(payload, dict) and "envelope" in payload and "events" in payload
+
+
+def build_envelope(payload: list[dict], shared_fields: Iterable[str] = SHARED_FIELDS) -> dict:
+    """
+    Hoists the shared blocks out of a list of wire format event dicts.
+    """
+    shared_fields = tuple(shared_fields)
+    shared: list[dict] = []
+    shared_index: dict[str, int] = {}
+    events = []
+    for event in payload:
+        block = {name: event[name] for name in shared_fields if name in event}
+        block_key = json.dumps(block, sort_keys=True, separators=(",", ":"), default=str)
+        ref = shared_index.get(block_key)
+        if ref is None:
+            ref = shared_index[block_key] = len(shared)
+            shared.append(block)
+
+        own = {name: value for name, value in event.items() if name not in block}
+        own[SHARED_REF] = ref
+        events.append(own)
+    return {"envelope": ENVELOPE_VERSION, "shared": shared, "events": events}
+
+
+def expand_envelope(envelope: dict) -> list[dict]:
+    """
+    Rebuilds the full event dicts of an envelope.
+    """
+    if envelope.get("envelope") != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported envelope version: {envelope.get('envelope')}")
+    shared = envelope["shared"]
+    events = []
+    for event in envelope["events"]:
+        own = dict(event)
+        ref = own.pop(SHARED_REF, None)
+        events.append({**shared[ref], **own} if ref is not None else own)
+    return events
+
+
+def expand_batch(payload: Any) -> list[dict]:
+    """
+    The event dicts of a batch body, whether it was sent as an envelope or as a plain list.
+    """
+    if isinstance(payload, (bytes, str)):
+        payload = json.loads(payload)
+    return expand_envelope(payload) if is_envelope(payload) else payload
@@ -0,0 +1,133 @@
+"""
+Importance based priority lanes for the CXS client queue.
+
+`PriorityLanes` keeps one FIFO lane per `SemanticEvent.importance` level (1..5, 5 being the most
+important) and exposes the subset of the `asyncio.Queue` interface the client uses, so it can
+replace the single FIFO queue. Lanes are drained with smooth weighted round-robin, lanes whose
+oldest event has exceeded its flush latency target go first, and low-importance lanes are shed
+first under backpressure or when the client is degraded.
+"""
+import time
+from collections import deque
+from typing import Any, Callable
+
+from cxs.core.client.batching_queue import BatchingQueue
+
+IMPORTANCE_LEVELS = (1, 2, 3, 4, 5)
+DEFAULT_IMPORTANCE = 3
+
+# Flush latency targets in seconds per importance level: orders and payments should not wait behind telemetry
+DEFAULT_LATENCY_TARGETS = {5: 1.0, 4: 2.5, 3: 5.0, 2: 10.0, 1: 30.0}
+
+
+def importance_of(item: Any, default: int = DEFAULT_IMPORTANCE) -> int:
+    """
+    The importance lane of an event, clamped to 1..5. Events without importance use `default`.
+    """
+    importance = getattr(item, "importance", None)
+    if importance is None:
+        return default
+    return min(max(int(importance), IMPORTANCE_LEVELS[0]), IMPORTANCE_LEVELS[-1])
+
+
+class PriorityLanes(BatchingQueue):
+    """
+    A multi-lane queue keyed by event importance.
+
+    `on_shed(item, reason)` is called for every event dropped by the lanes, either because
+    the queue is full ('Shed_Backpressure') or because it is below the admission floor
+    set while the client is degraded ('Shed_Degraded').
+    """
+
+    def __init__(self, weights: dict[int, int] | None = None, latency_targets: dict[int, float] | None = None,
+                 max_size: int = 0, default_importance: int = DEFAULT_IMPORTANCE,
+                 on_shed: Callable[[Any, str], None] | None = None):
+        super().__init__()
+        self.weights = {level: level for level in IMPORTANCE_LEVELS}
+        self.weights.update(weights or {})
+        self.latency_targets = {**DEFAULT_LATENCY_TARGETS, **(latency_targets or {})}
+        self.max_size = max_size
+        self.default_importance = default_importance
+        self.on_shed = on_shed
+        self.min_importance: int | None = None # Admission floor, set while the client is degraded
+
+        self._lanes: dict[int, deque] = {level: deque() for level in IMPORTANCE_LEVELS}
+        self._current_weights = {level: 0 for level in IMPORTANCE_LEVELS}
+
+    def lane_sizes(self) -> dict[int, int]:
+        return {level: len(lane) for level, lane in self._lanes.items()}
+
+    def _shed(self, item: Any, reason: str) -> None:
+        if self.on_shed:
+            self.on_shed(item, reason)
+
+    def _push(self, item: Any) -> bool:
+        importance = importance_of(item, self.default_importance)
+        if self.min_importance is not None and importance < self.min_importance:
+            self._shed(item, 'Shed_Degraded')
+            return False
+
+        if self.max_size and self._size >= self.max_size:
+            # Make room by dropping the oldest event of the least important non-empty lane, unless the new event is less important
+            victim_level = next((level for level in IMPORTANCE_LEVELS if self._lanes[level]), None)
+            if victim_level is None or victim_level > importance:
+                self._shed(item, 'Shed_Backpressure')
+                return False
+            _, victim = self._lanes[victim_level].popleft()
+            self._size -= 1
+            self._shed(victim, 'Shed_Backpressure')
+
+        lane = self._lanes[importance]
+        if not lane:
+            self._wakeup.set() # The lane's latency target may make a batch due sooner
+        lane.append((time.monotonic(), item))
+        return True
+
+    def _oldest_arrival(self) -> float | None:
+        return min((lane[0][0] for lane in self._lanes.values() if lane), default=None)
+
+    def _batch_deadline(self, linger: float) -> float | None:
+        # A batch is due once the oldest event has lingered, or earlier when a lane reaches its latency target
+        due = super()._batch_deadline(linger)
+        for level, lane in self._lanes.items():
+            if lane:
+                due = min(due, lane[0][0] + self.latency_targets.get(level, 0.0))
+        return due
+
+    def _next_lane(self) -> int:
+        non_empty = [level for level in IMPORTANCE_LEVELS if self._lanes[level]]
+
+        # Lanes past their flush latency target go first, most important first
+        now = time.monotonic()
+        overdue = [level for level in non_empty if now - self._lanes[level][0][0] >= self.latency_targets.get(level, 0.0)]
+        if overdue:
+            return max(overdue)
+
+        # Otherwise smooth weighted round-robin over the non-empty lanes
+        total_weight = 0
+        for level in non_empty:
+            self._current_weights[level] += self.weights[level]
+            total_weight += self.weights[level]
+        selected = max(non_empty, key=lambda level: self._current_weights[level])
+        self._current_weights[selected] -= total_weight
+        return selected
+
+    def _pop(self) -> Any:
+        return self._lanes[self._next_lane()].popleft()[1]
+
+    def shed_below(self, importance: int) -> list:
+        """
+        Drops every queued event less important than `importance` and returns them.
+        """
+        shed = []
+        for level in IMPORTANCE_LEVELS:
+            if level >= importance:
+                break
+            while self._lanes[level]:
+                _, item = self._lanes[level].popleft()
+                self._size -= 1
+                shed.append(item)
+                self._shed(item, 'Shed_Degraded')
+        if not self._size:
+            self._not_empty.clear()
+        return shed
@@ -0,0 +1,102 @@
+"""
+Schema-driven payload minimizer for the CXS client.
+
+`minimize(data, model_cls)` strips a wire format dict (`model_dump(mode="json", by_alias=True,
+exclude_none=True)`) of everything the server restores by itself when validating it:
+- empty containers (`dimensions: {}`, `involves: []`, ...)
+- values equal to the field default (`customer_facing: 0`, `partition: ''`, ...)
+Required fields are always kept. The plan for each model class (wire names, JSON defaults and
+nested models) is computed once on first use, so minimizing does no per-event reflection.
+"""
+import typing
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined, to_jsonable_python
+
+SINGLE, LIST, MAPPING = "single", "list", "mapping"
+_NO_DEFAULT = object()
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+    default: Any # JSON mode default, _NO_DEFAULT for required fields
+    model: type[BaseModel] | None = None # Nested model of the field
+    kind: str = SINGLE # How the nested model is held: SINGLE, LIST or MAPPING
+
+
+_plans: dict[type[BaseModel], dict[str, FieldPlan]] = {}
+
+
+def _nested_model(annotation: Any) -> tuple[type[BaseModel] | None, str]:
+    """
+    Finds the model class held by a field annotation (through Optional, Annotated, list and dict).
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, SINGLE
+    origin = typing.get_origin(annotation)
+    for arg in typing.get_args(annotation):
+        model, kind = _nested_model(arg)
+        if model is not None:
+            if origin in (list, tuple, set):
+                return model, LIST
+            if origin is dict:
+                return model, MAPPING
+            return model, kind
+    return None, SINGLE
+
+
+def _json_default(field: Any) -> Any:
+    if field.default is not PydanticUndefined:
+        return to_jsonable_python(field.default)
+    if field.default_factory is not None:
+        try:
+            return to_jsonable_python(field.default_factory())
+        except Exception:
+            return _NO_DEFAULT
+    return _NO_DEFAULT
+
+
+def plan_for(model_cls: type[BaseModel]) -> dict[str, FieldPlan]:
+    """
+    The minimizing plan of a model class, keyed by wire (alias) name.
+    """
+    plan = _plans.get(model_cls)
+    if plan is None:
+        plan = {}
+        for name, field in model_cls.model_fields.items():
+            default = _NO_DEFAULT if field.is_required() else _json_default(field)
+            model, kind = _nested_model(field.annotation)
+            plan[field.alias or name] = FieldPlan(default=default, model=model, kind=kind)
+        _plans[model_cls] = plan
+    return plan
+
+
+def minimize(data: dict, model_cls: type[BaseModel]) -> dict:
+    plan = plan_for(model_cls)
+    minimized = {}
+    for key, value in data.items():
+        field = plan.get(key)
+        if field is None: # Not a schema field, only drop it when empty
+            if value is not None and value != {} and value != []:
+                minimized[key] = value
+            continue
+
+        if field.model is not None and value:
+            if field.kind == SINGLE and isinstance(value, dict):
+                value = minimize(value, field.model)
+            elif field.kind == LIST and isinstance(value, list):
+                value = [minimize(item, field.model) if isinstance(item, dict) else item for item in value]
+            elif field.kind == MAPPING and isinstance(value, dict):
+                value = {k: minimize(item, field.model) if isinstance(item, dict) else item for k, item in value.items()}
+
+        if field.default is _NO_DEFAULT:
+            minimized[key] = value
+        elif value is None or value == {} or value == []:
+            continue
+        elif type(value) is type(field.default) and value == field.default:
+            continue
+        else:
+            minimized[key] = value
+    return minimized
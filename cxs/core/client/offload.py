@@ -0,0 +1,152 @@
+"""
+Large content offload for the CXS client.
+
+`ContentOffloader` is an enrichment stage that moves `content` values above a size threshold (email
+bodies, tickets, transcripts) out of the events: each value is replaced by a reference to the SHA-256
+of its UTF-8 bytes and kept, gzipped, until the client has uploaded it with a bulk content upload
+(`encode_content_upload`). The client uploads a batch's content before sending the batch, so the
+server can always resolve the references it receives.
+
+Identical bodies are stored and uploaded once per write key; the hashes of the last `max_uploaded`
+uploaded bodies are remembered so they are not uploaded again. The original values are kept per
+event until the event has been sent, so events that end up unsent are logged with their content and
+the events routed to the integration sinks carry it, not the references.
+
+The stage runs in an executor thread while the client reads the pending uploads on the loop, its
+state is guarded by a lock.
+"""
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from cxs.core.client.enrichment import BatchEnricher
+
+if TYPE_CHECKING:
+    from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+CONTENT_REF_PREFIX = "cxs-content:sha256:"
+
+
+def content_ref(digest: str) -> str:
+    return f"{CONTENT_REF_PREFIX}{digest}"
+
+
+def is_content_ref(value: str) -> bool:
+    return isinstance(value, str) and value.startswith(CONTENT_REF_PREFIX)
+
+
+def encode_content_upload(contents: dict[str, bytes]) -> bytes:
+    """
+    The body of a bulk content upload: the gzipped bodies by their SHA-256, base64 encoded.
+    """
+    return json.dumps({
+        "contents": [
+            {"sha256": digest, "encoding": "gzip", "data": base64.b64encode(data).decode("ascii")}
+            for digest, data in contents.items()
+        ]
+    }, separators=(",", ":")).encode("utf-8")
+
+
+def decode_content_upload(body: bytes) -> dict[str, str]:
+    """
+    The content of a bulk upload by SHA-256, as the server restores it.
+    """
+    return {
+        item["sha256"]: gzip.decompress(base64.b64decode(item["data"])).decode("utf-8")
+        for item in json.loads(body)["contents"]
+    }
+
+
+class ContentOffloader(BatchEnricher):
+    """
+    Replaces `content` values larger than `threshold` bytes with content references.
+    """
+    offload = True # Hashing and compressing large bodies is blocking work
+
+    def __init__(self, threshold: int = 16 * 1024, max_uploaded: int = 10000, compresslevel: int = 6):
+        self.threshold = threshold
+        self.max_uploaded = max_uploaded
+        self.compresslevel = compresslevel
+        self.pending: dict[tuple[str | None, str], bytes] = {} # (write key, sha256) -> gzipped body not yet uploaded
+        self._uploaded: OrderedDict[tuple[str | None, str], None] = OrderedDict()
+        self._originals: dict[tuple[str | None, str], dict[str, str]] = {} # (write key, messageId) -> offloaded values, until sent
+        self._lock = threading.Lock()
+
+    def _is_stored(self, identity: tuple[str | None, str]) -> bool:
+        with self._lock:
+            return identity in self._uploaded or identity in self.pending
+
+    def enrich(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        for event in events:
+            if not event.content:
+                continue
+            originals = {}
+            for key, value in event.content.items():
+                if not isinstance(value, str) or len(value) <= self.threshold // 4: # Cheap pre-check, UTF-8 is at most 4 bytes a character
+                    continue
+                raw = value.encode("utf-8")
+                if len(raw) <= self.threshold:
+                    continue
+                digest = hashlib.sha256(raw).hexdigest()
+                identity = (event.write_key, digest)
+                if not self._is_stored(identity): # Compressed outside the lock, a body compressed twice is stored once
+                    data = gzip.compress(raw, compresslevel=self.compresslevel)
+                    with self._lock:
+                        if identity not in self._uploaded:
+                            self.pending.setdefault(identity, data)
+                event.content[key] = content_ref(digest)
+                originals[key] = value
+            if originals and event.messageId:
+                with self._lock:
+                    self._originals.setdefault((event.write_key, event.messageId), {}).update(originals)
+        return events
+
+    def on_sent(self, events: list[SemanticEvent]) -> None:
+        with self._lock:
+            for event in events:
+                self._originals.pop((event.write_key, event.messageId), None)
+
+    def restore_content(self, event: SemanticEvent) -> dict | None:
+        """
+        The content of an event that will not be sent, with the offloaded values restored, and forgets them.
+        None when nothing was offloaded from the event.
+        """
+        with self._lock:
+            originals = self._originals.pop((event.write_key, event.messageId), None)
+        if not originals:
+            return None
+        return {**event.content, **originals}
+
+    def with_content(self, events: list[SemanticEvent]) -> list[SemanticEvent]:
+        """
+        The events with their offloaded values restored, copies of the events that had some; the originals are kept.
+        """
+        with self._lock:
+            originals = [self._originals.get((event.write_key, event.messageId)) for event in events]
+        return [
+            event.model_copy(update={"content": {**event.content, **values}}) if values else event
+            for event, values in zip(events, originals)
+        ]
+
+    def pending_uploads(self, write_key: str | None) -> dict[str, bytes]:
+        """
+        The gzipped bodies of a write key that still have to be uploaded, by SHA-256.
+        """
+        with self._lock:
+            return {digest: data for (key, digest), data in self.pending.items() if key == write_key}
+
+    def mark_uploaded(self, write_key: str | None, digests: list[str]) -> None:
+        with self._lock:
+            for digest in digests:
+                identity = (write_key, digest)
+                self.pending.pop(identity, None)
+                self._uploaded[identity] = None
+                self._uploaded.move_to_end(identity)
+            while len(self._uploaded) > self.max_uploaded:
+                self._uploaded.popitem(last=False)
@@ -0,0 +1,137 @@
+"""
+Delivery reconciliation for the CXS client.
+
+`DeliveryLedger` keeps a compact digest of every acknowledged event per write key and interval of
+event time: the number of events and the XOR of their `event_gid`s. The server computes the same
+digest over what it stored, so after an outage comparing the two tells which intervals lost
+events. Only those intervals are re-sent, from the events the ledger retained for them.
+
+Digests are order independent, so the server can compute them over any storage order.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, Mapping, NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+
+class Digest(NamedTuple):
+    count: int
+    xor: int # XOR of the event_gid UUIDs as 128 bit integers
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "xor": f"{self.xor:032x}"}
+
+    @classmethod
+    def from_value(cls, value: Digest | tuple | Mapping) -> Digest:
+        """
+        A digest from a (count, xor) pair or a dict as returned by `as_dict`, with the xor as hex string or int.
+        """
+        if isinstance(value, Mapping):
+            value = (value["count"], value["xor"])
+        count, xor = value
+        return cls(int(count), int(xor, 16) if isinstance(xor, str) else int(xor))
+
+
+@dataclass
+class IntervalRecord:
+    count: int = 0
+    xor: int = 0
+    events: list[SemanticEvent] | None = field(default_factory=list) # None once the events were evicted
+
+    @property
+    def digest(self) -> Digest:
+        return Digest(self.count, self.xor)
+
+
+class DeliveryLedger:
+    """
+    Digests of the acknowledged events per (write key, interval start), for the last `max_intervals` intervals.
+
+    Up to `max_retained_events` sent events are kept so the intervals that did not arrive can be re-sent.
+    When over the limit, the events of the oldest intervals are released first; their digests are kept and
+    they are reported as unrecoverable when they do not match.
+    """
+
+    def __init__(self, interval: int = 60, max_intervals: int = 1440, max_retained_events: int = 100000):
+        if interval <= 0:
+            raise ValueError("The interval must be a positive number of seconds")
+        self.interval = interval
+        self.max_intervals = max_intervals
+        self.max_retained_events = max_retained_events
+        self._records: OrderedDict[tuple[str | None, int], IntervalRecord] = OrderedDict()
+        self._retained = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def interval_of(self, event: SemanticEvent) -> int:
+        """
+        The start of the interval holding the event's timestamp, in epoch seconds.
+        """
+        seconds = int(event.timestamp.timestamp())
+        return seconds - seconds % self.interval
+
+    def record(self, events: Iterable[SemanticEvent]) -> None:
+        """
+        Adds acknowledged events to the digests of their intervals.
+        """
+        for event in events:
+            key = (event.write_key, self.interval_of(event))
+            record = self._records.get(key)
+            if record is None:
+                record = self._records[key] = IntervalRecord()
+            record.count += 1
+            record.xor ^= event.event_gid.int
+            if record.events is not None and self.max_retained_events > 0:
+                record.events.append(event)
+                self._retained += 1
+
+        while len(self._records) > self.max_intervals:
+            _, record = self._records.popitem(last=False)
+            self._retained -= len(record.events or ())
+        if self._retained > self.max_retained_events:
+            self._release_events()
+
+    def _release_events(self) -> None:
+        for record in self._records.values(): # Oldest intervals first
+            if self._retained <= self.max_retained_events:
+                break
+            if record.events is not None:
+                self._retained -= len(record.events)
+                record.events = None
+
+    def digests(self, write_key: str | None = None) -> dict[int, Digest]:
+        """
+        The digests of one write key by interval start.
+        """
+        return {start: record.digest for (key, start), record in self._records.items() if key == write_key}
+
+    def mismatched(self, server_digests: Mapping[int, Digest | tuple | Mapping], write_key: str | None = None) -> list[int]:
+        """
+        The interval starts whose digest differs from the server's. Intervals the server has no digest for
+        count as missing, pass only the range the server has digests for.
+        """
+        expected = {int(start): Digest.from_value(value) for start, value in server_digests.items()}
+        return [start for start, digest in self.digests(write_key).items() if expected.get(start, Digest(0, 0)) != digest]
+
+    def take(self, intervals: Iterable[int], write_key: str | None = None) -> tuple[list[SemanticEvent], list[int]]:
+        """
+        Removes the given intervals from the ledger and returns their retained events, to be re-sent,
+        and the intervals that no longer had their events (unrecoverable). Re-sent events are recorded
+        again once they are acknowledged.
+        """
+        events, unrecoverable = [], []
+        for start in intervals:
+            record = self._records.pop((write_key, start), None)
+            if record is None:
+                continue
+            if record.events is None:
+                unrecoverable.append(start)
+                continue
+            self._retained -= len(record.events)
+            events.extend(record.events)
+        return events, unrecoverable
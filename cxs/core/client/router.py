@@ -0,0 +1,180 @@
+"""
+Integration fan-out for the CXS client.
+
+`IntegrationRouter` dispatches the events accepted by the CXS endpoint to named sinks (downstream
+destinations), honoring each event's `integrations` flags the Segment way: a flag for the sink's
+name decides, otherwise the `All` flag, otherwise the sink's `enabled_by_default`.
+
+Each event is serialized once; all its sinks queue the same immutable bytes and send them as a
+JSON array. Every sink has its own queue, batching, retries and task, so a slow or failing sink
+only ever backs up (and sheds from) its own queue.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, Mapping, TYPE_CHECKING
+
+from cxs.core.client.batching_queue import BatchingQueue
+from cxs.core.client.serialization import event_json
+
+if TYPE_CHECKING:
+    from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+ALL_INTEGRATIONS = "All"
+
+
+def is_enabled(integrations: Mapping[str, bool] | None, name: str, default: bool = True) -> bool:
+    if integrations:
+        if name in integrations:
+            return bool(integrations[name])
+        if ALL_INTEGRATIONS in integrations:
+            return bool(integrations[ALL_INTEGRATIONS])
+    return default
+
+
+def join_batch(bodies: list[bytes]) -> bytes:
+    """
+    A JSON array body from already serialized events.
+    """
+    return b"[" + b",".join(bodies) + b"]"
+
+
+class Sink:
+    """
+    A named destination. Subclasses implement `send`, which delivers a JSON array body and raises on failure.
+
+    A sink queues at most `max_queue_size` events, further events are dropped until it catches up. Batches of
+    up to `max_batch_size` events are sent once full or after `linger` seconds, failed batches are retried
+    `max_retries` times, `retry_interval` seconds apart.
+    """
+
+    def __init__(self, name: str, enabled_by_default: bool = True, max_batch_size: int = 100, linger: float = 1.0,
+                 max_queue_size: int = 10000, max_retries: int = 3, retry_interval: float = 5.0):
+        self.name = name
+        self.enabled_by_default = enabled_by_default
+        self.max_batch_size = max_batch_size
+        self.linger = linger
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+
+    async def send(self, body: bytes) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class CallbackSink(Sink):
+    """
+    A sink delivering through an async callable, e.g. a message queue producer.
+    """
+
+    def __init__(self, name: str, callback: Callable[[bytes], Awaitable[Any]], **options: Any):
+        super().__init__(name, **options)
+        self.callback = callback
+
+    async def send(self, body: bytes) -> None:
+        await self.callback(body)
+
+
+class HttpSink(Sink):
+    """
+    A sink posting batches to an HTTP endpoint, with its own session.
+    """
+
+    def __init__(self, name: str, url: str, headers: dict | None = None, auth: tuple[str, str] | None = None, **options: Any):
+        super().__init__(name, **options)
+        self.url = url
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.auth = auth
+        self._session = None
+
+    async def send(self, body: bytes) -> None:
+        import aiohttp
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(auth=aiohttp.BasicAuth(*self.auth) if self.auth else None)
+        async with self._session.post(self.url, data=body, headers=self.headers) as response:
+            response.raise_for_status()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class IntegrationRouter:
+
+    def __init__(self, sinks: Iterable[Sink], logger: logging.Logger | None = None):
+        self.sinks = {sink.name: sink for sink in sinks}
+        self.queues = {name: BatchingQueue() for name in self.sinks}
+        self.dropped = {name: 0 for name in self.sinks} # Events shed by backpressure or failed after all retries
+        self.logger = logger or logging.getLogger(__name__)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._closing = False
+
+    def destinations(self, event: SemanticEvent) -> list[str]:
+        integrations = event.integrations
+        return [name for name, sink in self.sinks.items() if is_enabled(integrations, name, sink.enabled_by_default)]
+
+    def route(self, events: Iterable[SemanticEvent]) -> None:
+        """
+        Queues each event, serialized once, on every sink it is enabled for.
+        """
+        for event in events:
+            names = self.destinations(event)
+            if not names:
+                continue
+            body = event_json(event)
+            for name in names:
+                queue = self.queues[name]
+                if queue.qsize() >= self.sinks[name].max_queue_size:
+                    self.dropped[name] += 1
+                    continue
+                queue.put_nowait(body)
+
+    def start(self) -> None:
+        """
+        Starts one sender task per sink, needs a running event loop.
+        """
+        if self._tasks:
+            return
+        self._closing = False
+        for name, sink in self.sinks.items():
+            self._tasks[name] = asyncio.create_task(self._run_sink(sink, self.queues[name]))
+
+    async def _send(self, sink: Sink, bodies: list[bytes], retries: int) -> None:
+        body = join_batch(bodies)
+        for attempt in range(retries + 1):
+            try:
+                await sink.send(body)
+                return
+            except Exception as e:
+                self.logger.warning(f"Sink '{sink.name}' failed to send {len(bodies)} events (attempt {attempt + 1}): {e}")
+                if attempt < retries:
+                    await asyncio.sleep(sink.retry_interval)
+        self.dropped[sink.name] += len(bodies)
+        self.logger.error(f"Sink '{sink.name}' dropped {len(bodies)} events after {retries + 1} attempts.")
+
+    async def _run_sink(self, sink: Sink, queue: BatchingQueue) -> None:
+        while not self._closing:
+            if await queue.wait_for_batch(sink.max_batch_size, linger=sink.linger):
+                await self._send(sink, queue.drain(sink.max_batch_size), sink.max_retries)
+        while not queue.empty(): # Final batches are tried once
+            await self._send(sink, queue.drain(sink.max_batch_size), 0)
+
+    async def close(self, timeout: float | None = None) -> None:
+        """
+        Sends what the sinks still have queued and closes them. Sinks still busy after `timeout` are cancelled.
+        """
+        self._closing = True
+        for queue in self.queues.values():
+            queue.interrupt()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks.values(), timeout=timeout)
+            for task in pending:
+                self.logger.warning(f"Sink task {task.get_name()} did not finish in time, cancelling it.")
+                task.cancel()
+        self._tasks = {}
+        for sink in self.sinks.values():
+            await sink.close()
@@ -0,0 +1,140 @@
+"""
+Batch serialization and compression for the CXS client.
+
+The functions here are module level and side-effect free, so the client can run them inline
+or hand them to a thread or process pool executor.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import zlib
+from typing import Iterator, TYPE_CHECKING
+
+from cxs.core.client.envelope import build_envelope
+
+if TYPE_CHECKING:
+    from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+COMPRESSORS = {
+    "gzip": gzip.compress,
+    "deflate": zlib.compress,
+}
+STREAM_WBITS = {"gzip": 31, "deflate": 15} # zlib window bits producing the same formats as COMPRESSORS
+
+
+def event_payload(event: SemanticEvent, minimize: bool = False) -> dict:
+    """
+    The wire representation of an event: a JSON compatible dict using field aliases, without None values.
+    With `minimize`, empty containers and default values are left out as well.
+    """
+    payload = event.model_dump(mode="json", by_alias=True, exclude_none=True)
+    if minimize:
+        from cxs.core.client.minimizer import minimize as minimize_payload
+        payload = minimize_payload(payload, type(event))
+    return payload
+
+
+def batch_payload(events: list[SemanticEvent], minimize: bool = False) -> list[dict]:
+    return [event_payload(event, minimize) for event in events]
+
+
+def event_json(event: SemanticEvent, minimize: bool = False) -> bytes:
+    """
+    The wire representation of an event as compact JSON bytes, written by the pydantic-core serializer
+    without building the intermediate dict (unless it is minimized).
+    """
+    if minimize:
+        return json.dumps(event_payload(event, minimize), separators=(",", ":")).encode("utf-8")
+    return event.__pydantic_serializer__.to_json(event, by_alias=True, exclude_none=True)
+
+
+def batch_json(events: list[SemanticEvent]) -> bytes:
+    """
+    A batch of events as a compact JSON array, serialized in one pydantic-core call when the events share a model.
+    """
+    model_types = {type(event) for event in events}
+    if len(model_types) == 1:
+        from cxs.schema.pydantic.base import list_adapter # Not at module level, importing the client must not load pydantic
+        return list_adapter(model_types.pop()).dump_json(events, by_alias=True, exclude_none=True)
+    return b"[" + b",".join(event_json(event) for event in events) + b"]"
+
+
+def estimated_size(event: SemanticEvent) -> int:
+    """
+    The size of an event in a batch body, before compression (and before enrichment, when called on queued events).
+    """
+    return len(event_json(event))
+
+
+class SizeEstimator:
+    """
+    Estimates the size of queued events for byte-capped batches without serializing each of them: one event in
+    `sample_every` (and the first of each model) is measured, the others are assumed to have the running
+    average size of their model.
+    """
+
+    def __init__(self, sample_every: int = 16, smoothing: float = 0.2):
+        self.sample_every = sample_every
+        self.smoothing = smoothing
+        self._averages: dict[type, float] = {}
+        self._calls = 0
+
+    def __call__(self, event: SemanticEvent) -> int:
+        self._calls += 1
+        average = self._averages.get(type(event))
+        if average is None or self._calls % self.sample_every == 0:
+            size = estimated_size(event)
+            average = size if average is None else average + self.smoothing * (size - average)
+            self._averages[type(event)] = average
+        return int(average)
+
+
+def compress(body: bytes, compression: str | None) -> bytes:
+    if not compression:
+        return body
+    if compression not in COMPRESSORS:
+        raise ValueError(f"Unsupported compression '{compression}'. Supported: {', '.join(COMPRESSORS)}")
+    return COMPRESSORS[compression](body)
+
+
+def encode_batch(events: list[SemanticEvent], compression: str | None = None, envelope: bool = False,
+                 minimize: bool = False) -> bytes:
+    """
+    Serializes a batch of events to a JSON array, or to a batch envelope with `envelope`,
+    compressed if `compression` is set.
+    """
+    if envelope or minimize:
+        payload = batch_payload(events, minimize)
+        if envelope:
+            payload = build_envelope(payload)
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    else:
+        body = batch_json(events)
+    return compress(body, compression)
+
+
+def iter_batch(events: list[SemanticEvent], compression: str | None = None, minimize: bool = False,
+               chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Serializes a batch of events to a JSON array incrementally, in chunks of about `chunk_size` bytes
+    (before compression), so only one chunk of the body is held in memory at a time.
+    """
+    if compression and compression not in STREAM_WBITS:
+        raise ValueError(f"Unsupported compression '{compression}'. Supported: {', '.join(STREAM_WBITS)}")
+    compressor = zlib.compressobj(wbits=STREAM_WBITS[compression]) if compression else None
+    buffer = bytearray(b"[")
+    for idx, event in enumerate(events):
+        if idx:
+            buffer += b","
+        buffer += event_json(event, minimize)
+        if len(buffer) >= chunk_size:
+            chunk = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+            buffer.clear()
+            if chunk:
+                yield chunk
+    buffer += b"]"
+    if compressor:
+        yield compressor.compress(bytes(buffer)) + compressor.flush()
+    else:
+        yield bytes(buffer)
@@ -0,0 +1,81 @@
+"""
+Per-tenant queues for a multi-tenant CXS client.
+
+`TenantQueues` keeps one FIFO per `write_key` and exposes the subset of the `asyncio.Queue`
+interface the client uses. Tenants are served round-robin, up to `quantum` events per turn,
+so one busy tenant can not starve the others of their send share.
+"""
+import time
+from collections import deque
+from typing import Any, Callable
+
+from cxs.core.client.batching_queue import BatchingQueue
+
+
+def tenant_of(item: Any) -> str | None:
+    return getattr(item, "write_key", None)
+
+
+def split_by_tenant(batch: list) -> list[list]:
+    """
+    Splits a batch into one batch per write key, keeping the order of events within each tenant.
+    """
+    batches: dict[str | None, list] = {}
+    for item in batch:
+        batches.setdefault(tenant_of(item), []).append(item)
+    return list(batches.values())
+
+
+class TenantQueues(BatchingQueue):
+    """
+    A multi-queue keyed by write key.
+
+    `on_shed(item, reason)` is called for events refused because their tenant already has
+    `max_size_per_tenant` queued events ('Shed_TenantBackpressure').
+    """
+
+    def __init__(self, quantum: int = 100, max_size_per_tenant: int = 0,
+                 on_shed: Callable[[Any, str], None] | None = None):
+        super().__init__()
+        self.quantum = quantum
+        self.max_size_per_tenant = max_size_per_tenant
+        self.on_shed = on_shed
+
+        self._queues: dict[str | None, deque] = {} # tenant -> (arrival time, item)
+        self._ring: deque = deque() # Tenants with queued events, the first one is being served
+        self._served = 0 # Events taken from the tenant being served during its current turn
+
+    def tenant_sizes(self) -> dict[str | None, int]:
+        return {tenant: len(queue) for tenant, queue in self._queues.items()}
+
+    def _push(self, item: Any) -> bool:
+        tenant = tenant_of(item)
+        queue = self._queues.get(tenant)
+        if queue is None:
+            queue = self._queues[tenant] = deque()
+            self._ring.append(tenant)
+        elif self.max_size_per_tenant and len(queue) >= self.max_size_per_tenant:
+            if self.on_shed:
+                self.on_shed(item, 'Shed_TenantBackpressure')
+            return False
+
+        queue.append((time.monotonic(), item))
+        return True
+
+    def _pop(self) -> Any:
+        tenant = self._ring[0]
+        queue = self._queues[tenant]
+        _, item = queue.popleft()
+        self._served += 1
+
+        if not queue: # The tenant leaves the ring until it queues again
+            del self._queues[tenant]
+            self._ring.popleft()
+            self._served = 0
+        elif self._served >= self.quantum:
+            self._ring.rotate(-1)
+            self._served = 0
+        return item
+
+    def _oldest_arrival(self) -> float | None:
+        return min((queue[0][0] for queue in self._queues.values()), default=None)
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from aioresponses import aioresponses
+
+from cxs.core.client.aggregation import MetricAggregator, AGGREGATION_KEY
+from cxs.core.client.cxs_client import CXSClient
+from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType
+
+ENTITY_GID = uuid.uuid4()
+
+
+def metric_event(metrics, second=0, event="Request Timed", dimensions=None, event_type=EventType.track):
+    return SemanticEvent(
+        type=event_type,
+        event=event,
+        timestamp=datetime(2024, 1, 1, 12, 0, second, tzinfo=timezone.utc),
+        entity_gid=ENTITY_GID,
+        message_id=f"msg-{uuid.uuid4().hex[:8]}",
+        metrics=metrics,
+        dimensions=dimensions or {"route": "/orders"},
+    )
+
+
+class TestMetricAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime(2024, 1, 1, 12, 0, 5, tzinfo=timezone.utc).timestamp()
+        self.aggregator = MetricAggregator(window=10.0, max_linked_inputs=2, clock=lambda: self.now)
+
+    def test_folds_metrics_per_key_and_window(self):
+        inputs = [metric_event({"duration": d}, second=i) for i, d in enumerate([3.0, 1.0, 5.0])]
+        inputs.append(metric_event({"duration": 7.0, "bytes": 10.0}, second=3))
+        other_route = metric_event({"duration": 2.0}, second=4, dimensions={"route": "/users"})
+        for event in inputs + [other_route]:
+            self.assertTrue(self.aggregator.accepts(event))
+            self.aggregator.add(event)
+
+        self.assertEqual(self.aggregator.flush(), []) # The window is still open
+        self.assertEqual(self.aggregator.next_deadline(), 5.0)
+        self.now += 10
+        summaries = {tuple(s.dimensions.items()): s for s in self.aggregator.flush()}
+        self.assertEqual(len(summaries), 2)
+        self.assertEqual(len(self.aggregator), 0)
+
+        summary = summaries[(("route", "/orders"),)]
+        self.assertEqual(summary.metrics, {
+            "duration_sum": 16.0, "duration_count": 4, "duration_min": 1.0, "duration_max": 7.0,
+            "bytes_sum": 10.0, "bytes_count": 1, "bytes_min": 10.0, "bytes_max": 10.0,
+        })
+        self.assertTrue(all(isinstance(value, float) for value in summary.metrics.values()))
+        self.assertIsNone(self.aggregator.next_deadline())
+        aggregation = summary.underscore_process[AGGREGATION_KEY]
+        self.assertEqual(aggregation["count"], 4)
+        self.assertEqual(aggregation["message_ids"], [inputs[0].messageId, inputs[1].messageId])
+        self.assertTrue(aggregation["message_ids_truncated"])
+        self.assertEqual(summary.timestamp, datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc))
+        self.assertNotIn(summary.messageId, [e.messageId for e in inputs])
+        self.assertNotEqual(summary.event_gid, inputs[0].event_gid)
+
+    def test_only_track_events_with_metrics_are_accepted(self):
+        self.assertFalse(self.aggregator.accepts(metric_event({})))
+        self.assertFalse(self.aggregator.accepts(metric_event({"duration": 1.0}, event_type=EventType.identify)))
+        restricted = MetricAggregator(event_names=["Request Timed"])
+        self.assertFalse(restricted.accepts(metric_event({"duration": 1.0}, event="Order Completed")))
+
+    def test_force_flush_emits_open_windows(self):
+        self.aggregator.add(metric_event({"duration": 1.0}))
+        summary, = self.aggregator.flush(force=True)
+        self.assertEqual(summary.underscore_process[AGGREGATION_KEY]["count"], 1)
+
+
+class TestClientAggregation(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            aggregator=MetricAggregator(window=3600.0),
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    async def test_metric_events_are_sent_as_one_summary_on_close(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            for duration in (1.0, 2.0, 3.0):
+                await self.client._send_event(EventType.track, {"type": "track", "event": "Request Timed", "entity_gid": str(ENTITY_GID),
+                                                                "metrics": {"duration": duration}})
+            self.assertEqual(len(m.requests), 0) # Nothing sent directly
+            await self.client.close()
+
+            (_, calls), = m.requests.items()
+            sent, = json.loads(calls[0].kwargs["data"])
+        self.assertEqual(sent["metrics"]["duration_sum"], 6.0)
+        self.assertEqual(sent["underscore_process"][AGGREGATION_KEY]["count"], 3)
+
+    async def test_summaries_are_sent_when_their_window_closes(self):
+        self.client.aggregator = MetricAggregator(window=0.2)
+        self.client.send_interval = 30.0
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            await self.client._send_event(EventType.track, {"type": "track", "event": "Request Timed", "entity_gid": str(ENTITY_GID),
+                                                            "metrics": {"duration": 1.0}})
+            for _ in range(100):
+                if m.requests:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(len(m.requests), 1) # Sent well before the send interval
+            self.client.send_interval = 0.05
+            await self.client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import asyncio
+import time
+import unittest
+
+from cxs.core.client.batching_queue import BatchingQueue
+
+
+class TestBatchingQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def test_drain_respects_max_items_and_bytes(self):
+        queue = BatchingQueue()
+        for idx in range(10):
+            queue.put_nowait(f"item-{idx}")
+
+        self.assertEqual(queue.drain(3), ["item-0", "item-1", "item-2"])
+        self.assertEqual(queue.drain(10, max_bytes=12, size_of=len), ["item-3", "item-4"])
+        self.assertEqual(len(queue.drain(100)), 5)
+        self.assertTrue(queue.empty())
+        self.assertEqual(queue.drain(10), [])
+
+    async def test_full_batch_is_ready_without_lingering(self):
+        queue = BatchingQueue()
+        waiter = asyncio.create_task(queue.wait_for_batch(3, linger=60.0, timeout=60.0))
+        for idx in range(3):
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            queue.put_nowait(idx)
+
+        self.assertTrue(await asyncio.wait_for(waiter, 1.0))
+
+    async def test_partial_batch_is_ready_after_linger(self):
+        queue = BatchingQueue()
+        started = time.monotonic()
+        waiter = asyncio.create_task(queue.wait_for_batch(100, linger=0.05, timeout=60.0))
+        await asyncio.sleep(0)
+        queue.put_nowait("only")
+
+        self.assertTrue(await asyncio.wait_for(waiter, 1.0))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(queue.drain(100), ["only"])
+
+    async def test_timeout_and_interrupt(self):
+        queue = BatchingQueue()
+        self.assertFalse(await queue.wait_for_batch(1, timeout=0.01))
+
+        waiter = asyncio.create_task(queue.wait_for_batch(1, timeout=60.0))
+        await asyncio.sleep(0)
+        queue.interrupt()
+        self.assertFalse(await asyncio.wait_for(waiter, 1.0))
+
+    async def test_queue_interface(self):
+        queue = BatchingQueue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        await queue.put("late")
+        self.assertEqual(await asyncio.wait_for(getter, 1.0), "late")
+        with self.assertRaises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+
+if __name__ == '__main__':
+    unittest.main()
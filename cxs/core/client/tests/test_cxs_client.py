@@ -1,4 +1,5 @@
 import asyncio
+import json
 import unittest
 from unittest.mock import AsyncMock, MagicMock
 import os
@@ -9,6 +10,7 @@ from datetime import datetime, timezone
 from aioresponses import aioresponses
 
 from cxs.core.client.cxs_client import CXSClient, JsonFormatter
+from cxs.core.client.serialization import encode_batch
 from schema.pydantic.semantic_event import SemanticEvent, EventType
 
 
@@ -76,6 +78,10 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.client.endpoint, "http://test-endpoint.com/v1")
         self.assertEqual(self.client.max_batch_size, 100) # Default
         self.assertEqual(self.client.send_interval, 10.0) # Default
+        # The queue processor is started on first use
+        self.assertFalse(self.client.started)
+        self.assertIsNone(self.client.queue_processor_task)
+        self.client.start()
         self.assertIsNotNone(self.client.queue_processor_task)
         self.assertFalse(self.client.queue_processor_task.done())
 
@@ -104,6 +110,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(custom_client.endpoint, "http://custom-endpoint.com/v2")
         self.assertEqual(custom_client.max_batch_size, 50)
         self.assertEqual(custom_client.send_interval, 5.0)
+        custom_client.start()
         self.assertIsNotNone(custom_client.queue_processor_task)
         self.assertFalse(custom_client.queue_processor_task.done())
 
@@ -164,7 +171,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(returned_event)
         self.assertEqual(returned_event.messageId, "direct-success-id")
         self.assertEqual(self.client.event_queue.qsize(), 0)
-        m.assert_called_once_with(self.client.endpoint, method='POST', json=returned_event.model_dump(by_alias=True, exclude_none=True))
+        m.assert_called_once_with(self.client.endpoint, method='POST', json=returned_event.model_dump(mode="json", by_alias=True, exclude_none=True), headers={'Content-Type': 'application/json'})
 
     async def test_send_event_retryable_error_and_queuing(self):
         """Test _send_event queues event on retryable HTTP error."""
@@ -229,6 +236,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         event2 = self.MinimalSemanticEvent(event_id="batch-evt-2")
 
         # Manually put events onto the queue (as SemanticEvent objects)
+        self.client.start() # The processor is started on first use, the queue is fed directly here
         await self.client.event_queue.put(event1)
         await self.client.event_queue.put(event2)
         self.assertEqual(self.client.event_queue.qsize(), 2)
@@ -243,8 +251,8 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
 
             # Check that the endpoint was called. aioresponses tracks calls.
             # We expect one call for the batch of 2 events.
-            payload_event1 = event1.model_dump(by_alias=True, exclude_none=True)
-            payload_event2 = event2.model_dump(by_alias=True, exclude_none=True)
+            payload_event1 = event1.model_dump(mode="json", by_alias=True, exclude_none=True)
+            payload_event2 = event2.model_dump(mode="json", by_alias=True, exclude_none=True)
 
             # The actual call's data will be a list of these two event payloads
             # Need to ensure the mock was called with a list containing these items
@@ -252,8 +260,8 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
             # We can grab the call arguments and inspect the JSON.
             self.assertTrue(len(m.requests) == 1, "Should have made one call for the batch")
             request_key = ('POST', self.client.endpoint)
-            args, kwargs = m.requests[request_key][0].kwargs # Get the kwargs of the first call
-            sent_json = kwargs['json']
+            kwargs = m.requests[request_key][0].kwargs # Get the kwargs of the first call
+            sent_json = json.loads(kwargs['data']) # Batches are sent as pre-encoded JSON bytes
             self.assertIsInstance(sent_json, list)
             self.assertEqual(len(sent_json), 2)
             # Check if the sent JSON objects match our event payloads
@@ -274,6 +282,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         self.client.unsent_events_logger.setLevel(logging.CRITICAL) # Keep this quiet unless testing its output
 
         event_to_batch = self.MinimalSemanticEvent(event_id="batch-fail-id")
+        self.client.start()
         await self.client.event_queue.put(event_to_batch)
         self.assertEqual(self.client.event_queue.qsize(), 1)
 
@@ -286,7 +295,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
             await asyncio.sleep(self.client.send_interval * 2 + 0.1) # Wait for batch processor
 
             # Endpoint should have been called
-            m.assert_called_once_with(self.client.endpoint, method='POST', json=[event_to_batch.model_dump(by_alias=True, exclude_none=True)])
+            m.assert_called_once_with(self.client.endpoint, method='POST', data=encode_batch([event_to_batch]), headers={'Content-Type': 'application/json'})
 
             # Event should be re-queued
             self.assertEqual(self.client.event_queue.qsize(), 1)
@@ -327,6 +336,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         # Temporarily remove other handlers from unsent_events_logger to ensure only file output
         # Or ensure its level is high enough. For this test, we only care about the file.
 
+        self.client.start()
         event_to_log = self.MinimalSemanticEvent(event_id="shutdown-log-id")
         await self.client.event_queue.put(event_to_log)
 
@@ -361,6 +371,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         self.client.logger.setLevel(logging.CRITICAL)
         self.client.unsent_events_logger.setLevel(logging.CRITICAL)
 
+        self.client.start()
         event_in_queue = self.MinimalSemanticEvent(event_id="shutdown-process-id")
         await self.client.event_queue.put(event_in_queue)
         self.assertEqual(self.client.event_queue.qsize(), 1)
@@ -388,7 +399,7 @@ class TestCXSClient(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.client.event_queue.qsize(), 0, "Queue should be empty after graceful shutdown.")
 
         # Check that the batch endpoint was called for the event
-        m.assert_called_once_with(self.client.endpoint, method='POST', json=[event_in_queue.model_dump(by_alias=True, exclude_none=True)])
+        m.assert_called_once_with(self.client.endpoint, method='POST', data=encode_batch([event_in_queue]), headers={'Content-Type': 'application/json'})
 
         # Verify that the file handler's close method was called
         file_handler.close.assert_called_once()
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.deferred import fast_construct, validation_input, validate_inputs
+from cxs.core.client.lanes import PriorityLanes
+from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType
+
+
+class TestDeferredHelpers(unittest.TestCase):
+
+    def test_validation_input_uses_aliases_and_keeps_raw_keys(self):
+        raw = {"type": "track", "event": "Order Completed", "involves.id": ["1"], "involves.label": ["a"],
+               "involves.role": ["Buyer"], "involves.entity_type": ["Person"], "involves.entity_gid": [None],
+               "involves.id_type": ["Shop"], "entity_gid": str(uuid.uuid4())}
+        event = fast_construct(raw)
+        event.messageId = "deferred-1"
+
+        values = validation_input(event, raw)
+        self.assertEqual(values["message_id"], "deferred-1")
+        self.assertIn("involves.id", values)
+
+        (validated, error), = validate_inputs([values])
+        self.assertIsNone(error)
+        self.assertIsInstance(validated, SemanticEvent)
+        self.assertEqual(validated.messageId, "deferred-1")
+        self.assertEqual(validated.involves[0].role, "Buyer")
+
+    def test_validate_inputs_reports_errors(self):
+        (validated, error), = validate_inputs([{"type": "not-a-type", "event": "x", "entity_gid": str(uuid.uuid4())}])
+        self.assertIsNone(validated)
+        self.assertIn("type", error)
+
+
+class TestDeferredValidationClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            deferred_validation=True,
+            validation_executor=self.executor,
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            await self.client.close()
+        self.executor.shutdown()
+        self.test_dir.cleanup()
+
+    async def test_send_event_skips_validation_and_queues(self):
+        event = await self.client._send_event(EventType.track, {"event": "Fast Event", "entity_gid": str(uuid.uuid4())})
+
+        self.assertFalse(self.client.direct_send)
+        self.assertIn(event.messageId, self.client._pending_validation)
+        self.assertNotIn("event_gid", event.__dict__) # pre_init has not run yet
+
+        validated, = await self.client._validate_deferred_events([event])
+        self.assertIsInstance(validated.event_gid, uuid.UUID)
+        self.assertEqual(validated.messageId, event.messageId)
+        self.assertEqual(validated.write_key, "test-write-key")
+        self.assertNotIn(event.messageId, self.client._pending_validation)
+        self.client.event_queue.drain(10) # Validated here, the queued copy is not sent
+
+    async def test_invalid_events_are_dead_lettered(self):
+        self.client._log_unsent_event = MagicMock()
+        good = await self.client._send_event(EventType.track, {"event": "Good Event", "entity_gid": str(uuid.uuid4())})
+        bad = await self.client._send_event(EventType.track, {"event": "Bad Event", "entity_gid": "not-a-uuid"})
+
+        validated = await self.client._validate_deferred_events([good, bad])
+        self.client.event_queue.drain(10)
+
+        self.assertEqual([e.messageId for e in validated], [good.messageId])
+        self.client._log_unsent_event.assert_called_once()
+        args, kwargs = self.client._log_unsent_event.call_args
+        self.assertEqual(args[3], 'DeferredValidationFailed')
+        self.assertIn(bad.messageId, args[1])
+
+    async def test_shed_events_are_logged_raw_and_forgotten(self):
+        self.client.event_queue = PriorityLanes(max_size=1, on_shed=self.client._on_event_shed)
+        self.client._log_unsent_event = MagicMock()
+        raw = {"event": "Shed Event", "entity_gid": str(uuid.uuid4()), "importance": 1}
+        shed = await self.client._send_event(EventType.track, raw)
+        kept = await self.client._send_event(EventType.track, {**raw, "event": "Kept Event", "importance": 5})
+
+        self.assertEqual(list(self.client._pending_validation), [kept.messageId])
+        args, kwargs = self.client._log_unsent_event.call_args
+        self.assertEqual((args[2], args[3]), (raw, 'Shed_Backpressure'))
+        self.assertIn(shed.messageId, args[1])
+
+        self.client.event_queue.shed_below(6)
+        self.assertEqual(self.client._pending_validation, {})
+
+    async def test_unvalidated_events_are_validated_before_sending(self):
+        event = await self.client._send_event(EventType.track, {"event": "Fast Event", "entity_gid": str(uuid.uuid4())})
+        self.client._pending_validation.clear() # The raw input is lost, the event must still not go out unvalidated
+        self.client.event_queue.drain(10)
+
+        with aioresponses() as m, warnings.catch_warnings():
+            warnings.simplefilter("error") # Dumping an unvalidated event warns
+            m.post(self.client.endpoint, status=200)
+            self.assertTrue(await self.client._send_batch_events([event]))
+            (_, calls), = m.requests.items()
+        sent, = json.loads(calls[0].kwargs["data"])
+        self.assertEqual(sent["message_id"], event.messageId)
+        self.assertIn("event_gid", sent)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from aioresponses import aioresponses, CallbackResult
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.endpoints import EndpointPool
+from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType
+
+ENDPOINTS = ["http://ingest-a.test/v1", "http://ingest-b.test/v1", "http://ingest-c.test/v1"]
+
+
+def make_event(idx=0):
+    return SemanticEvent(type=EventType.track, event="Order Completed", timestamp=datetime.now(timezone.utc),
+                         entity_gid=uuid.uuid4(), message_id=f"msg-{idx}")
+
+
+class TestEndpointPool(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.pool = EndpointPool(ENDPOINTS, failure_threshold=2, cooldown=10.0, min_latency_samples=5, clock=lambda: self.now)
+
+    def test_routing_is_sticky_per_key(self):
+        self.assertEqual(len({self.pool.primary("tenant-a") for _ in range(10)}), 1)
+        self.assertGreater(len({self.pool.primary(f"tenant-{idx}") for idx in range(50)}), 1)
+
+    def test_unhealthy_endpoint_is_skipped_until_cooldown(self):
+        primary = self.pool.primary("tenant-a")
+        alternate = self.pool.alternate("tenant-a", exclude=primary)
+        self.pool.record_failure(primary)
+        self.assertEqual(self.pool.primary("tenant-a"), primary)
+        self.pool.record_failure(primary)
+        self.assertFalse(self.pool.is_healthy(primary))
+        self.assertEqual(self.pool.primary("tenant-a"), alternate)
+
+        self.now += 10.0
+        self.assertEqual(self.pool.primary("tenant-a"), primary)
+
+    def test_all_endpoints_are_used_when_none_is_healthy(self):
+        for endpoint in ENDPOINTS:
+            for _ in range(2):
+                self.pool.record_failure(endpoint)
+        self.assertEqual(sorted(self.pool.healthy_endpoints()), sorted(ENDPOINTS))
+
+    def test_latency_percentile(self):
+        self.assertIsNone(self.pool.latency_percentile(0.95))
+        for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+            self.pool.record_success(ENDPOINTS[0], latency)
+        self.assertEqual(self.pool.latency_percentile(0.8), 0.4)
+        self.assertEqual(self.pool.latency_percentile(0.95), 1.0)
+
+
+class TestClientEndpoints(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint=ENDPOINTS[:2],
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            hedge_requests=True,
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+        self.primary = self.client.endpoint_pool.primary("test-write-key")
+        self.alternate = self.client.endpoint_pool.alternate("test-write-key", exclude=self.primary)
+
+    async def asyncTearDown(self):
+        with aioresponses() as m:
+            for endpoint in ENDPOINTS:
+                m.post(endpoint, status=200, repeat=True)
+            await self.client.close()
+        self.test_dir.cleanup()
+
+    async def test_failover_to_another_endpoint(self):
+        with aioresponses() as m:
+            m.post(self.primary, status=503)
+            m.post(self.alternate, status=200)
+            self.assertTrue(await self.client._send_batch_events([make_event()]))
+
+        self.assertEqual(self.client.endpoint_pool.health[self.primary].failures, 1)
+        self.assertEqual(self.client.endpoint_pool.health[self.alternate].requests, 1)
+
+    async def test_slow_request_is_hedged(self):
+        for _ in range(20):
+            self.client.endpoint_pool.record_success(self.primary, 0.01)
+
+        async def slow(url, **kwargs):
+            await asyncio.sleep(5)
+            return CallbackResult(status=200)
+
+        with aioresponses() as m:
+            m.post(self.primary, callback=slow)
+            m.post(self.alternate, status=200)
+            sent = await asyncio.wait_for(self.client._send_batch_events([make_event(1)]), timeout=2.0)
+
+            self.assertTrue(sent)
+            hedged_request, = [calls for (method, url), calls in m.requests.items() if str(url) == self.alternate]
+            self.assertEqual(json.loads(hedged_request[0].kwargs["data"])[0]["message_id"], "msg-1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import logging
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import threading
+import uuid
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+
+from cxs.core.client.enrichment import (
+    BatchEnricher,
+    EnrichmentPipeline,
+    EventTypeEnricher,
+    IdentifyCoalescer,
+    KeyedEnricher,
+    RuntimeContextEnricher,
+)
+from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType, Library, Traits, Context
+
+
+def make_event(event_type=EventType.track, **kwargs):
+    return SemanticEvent(
+        type=event_type,
+        event="Test Event",
+        timestamp=datetime.now(timezone.utc),
+        entity_gid=uuid.uuid4(),
+        **kwargs
+    )
+
+
+class CountingIPEnricher(KeyedEnricher):
+    def __init__(self):
+        self.lookups = []
+
+    def key(self, event):
+        return event.context.ip if event.context else None
+
+    def lookup_many(self, keys):
+        self.lookups.append(set(keys))
+        return {ip: f"region-of-{ip}" for ip in keys}
+
+    def apply(self, event, value):
+        event.context.region = value
+
+
+class FailingEnricher(BatchEnricher):
+    def enrich(self, events):
+        raise RuntimeError("boom")
+
+
+class FailingOnSentEnricher(BatchEnricher):
+    def enrich(self, events):
+        return events
+
+    def on_sent(self, events):
+        raise RuntimeError("boom")
+
+
+class FailingLedger:
+    def record(self, events):
+        raise RuntimeError("boom")
+
+
+class ThreadRecordingEnricher(BatchEnricher):
+    offload = True
+
+    def __init__(self):
+        self.thread_name = None
+
+    def enrich(self, events):
+        self.thread_name = threading.current_thread().name
+        return events
+
+
+class TestEnrichers(unittest.TestCase):
+
+    def test_keyed_enricher_looks_up_each_distinct_key_once(self):
+        events = [make_event(context=Context(ip=ip)) for ip in ["1.1.1.1", "2.2.2.2", "1.1.1.1", "1.1.1.1"]]
+        events.append(make_event())
+        enricher = CountingIPEnricher()
+
+        enricher(events)
+
+        self.assertEqual(enricher.lookups, [{"1.1.1.1", "2.2.2.2"}])
+        self.assertEqual([e.context.region for e in events[:4]], ["region-of-1.1.1.1", "region-of-2.2.2.2", "region-of-1.1.1.1", "region-of-1.1.1.1"])
+        self.assertIsNone(events[4].context)
+
+    def test_runtime_context_enricher_shares_sub_models(self):
+        enricher = RuntimeContextEnricher(library=Library(name="lib", version="1"), hostname="host-1", app_name="app")
+        events = enricher([make_event(), make_event()])
+
+        self.assertEqual(events[0].context.hostname, "host-1")
+        self.assertEqual(events[0].app.name, "app")
+        self.assertIs(events[0].os, events[1].os)
+
+    def test_event_type_enricher(self):
+        identify = make_event(EventType.identify, traits={"email": "someone@example.com"})
+        page = make_event(EventType.page)
+        track = make_event()
+
+        EventTypeEnricher()([identify, page, track])
+
+        self.assertEqual(identify.event, "User Identified")
+        self.assertIsInstance(identify.traits, Traits)
+        self.assertEqual(identify.traits.email, "someone@example.com")
+        self.assertEqual(page.event, "Page Viewed")
+        self.assertEqual(track.event, "Test Event")
+
+    def test_identify_coalescer_merges_per_user(self):
+        first = make_event(EventType.identify, user_id="u1", traits={"email": "old@example.com", "name": "Someone"})
+        other_user = make_event(EventType.identify, user_id="u2", traits={"name": "Other"})
+        other_track = make_event(user_id="u2")
+        second = make_event(EventType.identify, user_id="u1", traits={"email": "new@example.com"})
+
+        events = IdentifyCoalescer()([first, other_user, other_track, second])
+
+        self.assertEqual(events, [other_user, other_track, second])
+        self.assertEqual((second.traits.email, second.traits.name), ("new@example.com", "Someone"))
+        self.assertEqual(second.underscore_process["coalesced_message_ids"], [first.messageId])
+
+    def test_identify_coalescer_keeps_identifies_around_the_users_events(self):
+        identify = lambda email: make_event(EventType.identify, user_id="u1", traits={"email": email})
+        coalescer = IdentifyCoalescer()
+        coalescer.on_sent([identify("a@example.com")])
+        changed, track, back = identify("b@example.com"), make_event(user_id="u1"), identify("a@example.com")
+
+        self.assertEqual(coalescer([changed, track, back]), [changed, track, back]) # Not merged across the track event
+        self.assertEqual(changed.traits.email, "b@example.com")
+        self.assertEqual(coalescer([identify("a@example.com")]), []) # Unchanged since the last one sent
+
+    def test_identify_coalescer_suppresses_unchanged_traits_once_sent(self):
+        coalescer = IdentifyCoalescer(max_users=1)
+        identify = lambda user_id: make_event(EventType.identify, user_id=user_id, traits={"email": "same@example.com"})
+
+        sent = coalescer([identify("u1")])
+        self.assertEqual(len(coalescer([identify("u1")])), 1) # Not acknowledged yet, e.g. the batch failed
+        coalescer.on_sent(sent)
+        self.assertEqual(coalescer([identify("u1")]), [])
+        self.assertEqual(len(coalescer([make_event(EventType.identify, user_id="u1", traits={"email": "changed@example.com"})])), 1)
+
+        coalescer.on_sent([identify("u2")]) # Evicts u1
+        self.assertEqual(len(coalescer([identify("u1")])), 1)
+
+
+class TestEnrichmentPipeline(unittest.IsolatedAsyncioTestCase):
+
+    async def test_failing_stage_is_skipped(self):
+        pipeline = EnrichmentPipeline([FailingEnricher(), EventTypeEnricher()])
+        events = await pipeline.run([make_event(EventType.screen)])
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].event, "Screen Viewed")
+
+    async def test_offloaded_stage_runs_in_executor(self):
+        stage = ThreadRecordingEnricher()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="enrich") as executor:
+            pipeline = EnrichmentPipeline([stage], executor=executor)
+            await pipeline.run([make_event()])
+
+        self.assertTrue(stage.thread_name.startswith("enrich"))
+
+
+class TestClientAcknowledgement(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            enrichers=[FailingOnSentEnricher()],
+            delivery_ledger=FailingLedger(),
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    async def test_failing_post_send_hooks_do_not_resend(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            self.assertTrue(await self.client._send_batch_events([make_event()]))
+            self.assertIsNotNone(await self.client._send_event(EventType.track, {"type": "track", "event": "Direct", "entity_gid": str(uuid.uuid4())}))
+            self.assertTrue(self.client.event_queue.empty())
+            await self.client.close()
+
+            (_, calls), = m.requests.items()
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
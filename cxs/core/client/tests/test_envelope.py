@@ -0,0 +1,51 @@
+import json
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from cxs.core.client.enrichment import RuntimeContextEnricher
+from cxs.core.client.envelope import build_envelope, expand_batch, expand_envelope, SHARED_REF
+from cxs.core.client.serialization import batch_payload, encode_batch
+from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType, Library
+
+
+def make_events(count, write_key="test-write-key"):
+    events = [
+        SemanticEvent(type=EventType.track, event="Order Completed", timestamp=datetime.now(timezone.utc),
+                      entity_gid=uuid.uuid4(), message_id=f"msg-{idx}", write_key=write_key,
+                      library=Library(name="python-cxs-client", version="0.1.0"))
+        for idx in range(count)
+    ]
+    enricher = RuntimeContextEnricher(library=Library(name="python-cxs-client", version="0.1.0"), hostname="worker-1",
+                                      pod_name="ingest-7d9f", pod_namespace="production", app_name="orders",
+                                      app_namespace="commerce", app_version="2.4.1", app_build="1187")
+    return enricher(events)
+
+
+class TestEnvelope(unittest.TestCase):
+
+    def test_round_trip(self):
+        events = make_events(3) + make_events(2, write_key="other-write-key")
+        payload = batch_payload(events)
+        envelope = build_envelope(payload)
+
+        self.assertEqual(len(envelope["shared"]), 2)
+        self.assertEqual([e[SHARED_REF] for e in envelope["events"]], [0, 0, 0, 1, 1])
+        self.assertNotIn("context", envelope["events"][0])
+        self.assertEqual(expand_envelope(envelope), payload)
+
+    def test_expand_batch_accepts_both_formats(self):
+        events = make_events(2)
+        self.assertEqual(expand_batch(encode_batch(events, envelope=True)), expand_batch(encode_batch(events)))
+
+    def test_envelope_is_smaller(self):
+        events = make_events(50)
+        self.assertLess(len(encode_batch(events, envelope=True)), len(encode_batch(events)) * 0.7)
+
+    def test_unknown_version_is_rejected(self):
+        with self.assertRaises(ValueError):
+            expand_envelope({"envelope": 99, "shared": [], "events": []})
+
+
+if __name__ == '__main__':
+    unittest.main()
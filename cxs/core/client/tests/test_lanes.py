@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import unittest
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.lanes import PriorityLanes, importance_of
+from cxs.core.client.tests.test_envelope import make_events
+
+
+def item(importance, name=""):
+    return SimpleNamespace(importance=importance, name=name, messageId=name, model_dump=lambda **kwargs: {"name": name})
+
+
+class TestPriorityLanes(unittest.IsolatedAsyncioTestCase):
+
+    async def test_importance_of_defaults_and_clamps(self):
+        self.assertEqual(importance_of(item(None)), 3)
+        self.assertEqual(importance_of(item(9)), 5)
+        self.assertEqual(importance_of(item(0)), 1)
+
+    async def test_weighted_drain_favours_important_lanes(self):
+        lanes = PriorityLanes(latency_targets={level: 3600.0 for level in range(1, 6)})
+        for _ in range(60):
+            lanes.put_nowait(item(5))
+            lanes.put_nowait(item(1))
+
+        drained = Counter(lanes.get_nowait().importance for _ in range(60))
+        self.assertEqual(drained[5], 50)
+        self.assertEqual(drained[1], 10)
+        self.assertEqual(lanes.qsize(), 60)
+
+    async def test_overdue_lane_is_drained_first(self):
+        lanes = PriorityLanes(latency_targets={1: 0.0, 5: 3600.0})
+        lanes.put_nowait(item(5, "important"))
+        lanes.put_nowait(item(1, "overdue"))
+
+        self.assertEqual(lanes.get_nowait().name, "overdue")
+        self.assertEqual(lanes.get_nowait().name, "important")
+        with self.assertRaises(asyncio.QueueEmpty):
+            lanes.get_nowait()
+
+    async def test_latency_target_makes_a_lingering_batch_due(self):
+        lanes = PriorityLanes(latency_targets={1: 3600.0, 5: 0.05})
+        started = time.monotonic()
+        waiter = asyncio.create_task(lanes.wait_for_batch(100, linger=60.0, timeout=60.0))
+        lanes.put_nowait(item(1, "telemetry"))
+        await asyncio.sleep(0.01)
+        lanes.put_nowait(item(5, "payment"))
+
+        self.assertTrue(await asyncio.wait_for(waiter, 1.0))
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(lanes.get_nowait().name, "payment")
+
+    async def test_backpressure_sheds_least_important_first(self):
+        on_shed = MagicMock()
+        lanes = PriorityLanes(max_size=2, on_shed=on_shed)
+        lanes.put_nowait(item(1, "low"))
+        lanes.put_nowait(item(4, "high"))
+        lanes.put_nowait(item(5, "highest"))
+        lanes.put_nowait(item(2, "refused"))
+
+        self.assertEqual(lanes.lane_sizes(), {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+        self.assertEqual([(call.args[0].name, call.args[1]) for call in on_shed.call_args_list],
+                         [("low", "Shed_Backpressure"), ("refused", "Shed_Backpressure")])
+
+    async def test_get_waits_for_items(self):
+        lanes = PriorityLanes()
+        getter = asyncio.create_task(lanes.get())
+        await asyncio.sleep(0)
+        self.assertFalse(getter.done())
+
+        lanes.put_nowait(item(2, "late"))
+        self.assertEqual((await asyncio.wait_for(getter, 1.0)).name, "late")
+
+
+class TestClientDegradedMode(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            priority_lanes=True,
+            degraded_after_failures=2,
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+        self.client.start()
+        self.client._shutdown_event.set() # Keep the processor from draining the lanes during the test
+        await self.client.queue_processor_task
+
+    async def asyncTearDown(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            await self.client.close()
+        self.test_dir.cleanup()
+
+    async def test_degraded_client_sheds_low_importance(self):
+        self.client._log_unsent_event = MagicMock()
+        lanes = self.client.event_queue
+        self.assertIsInstance(lanes, PriorityLanes)
+        for importance in (1, 2, 3, 5):
+            lanes.put_nowait(item(importance, f"evt-{importance}"))
+
+        self.client._update_degraded_state(False)
+        self.assertFalse(self.client.degraded)
+        self.client._update_degraded_state(False)
+        self.assertTrue(self.client.degraded)
+        self.assertEqual(lanes.qsize(), 2)
+        self.assertEqual({call.args[3] for call in self.client._log_unsent_event.call_args_list}, {'Shed_Degraded'})
+
+        self.client._update_degraded_state(True)
+        self.assertFalse(self.client.degraded)
+        self.assertIsNone(lanes.min_importance)
+
+    async def test_refused_batches_do_not_degrade_the_client(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=401, repeat=True)
+            for _ in range(3):
+                self.assertFalse(await self.client._send_batch_events(make_events(1)))
+            self.assertFalse(self.client.degraded)
+
+            m.clear()
+            m.post(self.client.endpoint, status=503, repeat=True)
+            for _ in range(2):
+                self.assertFalse(await self.client._send_batch_events(make_events(1)))
+            self.assertTrue(self.client.degraded)
+
+    async def test_lanes_can_not_replace_tenant_queues(self):
+        with self.assertRaises(ValueError):
+            CXSClient(write_key=None, priority_lanes=True, log_file_path=None)
+        client = CXSClient(write_key=None, priority_lanes=True, multi_tenant=False, log_file_path=None)
+        self.assertIsInstance(client.event_queue, PriorityLanes)
+
+
+if __name__ == '__main__':
+    unittest.main()
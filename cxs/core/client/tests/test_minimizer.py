@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from cxs.core.client.minimizer import minimize, plan_for
+from cxs.core.client.serialization import encode_batch, event_payload
+from cxs.core.client.tests.test_envelope import make_events
+from cxs.schema.pydantic.semantic_event import SemanticEvent, Commerce
+
+
+class TestMinimizer(unittest.TestCase):
+
+    def test_drops_empty_containers_and_defaults(self):
+        event, = make_events(1)
+        minimized = event_payload(event, minimize=True)
+
+        for key in ("dimensions", "metrics", "involves", "classification", "customer_facing", "partition"):
+            self.assertIn(key, event_payload(event))
+            self.assertNotIn(key, minimized)
+        self.assertEqual(minimized["context"], {"hostname": "worker-1"})
+        self.assertEqual(minimized["event"], "Order Completed")
+
+    def test_server_restores_the_minimized_payload(self):
+        event, = make_events(1)
+        event.commerce = Commerce(order_id="order-1", products=[{"product_id": "p1", "units": 2}])
+        event.dimensions = {"channel": "web"}
+
+        restored = SemanticEvent.model_validate(event_payload(event, minimize=True))
+        self.assertEqual(restored.model_dump(mode="json", by_alias=True, exclude_none=True), event_payload(event))
+
+    def test_required_fields_are_kept(self):
+        self.assertEqual(minimize({"event": "", "type": "track"}, SemanticEvent), {"event": "", "type": "track"})
+
+    def test_plan_is_computed_once_per_class(self):
+        self.assertIs(plan_for(SemanticEvent), plan_for(SemanticEvent))
+        self.assertIs(plan_for(SemanticEvent)["commerce"].model, Commerce)
+
+    def test_minimized_batches_are_smaller(self):
+        events = make_events(20)
+        self.assertLess(len(encode_batch(events, minimize=True)), len(encode_batch(events)) * 0.6)
+        self.assertEqual(len(json.loads(encode_batch(events, minimize=True))), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+from aioresponses import aioresponses
+from yarl import URL
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.offload import ContentOffloader, content_ref, decode_content_upload, encode_content_upload, is_content_ref
+from cxs.core.client.tests.test_envelope import make_events
+from cxs.schema.pydantic.semantic_event import EventType
+
+TRANSCRIPT = "Agent: Hello, how can I help you today?\n" * 500
+
+
+class TestContentOffloader(unittest.TestCase):
+
+    def test_large_content_is_replaced_by_a_reference(self):
+        offloader = ContentOffloader(threshold=1024)
+        event, = make_events(1)
+        event.content = {"Transcript": TRANSCRIPT, "Subject": "Refund request"}
+
+        offloader.enrich([event])
+        digest = hashlib.sha256(TRANSCRIPT.encode("utf-8")).hexdigest()
+        self.assertEqual(event.content, {"Transcript": content_ref(digest), "Subject": "Refund request"})
+        self.assertTrue(is_content_ref(event.content["Transcript"]))
+
+        uploads = offloader.pending_uploads("test-write-key")
+        self.assertEqual(list(uploads), [digest])
+        self.assertLess(len(uploads[digest]), len(TRANSCRIPT) / 10)
+        self.assertEqual(decode_content_upload(encode_content_upload(uploads)), {digest: TRANSCRIPT})
+
+    def test_identical_bodies_are_uploaded_once(self):
+        offloader = ContentOffloader(threshold=1024)
+        events = make_events(3)
+        for event in events:
+            event.content = {"Body": TRANSCRIPT}
+        offloader.enrich(events[:2])
+        self.assertEqual(len(offloader.pending), 1)
+
+        offloader.mark_uploaded("test-write-key", list(offloader.pending_uploads("test-write-key")))
+        offloader.enrich(events[2:])
+        self.assertEqual(offloader.pending, {})
+        self.assertEqual(len({event.content["Body"] for event in events}), 1)
+
+    def test_original_content_is_kept_until_sent(self):
+        offloader = ContentOffloader(threshold=1024)
+        sent, unsent = make_events(2)
+        for event in (sent, unsent):
+            event.content = {"Transcript": TRANSCRIPT, "Subject": "Refund request"}
+        offloader.enrich([sent, unsent])
+
+        offloader.on_sent([sent])
+        self.assertIsNone(offloader.restore_content(sent))
+        self.assertEqual(offloader.restore_content(unsent), {"Transcript": TRANSCRIPT, "Subject": "Refund request"})
+        self.assertTrue(is_content_ref(unsent.content["Transcript"]))
+        self.assertIsNone(offloader.restore_content(unsent)) # Forgotten once restored
+
+    def test_with_content_copies_events_with_offloaded_values(self):
+        offloader = ContentOffloader(threshold=1024)
+        large, small = make_events(2)
+        large.content, small.content = {"Transcript": TRANSCRIPT}, {"Subject": "Refund request"}
+        offloader.enrich([large, small])
+
+        restored, unchanged = offloader.with_content([large, small])
+        self.assertEqual(restored.content, {"Transcript": TRANSCRIPT})
+        self.assertTrue(is_content_ref(large.content["Transcript"]))
+        self.assertIs(unchanged, small)
+        self.assertEqual(offloader.restore_content(large), {"Transcript": TRANSCRIPT}) # Still kept
+
+    def test_content_is_kept_per_write_key(self):
+        offloader = ContentOffloader(threshold=1024)
+        events = make_events(1) + make_events(1, write_key="other-write-key")
+        for event in events:
+            event.content = {"Body": TRANSCRIPT}
+        offloader.enrich(events)
+        self.assertEqual(len(offloader.pending_uploads("test-write-key")), 1)
+        self.assertEqual(len(offloader.pending_uploads("other-write-key")), 1)
+
+
+class TestClientContentOffload(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            direct_send=False,
+            content_offloader=ContentOffloader(threshold=1024),
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    async def test_content_is_uploaded_before_the_batch(self):
+        with aioresponses() as m:
+            m.post(self.client.content_endpoint, status=200)
+            m.post(self.client.endpoint, status=200)
+            for idx in range(2):
+                await self.client._send_event(EventType.track, {"type": "track", "event": "Call Ended", "entity_gid": str(uuid.uuid4()),
+                                                                "message_id": f"msg-{idx}", "content": {"Transcript": TRANSCRIPT}})
+            await self.client.close()
+
+            uploads = m.requests[("POST", URL(self.client.content_endpoint))]
+            batches = m.requests[("POST", URL(self.client.endpoint))]
+        self.assertEqual(len(uploads), 1)
+        self.assertEqual(list(decode_content_upload(uploads[0].kwargs["data"]).values()), [TRANSCRIPT])
+        sent = json.loads(batches[0].kwargs["data"])
+        self.assertEqual(len(sent), 2)
+        self.assertTrue(all(is_content_ref(event["content"]["Transcript"]) for event in sent))
+        self.assertLess(len(batches[0].kwargs["data"]), 5000)
+
+    async def test_routed_events_carry_their_content(self):
+        self.client.router = MagicMock(close=AsyncMock())
+        with aioresponses() as m:
+            m.post(self.client.content_endpoint, status=200)
+            m.post(self.client.endpoint, status=200)
+            await self.client._send_event(EventType.track, {"type": "track", "event": "Call Ended", "entity_gid": str(uuid.uuid4()),
+                                                            "message_id": "msg-0", "content": {"Transcript": TRANSCRIPT}})
+            await self.client.close()
+
+        (routed,), = self.client.router.route.call_args.args
+        self.assertEqual(routed.content, {"Transcript": TRANSCRIPT})
+        self.assertEqual(self.client.content_offloader._originals, {}) # Forgotten once sent
+
+    async def test_unsent_events_are_logged_with_their_content(self):
+        with aioresponses() as m:
+            m.post(self.client.content_endpoint, status=200, repeat=True)
+            m.post(self.client.endpoint, status=503, repeat=True)
+            await self.client._send_event(EventType.track, {"type": "track", "event": "Call Ended", "entity_gid": str(uuid.uuid4()),
+                                                            "message_id": "msg-0", "content": {"Transcript": TRANSCRIPT}})
+            await self.client.close()
+
+        with open(os.path.join(self.test_dir.name, "unsent_events.log")) as log:
+            records = [json.loads(line) for line in log]
+        final = [record for record in records if record["reason"] == "NotSent_Shutdown_FinalBatchFailed"]
+        self.assertEqual(final[-1]["event_data"]["content"], {"Transcript": TRANSCRIPT})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.partitioning import PartitionBatcher, sort_key
+from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType
+
+ENTITY_A, ENTITY_B = sorted([uuid.uuid4(), uuid.uuid4()], key=str)
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_event(entity_gid, partition="", second=0):
+    return SemanticEvent(type=EventType.track, event="Order Completed", timestamp=START + timedelta(seconds=second),
+                         entity_gid=entity_gid, partition=partition, message_id=f"{partition}-{entity_gid}-{second}")
+
+
+class TestPartitionBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.batcher = PartitionBatcher(min_group_size=2, max_group_wait=1.0, clock=lambda: self.now)
+
+    def test_ready_groups_are_sorted_and_small_groups_held(self):
+        events = [make_event(ENTITY_B, "p1", 2), make_event(ENTITY_A, "p2", 1), make_event(ENTITY_A, "p1", 3),
+                  make_event(ENTITY_B, "p1", 1), make_event(ENTITY_A, "p1", 0)]
+
+        batch = self.batcher.arrange(events)
+        self.assertEqual(batch, sorted(events[:1] + events[2:], key=sort_key))
+        self.assertEqual([(e.entity_gid, e.timestamp.second) for e in batch],
+                         [(ENTITY_A, 0), (ENTITY_A, 3), (ENTITY_B, 1), (ENTITY_B, 2)])
+        self.assertEqual(len(self.batcher), 1) # The single p2 event is held
+        self.assertEqual(self.batcher.next_deadline(), 1.0)
+
+        self.now += 1.0
+        self.assertEqual(self.batcher.arrange([]), [events[1]])
+        self.assertIsNone(self.batcher.next_deadline())
+
+    def test_max_events_leaves_the_rest_for_the_next_batch(self):
+        events = [make_event(ENTITY_A, second=second) for second in range(5)]
+        self.assertEqual(len(self.batcher.arrange(events, max_events=3)), 3)
+        self.assertEqual(len(self.batcher.arrange([], max_events=3)), 2)
+
+    def test_flush_and_release(self):
+        self.batcher.arrange([make_event(ENTITY_A)])
+        self.assertEqual(len(self.batcher.arrange([], flush=True)), 1)
+        self.batcher.arrange([make_event(ENTITY_B)])
+        self.assertEqual(len(self.batcher.release()), 1)
+        self.assertEqual(len(self.batcher), 0)
+
+
+class TestClientPartitionBatching(unittest.IsolatedAsyncioTestCase):
+
+    async def test_held_group_is_sent_after_max_group_wait(self):
+        test_dir = tempfile.TemporaryDirectory()
+        client = CXSClient(write_key="test-write-key", endpoint="http://test-endpoint.com/v1",
+                           log_file_path=os.path.join(test_dir.name, "unsent_events.log"), send_interval=1.0,
+                           direct_send=False, partition_batcher=PartitionBatcher(min_group_size=10, max_group_wait=0.05))
+        client.logger.setLevel(logging.CRITICAL)
+
+        with aioresponses() as m:
+            m.post(client.endpoint, status=200, repeat=True)
+            await client._send_event(EventType.track, {"type": "track", "event": "Order Completed", "entity_gid": str(ENTITY_A)})
+            for _ in range(10):
+                if m.requests:
+                    break
+                await asyncio.sleep(0.05)
+
+            self.assertEqual(len(m.requests), 1) # Well before the 1s send interval
+            (_, calls), = m.requests.items()
+            self.assertEqual(json.loads(calls[0].kwargs["data"])[0]["entity_gid"], str(ENTITY_A))
+            await client.close()
+        test_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
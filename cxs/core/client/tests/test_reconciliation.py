@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.enrichment import IdentifyCoalescer
+from cxs.core.client.reconciliation import DeliveryLedger, Digest
+from cxs.core.client.tests.test_envelope import make_events
+from cxs.schema.pydantic.semantic_event import EventType
+
+START = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def timed_events(seconds, write_key="test-write-key"):
+    events = make_events(len(seconds), write_key=write_key)
+    for event, second in zip(events, seconds):
+        event.timestamp = START + timedelta(seconds=second)
+    return events
+
+
+def server_digest(events):
+    xor = 0
+    for event in events:
+        xor ^= event.event_gid.int
+    return Digest(len(events), xor)
+
+
+class TestDeliveryLedger(unittest.TestCase):
+
+    def test_digests_per_interval(self):
+        ledger = DeliveryLedger(interval=60)
+        events = timed_events([0, 30, 59, 60, 150])
+        ledger.record(events)
+
+        first, second, third = (int(START.timestamp()) + offset for offset in (0, 60, 120))
+        self.assertEqual(ledger.digests("test-write-key"), {
+            first: server_digest(events[:3]), second: server_digest(events[3:4]), third: server_digest(events[4:]),
+        })
+        self.assertEqual(ledger.digests("other-write-key"), {})
+
+    def test_digests_do_not_depend_on_order(self):
+        events = timed_events([1, 2, 3, 4])
+        forward, backward = DeliveryLedger(), DeliveryLedger()
+        forward.record(events)
+        backward.record(reversed(events))
+        self.assertEqual(forward.digests("test-write-key"), backward.digests("test-write-key"))
+
+    def test_only_mismatched_intervals_are_taken(self):
+        ledger = DeliveryLedger(interval=60)
+        events = timed_events([0, 10, 70, 80])
+        ledger.record(events)
+        first, second = int(START.timestamp()), int(START.timestamp()) + 60
+
+        server = {str(first): server_digest(events[:2]).as_dict(), second: (1, server_digest(events[2:3]).xor)}
+        self.assertEqual(ledger.mismatched(server, "test-write-key"), [second])
+        self.assertEqual(ledger.mismatched({first: server_digest(events[:2])}, "test-write-key"), [second]) # Missing on the server
+
+        resend, unrecoverable = ledger.take([second], "test-write-key")
+        self.assertEqual(resend, events[2:])
+        self.assertEqual(unrecoverable, [])
+        self.assertEqual(list(ledger.digests("test-write-key")), [first])
+
+    def test_retained_events_and_intervals_are_bounded(self):
+        ledger = DeliveryLedger(interval=60, max_intervals=3, max_retained_events=2)
+        ledger.record(timed_events([0, 60, 120, 180]))
+        starts = sorted(ledger.digests("test-write-key"))
+        self.assertEqual(len(starts), 3)
+
+        resend, unrecoverable = ledger.take(starts, "test-write-key")
+        self.assertEqual(len(resend), 2)
+        self.assertEqual(unrecoverable, starts[:1])
+
+
+class TestClientReconciliation(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            direct_send=False,
+            delivery_ledger=DeliveryLedger(interval=3600),
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    async def wait_for_digests(self, count):
+        for _ in range(100):
+            if sum(d["count"] for d in self.client.delivery_digests().values()) >= count:
+                return
+            await asyncio.sleep(0.01)
+        self.fail("Events were not acknowledged")
+
+    async def test_lost_interval_is_resent(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            for idx in range(3):
+                await self.client._send_event(EventType.track, {"type": "track", "event": "Order Completed",
+                                                                "entity_gid": str(uuid.uuid4()), "message_id": f"msg-{idx}"})
+            await self.wait_for_digests(3)
+            digests = self.client.delivery_digests()
+            (start, digest), = digests.items()
+            self.assertEqual(await self.client.reconcile({start: digest}), {"resent": [], "unrecoverable": []})
+
+            result = await self.client.reconcile({start: {"count": 2, "xor": "0"}}) # One event did not arrive
+            self.assertEqual(result, {"resent": [start], "unrecoverable": []})
+            await self.wait_for_digests(3)
+            await self.client.close()
+
+            (_, calls), = m.requests.items()
+            resent = json.loads(calls[-1].kwargs["data"])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(event["message_id"] for event in resent), ["msg-0", "msg-1", "msg-2"])
+        self.assertEqual(self.client.delivery_digests(), digests) # Recorded again once re-sent
+
+    async def test_resent_identify_events_are_not_suppressed(self):
+        self.client.enrichment_pipeline.add_stage(IdentifyCoalescer())
+        self.client.router = MagicMock(close=AsyncMock())
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            await self.client._send_event(EventType.identify, {"type": "identify", "event": "Identify", "user_id": "user-1",
+                                                               "entity_gid": str(uuid.uuid4()), "traits": {"email": "jane@example.com"}})
+            await self.wait_for_digests(1)
+            (start, _), = self.client.delivery_digests().items()
+            await self.client.reconcile({start: {"count": 0, "xor": "0"}})
+            await self.wait_for_digests(1)
+            await self.client.close()
+
+            (_, calls), = m.requests.items()
+            resent, = json.loads(calls[-1].kwargs["data"])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(resent["user_id"], "user-1")
+        self.assertFalse(resent.get("underscore_process")) # Nothing on the wire tells the re-send apart
+        self.assertEqual(self.client.router.route.call_count, 1) # The sinks got it the first time
+        self.assertEqual(self.client._reconciled, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from cxs.core.client.cxs_client import CXSClient, _shared_clients
+from cxs.core.client.enrichment import IdentifyCoalescer
+
+
+class TestSharedClients(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.options = dict(endpoint="http://test-endpoint.com/v1", send_interval=0.05, log_level=logging.CRITICAL,
+                            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"))
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    async def test_same_configuration_shares_one_client(self):
+        coalescer = IdentifyCoalescer()
+        first = CXSClient.shared("test-write-key", enrichers=[coalescer], **self.options)
+        second = CXSClient.shared("test-write-key", enrichers=[coalescer], **self.options)
+        other_key = CXSClient.shared("other-write-key", enrichers=[coalescer], **self.options)
+        other_config = CXSClient.shared("test-write-key", enrichers=[coalescer], max_batch_size=10, **self.options)
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other_key)
+        self.assertIsNot(first, other_config)
+        for client in (second, other_key, other_config):
+            await client.close()
+
+    async def test_client_is_closed_by_its_last_user(self):
+        first = CXSClient.shared("test-write-key", **self.options)
+        second = CXSClient.shared("test-write-key", **self.options)
+        first.start()
+
+        await first.close()
+        self.assertFalse(second.queue_processor_task.done())
+        self.assertTrue(second.unsent_events_logger.handlers)
+
+        await second.close()
+        self.assertTrue(second.queue_processor_task.done())
+        third = CXSClient.shared("test-write-key", **self.options)
+        self.assertIsNot(third, second) # A new one once closed
+        await third.close()
+
+    async def test_close_releases_logger_handlers(self):
+        client = CXSClient("test-write-key", **self.options)
+        self.assertTrue(client.unsent_events_logger.handlers)
+
+        await client.close()
+        self.assertEqual(client.unsent_events_logger.handlers, [])
+        self.assertFalse(any(isinstance(h, logging.FileHandler) for h in logging.getLogger("cxs.client.unsent_events").handlers))
+
+    async def test_clients_do_not_grow_the_logging_registry(self):
+        await CXSClient("test-write-key", **self.options).close() # Registers the shared loggers
+        registered = len(logging.Logger.manager.loggerDict)
+        for _ in range(5):
+            await CXSClient("test-write-key", **self.options).close()
+        self.assertEqual(len(logging.Logger.manager.loggerDict), registered)
+
+    async def test_unsent_events_are_logged_to_their_clients_file(self):
+        first = CXSClient("test-write-key", **self.options)
+        second = CXSClient("test-write-key", **{**self.options, "log_file_path": os.path.join(self.test_dir.name, "second.log")})
+        second._log_unsent_event(logging.WARNING, "Not sent", {"event": "Second"}, "Test")
+        await first.close()
+        await second.close()
+
+        self.assertFalse(os.path.exists(self.options["log_file_path"])) # Opened on the first record
+        with open(os.path.join(self.test_dir.name, "second.log")) as log:
+            self.assertEqual([json.loads(line)["event_data"] for line in log], [{"event": "Second"}])
+
+
+class TestSharedClientsAcrossLoops(unittest.TestCase):
+
+    def test_clients_are_shared_per_event_loop(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            options = dict(endpoint="http://test-endpoint.com/v1", send_interval=0.05, log_level=logging.CRITICAL,
+                           log_file_path=os.path.join(test_dir, "unsent_events.log"))
+
+            async def shared():
+                return CXSClient.shared("test-write-key", **options)
+
+            first = asyncio.run(shared()) # Left open, its loop is closed
+            second = asyncio.run(shared())
+            self.assertIsNot(second, first)
+            self.assertNotIn(first, _shared_clients.values())
+
+            async def share_and_close():
+                client = CXSClient.shared("test-write-key", **options)
+                self.assertIs(CXSClient.shared("test-write-key", **options), client)
+                await client.close()
+                await client.close()
+            asyncio.run(share_and_close())
+            self.assertEqual(_shared_clients, {}) # The clients of the closed loops were dropped too
+            for client in (first, second):
+                client._release_loggers()
+
+
+if __name__ == '__main__':
+    unittest.main()
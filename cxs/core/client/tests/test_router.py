@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.router import CallbackSink, IntegrationRouter, is_enabled
+from cxs.core.client.tests.test_envelope import make_events
+from cxs.schema.pydantic.semantic_event import EventType
+
+
+class RecordingSink(CallbackSink):
+
+    def __init__(self, name, fail=0, delay=0.0, **options):
+        super().__init__(name, self.record, linger=0.01, retry_interval=0.01, **options)
+        self.bodies = []
+        self.fail = fail
+        self.delay = delay
+
+    async def record(self, body):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("sink unavailable")
+        self.bodies.append(body)
+
+    def events(self):
+        return [event for body in self.bodies for event in json.loads(body)]
+
+
+class TestIntegrationRouter(unittest.IsolatedAsyncioTestCase):
+
+    def test_integration_flags(self):
+        self.assertTrue(is_enabled(None, "Mixpanel"))
+        self.assertFalse(is_enabled({"Mixpanel": False}, "Mixpanel"))
+        self.assertTrue(is_enabled({"All": False, "Mixpanel": True}, "Mixpanel"))
+        self.assertFalse(is_enabled({"All": False}, "Mixpanel"))
+        self.assertFalse(is_enabled({}, "Warehouse", default=False))
+
+    async def test_events_reach_the_sinks_they_are_enabled_for(self):
+        analytics, warehouse = RecordingSink("Analytics"), RecordingSink("Warehouse", enabled_by_default=False)
+        router = IntegrationRouter([analytics, warehouse])
+        events = make_events(3)
+        events[1].integrations = {"Analytics": False, "Warehouse": True}
+        events[2].integrations = {"All": True}
+
+        router.start()
+        router.route(events)
+        await router.close()
+
+        self.assertEqual([e["message_id"] for e in analytics.events()], ["msg-0", "msg-2"])
+        self.assertEqual([e["message_id"] for e in warehouse.events()], ["msg-1", "msg-2"])
+
+    async def test_events_are_serialized_once(self):
+        first, second = RecordingSink("First"), RecordingSink("Second")
+        router = IntegrationRouter([first, second])
+        router.route(make_events(1))
+        self.assertIs(router.queues["First"].get_nowait(), router.queues["Second"].get_nowait())
+
+    async def test_a_slow_sink_does_not_stall_the_others(self):
+        slow, fast = RecordingSink("Slow", delay=0.5, max_queue_size=2, max_batch_size=1), RecordingSink("Fast")
+        router = IntegrationRouter([slow, fast])
+        router.start()
+        router.route(make_events(5))
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(len(fast.events()), 5)
+        self.assertEqual(slow.events(), [])
+        self.assertEqual(router.dropped, {"Slow": 3, "Fast": 0}) # Its queue only holds two
+        await router.close(timeout=0.01)
+
+    async def test_failed_batches_are_retried(self):
+        flaky = RecordingSink("Flaky", fail=2)
+        router = IntegrationRouter([flaky], logger=logging.getLogger("test_router"))
+        router.logger.setLevel(logging.CRITICAL)
+        router.start()
+        router.route(make_events(2))
+        await asyncio.sleep(0.1)
+        await router.close()
+        self.assertEqual(len(flaky.events()), 2)
+        self.assertEqual(router.dropped["Flaky"], 0)
+
+
+class TestClientRouting(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.sink = RecordingSink("Analytics")
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            router=IntegrationRouter([self.sink]),
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    async def test_only_delivered_events_are_routed(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200)
+            m.post(self.client.endpoint, status=503) # Queued, its batch then fails as well
+            for idx in range(2):
+                await self.client._send_event(EventType.track, {"type": "track", "event": "Order Completed",
+                                                                "entity_gid": str(uuid.uuid4()), "message_id": f"msg-{idx}"})
+            await self.client.close()
+        self.assertEqual([e["message_id"] for e in self.sink.events()], ["msg-0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import gzip
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.endpoints import EndpointPool
+from cxs.core.client.serialization import (
+    SizeEstimator, batch_json, batch_payload, encode_batch, estimated_size, event_json, iter_batch,
+)
+from cxs.schema.pydantic.semantic_event import Classification, EventType, Involved, SemanticEvent
+
+
+def make_event(idx=0):
+    return SemanticEvent(
+        type=EventType.track,
+        event="Order Completed",
+        timestamp=datetime.now(timezone.utc),
+        entity_gid=uuid.uuid4(),
+        message_id=f"msg-{idx}",
+        commerce={"order_id": f"order-{idx}", "products": [{"product_id": "p1", "units": 2}]},
+    )
+
+
+class TestEncodeBatch(unittest.TestCase):
+
+    def test_encode_batch_is_json_with_aliases(self):
+        event = make_event()
+        decoded = json.loads(encode_batch([event]))
+
+        self.assertEqual(decoded, [event.model_dump(mode="json", by_alias=True, exclude_none=True)])
+        self.assertEqual(decoded[0]["message_id"], "msg-0")
+        self.assertEqual(decoded[0]["entity_gid"], str(event.entity_gid))
+
+    def test_batch_json_matches_the_dict_payloads(self):
+        events = [make_event(i) for i in range(3)]
+        events[1].involves = [Involved(label="Jón Jónsson", role="Buyer", id="c-1")] # CXSBase children, non-ASCII
+        events[1].classification = [Classification(type="Intent", value="buy", score=None)]
+        expected = batch_payload(events)
+
+        self.assertEqual(json.loads(batch_json(events)), expected)
+        self.assertEqual(json.loads(event_json(events[1])), expected[1])
+        self.assertNotIn(b'": ', batch_json(events[:1])) # Compact separators
+        self.assertEqual(batch_json([]), b"[]")
+
+        minimized = json.loads(encode_batch(events, minimize=True))
+        self.assertEqual(minimized, batch_payload(events, minimize=True))
+        self.assertEqual(json.loads(event_json(events[0], minimize=True)), minimized[0])
+
+    def test_encode_batch_gzip(self):
+        events = [make_event(i) for i in range(3)]
+        self.assertEqual(gzip.decompress(encode_batch(events, "gzip")), encode_batch(events))
+
+    def test_unknown_compression_is_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_batch([make_event()], "brotli")
+
+    def test_iter_batch_streams_the_same_body_in_chunks(self):
+        events = [make_event(i) for i in range(50)]
+        chunks = list(iter_batch(events, chunk_size=1024))
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(chunk) < 2048 for chunk in chunks))
+        self.assertEqual(b"".join(chunks), encode_batch(events))
+
+        self.assertEqual(gzip.decompress(b"".join(iter_batch(events, "gzip", chunk_size=1024))), encode_batch(events))
+        self.assertEqual(zlib.decompress(b"".join(iter_batch(events, "deflate"))), encode_batch(events))
+        self.assertEqual(b"".join(iter_batch([])), b"[]")
+
+    def test_size_estimator_samples_events(self):
+        events = [make_event(i) for i in range(33)]
+        estimator = SizeEstimator(sample_every=16)
+        with patch("cxs.core.client.serialization.estimated_size", side_effect=estimated_size) as measure:
+            sizes = [estimator(event) for event in events]
+        self.assertEqual(measure.call_count, 3) # The first event, then one in 16
+        self.assertAlmostEqual(sizes[-1], estimated_size(events[-1]), delta=10)
+        self.assertEqual(estimated_size(events[0]), len(encode_batch(events[:1])) - 2)
+
+
+class TestClientBatchEncoding(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.client = CXSClient(
+            write_key="test-write-key",
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            compression="gzip",
+            serialization_executor=self.executor,
+            inline_serialization_max_events=2,
+            send_interval=0.05,
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            await self.client.close()
+        self.executor.shutdown()
+        self.test_dir.cleanup()
+
+    async def test_small_batches_are_encoded_inline(self):
+        events = [make_event(i) for i in range(2)]
+        with patch.object(self.executor, "submit", wraps=self.executor.submit) as submit:
+            body, headers = await self.client._encode_batch(events)
+
+        submit.assert_not_called()
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body))[1]["message_id"], "msg-1")
+        self.assertEqual(self.client.get_loop_time_stats()["serialization"]["calls"], 1)
+
+    async def test_large_batches_are_encoded_in_executor(self):
+        events = [make_event(i) for i in range(5)]
+        with patch.object(self.executor, "submit", wraps=self.executor.submit) as submit:
+            body, _ = await self.client._encode_batch(events)
+
+        submit.assert_called_once()
+        self.assertEqual(len(json.loads(gzip.decompress(body))), 5)
+        self.assertNotIn("serialization", self.client.get_loop_time_stats())
+
+    async def test_batch_is_posted_as_encoded_bytes(self):
+        events = [make_event(i) for i in range(3)]
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200)
+            self.assertTrue(await self.client._send_batch_events(events))
+
+            request = next(iter(m.requests.values()))[0]
+            self.assertEqual(request.kwargs["headers"]["Content-Encoding"], "gzip")
+            self.assertEqual(len(json.loads(gzip.decompress(request.kwargs["data"]))), 3)
+
+    async def test_large_batches_are_streamed_on_every_attempt(self):
+        self.client.stream_min_events = 10
+        self.client.stream_chunk_size = 1024
+        self.client.endpoint_pool = EndpointPool(["http://test-endpoint.com/v1", "http://test-endpoint-2.com/v1"])
+        events = [make_event(i) for i in range(20)]
+        with aioresponses() as m:
+            primary = self.client.endpoint_pool.primary(events[0].write_key)
+            alternate = self.client.endpoint_pool.alternate(events[0].write_key, exclude=primary)
+            m.post(primary, status=503)
+            m.post(alternate, status=200)
+            with patch.object(self.executor, "submit", wraps=self.executor.submit) as submit:
+                self.assertTrue(await self.client._send_batch_events(events)) # Fails over to the other endpoint
+
+            bodies = [gzip.decompress(call.kwargs["data"]) for calls in m.requests.values() for call in calls]
+        self.assertEqual(len(bodies), 2)
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(len(json.loads(bodies[0])), 20)
+        self.assertGreater(submit.call_count, 4) # Chunk by chunk, on both attempts
+        self.assertNotIn("serialization", self.client.get_loop_time_stats())
+
+    async def test_inline_streamed_chunks_are_accounted(self):
+        self.client.stream_min_events = 10
+        self.client.stream_chunk_size = 1024
+        self.client.serialization_executor = None
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200)
+            self.assertTrue(await self.client._send_batch_events([make_event(i) for i in range(20)]))
+
+            request = next(iter(m.requests.values()))[0]
+        self.assertEqual(len(json.loads(gzip.decompress(request.kwargs["data"]))), 20)
+        self.assertGreater(self.client.get_loop_time_stats()["serialization"]["calls"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import uuid
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+
+
+class TestClientImportCost(unittest.TestCase):
+
+    def test_import_does_not_load_heavy_modules(self):
+        code = (
+            "import sys, cxs.core.client.cxs_client; "
+            "print(','.join(m for m in ('aiohttp', 'pydantic', 'cxs.schema.pydantic.semantic_event') if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_lazy_names_are_still_importable(self):
+        from cxs.core.client.cxs_client import SemanticEvent, EventType
+        from cxs.schema.pydantic import semantic_event
+
+        self.assertIs(SemanticEvent, semantic_event.SemanticEvent)
+        self.assertIs(EventType, semantic_event.EventType)
+
+
+class TestLazyStartup(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.log_file_path = os.path.join(self.test_dir.name, "unsent_events.log")
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    def test_client_can_be_created_without_a_running_loop(self):
+        client = CXSClient(write_key="test-write-key", log_file_path=None)
+        self.assertFalse(client.started)
+        self.assertIsNone(client.library_info)
+
+    async def test_first_event_starts_the_client(self):
+        from cxs.schema.pydantic.semantic_event import EventType
+
+        client = CXSClient(write_key="test-write-key", endpoint="http://test-endpoint.com/v1",
+                           log_file_path=self.log_file_path, send_interval=0.05)
+        client.logger.setLevel(logging.CRITICAL)
+        self.assertFalse(client.started)
+        self.assertFalse(os.path.exists(self.log_file_path)) # The unsent events log is opened on first write
+
+        with aioresponses() as m:
+            m.post(client.endpoint, status=200, repeat=True)
+            await client._send_event(EventType.track, {"type": "track", "event": "First Event", "entity_gid": str(uuid.uuid4())})
+            await client._send_event(EventType.track, {"type": "track", "event": "Second Event", "entity_gid": str(uuid.uuid4())})
+
+            self.assertTrue(client.started)
+            self.assertEqual(client.library_info.name, "python-cxs-client")
+            session = client._session
+            self.assertIsNotNone(session)
+            await client.close()
+
+        self.assertTrue(session.closed)
+        self.assertFalse(os.path.exists(self.log_file_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
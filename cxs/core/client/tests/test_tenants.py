@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from aioresponses import aioresponses
+
+from cxs.core.client.cxs_client import CXSClient
+from cxs.core.client.tenants import TenantQueues, split_by_tenant
+from cxs.schema.pydantic.semantic_event import EventType
+
+
+def item(write_key, name=""):
+    return SimpleNamespace(write_key=write_key, name=name)
+
+
+class TestTenantQueues(unittest.IsolatedAsyncioTestCase):
+
+    async def test_tenants_are_served_round_robin(self):
+        queues = TenantQueues(quantum=2)
+        for idx in range(6):
+            queues.put_nowait(item("busy", f"busy-{idx}"))
+        queues.put_nowait(item("quiet", "quiet-0"))
+
+        served = [queues.get_nowait().name for _ in range(5)]
+        self.assertEqual(served, ["busy-0", "busy-1", "quiet-0", "busy-2", "busy-3"])
+        self.assertEqual(queues.tenant_sizes(), {"busy": 2})
+
+    async def test_tenant_backpressure_only_affects_that_tenant(self):
+        on_shed = MagicMock()
+        queues = TenantQueues(max_size_per_tenant=1, on_shed=on_shed)
+        queues.put_nowait(item("a", "a-0"))
+        queues.put_nowait(item("a", "a-1"))
+        queues.put_nowait(item("b", "b-0"))
+
+        self.assertEqual(queues.qsize(), 2)
+        on_shed.assert_called_once()
+        self.assertEqual((on_shed.call_args.args[0].name, on_shed.call_args.args[1]), ("a-1", "Shed_TenantBackpressure"))
+
+    async def test_get_waits_for_items(self):
+        queues = TenantQueues()
+        getter = asyncio.create_task(queues.get())
+        await asyncio.sleep(0)
+        self.assertFalse(getter.done())
+        queues.put_nowait(item("a", "late"))
+        self.assertEqual((await asyncio.wait_for(getter, 1.0)).name, "late")
+
+    async def test_split_by_tenant_keeps_order(self):
+        batch = [item("a", "1"), item("b", "2"), item("a", "3")]
+        self.assertEqual([[i.name for i in b] for b in split_by_tenant(batch)], [["1", "3"], ["2"]])
+
+
+class TestMultiTenantClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.client = CXSClient(
+            write_key=None,
+            endpoint="http://test-endpoint.com/v1",
+            log_file_path=os.path.join(self.test_dir.name, "unsent_events.log"),
+            send_interval=0.05,
+            direct_send=False,
+        )
+        self.client.logger.setLevel(logging.CRITICAL)
+
+    async def asyncTearDown(self):
+        self.test_dir.cleanup()
+
+    def event_data(self, write_key):
+        data = {"type": "track", "event": "Order Completed", "entity_gid": str(uuid.uuid4())}
+        if write_key:
+            data["write_key"] = write_key
+        return data
+
+    async def test_batches_are_sent_per_tenant_with_their_write_key(self):
+        self.assertTrue(self.client.multi_tenant)
+        self.assertIsInstance(self.client.event_queue, TenantQueues)
+
+        with aioresponses() as m:
+            m.post(self.client.endpoint, status=200, repeat=True)
+            for write_key in ("tenant-a", "tenant-b", "tenant-a"):
+                await self.client._send_event(EventType.track, self.event_data(write_key))
+            await self.client.close()
+
+            (_, calls), = m.requests.items()
+        sent = {call.kwargs["auth"].login: [e["write_key"] for e in json.loads(call.kwargs["data"])] for call in calls}
+        self.assertEqual(sent, {"tenant-a": ["tenant-a", "tenant-a"], "tenant-b": ["tenant-b"]})
+
+    async def test_events_without_write_key_are_rejected(self):
+        with self.assertRaises(ValueError):
+            await self.client._send_event(EventType.track, self.event_data(None))
+        await self.client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ Base classes for all Pydantic models in the CXS schema
 """
 from cxs.core.utils.schema_builder import ExtendableBaseModel
 import pydantic
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from dataclasses import dataclass
 
 @dataclass
@@ -13,18 +13,47 @@ class OmitIfNone:
     """
     pass
 
+
+_omit_if_none_fields: dict[type, frozenset] = {}
+
+
+def omit_if_none_fields(model_cls: type) -> frozenset:
+    """
+    The names of the fields of `model_cls` marked OmitIfNone, computed on first use per class
+    """
+    fields = _omit_if_none_fields.get(model_cls)
+    if fields is None:
+        fields = _omit_if_none_fields[model_cls] = frozenset(
+            k
+            for k, v in model_cls.model_fields.items()
+            if any(isinstance(m, OmitIfNone) for m in v.metadata)
+        )
+    return fields
+
+
+_list_adapters: dict[type, TypeAdapter] = {}
+
+
+def list_adapter(model_cls: type) -> TypeAdapter:
+    """
+    A (cached) TypeAdapter validating and serializing a list of `model_cls` in one call
+    """
+    adapter = _list_adapters.get(model_cls)
+    if adapter is None:
+        adapter = _list_adapters[model_cls] = TypeAdapter(list[model_cls])
+    return adapter
+
+
 class CXSSchema(BaseModel):
     """
     Base schema class with serialization handling for None fields
     """
     @pydantic.model_serializer
     def _serialize(self):
-        omit_if_none_fields = {
-            k
-            for k, v in self.model_fields.items()
-            if any(isinstance(m, OmitIfNone) for m in v.metadata)
-        }
-        return {k: v for k, v in self if k not in omit_if_none_fields or v is not None}
+        omitted = omit_if_none_fields(type(self))
+        if not omitted:
+            return dict(self)
+        return {k: v for k, v in self if v is not None or k not in omitted}
 
 class CXSBase(ExtendableBaseModel):
     """
@@ -32,9 +61,7 @@ class CXSBase(ExtendableBaseModel):
     """
     @pydantic.model_serializer
     def _serialize(self):
-        omit_if_none_fields = {
-            k
-            for k, v in self.model_fields.items()
-            if any(isinstance(m, OmitIfNone) for m in v.metadata)
-        }
-        return {k: v for k, v in self if k not in omit_if_none_fields or v}
+        omitted = omit_if_none_fields(type(self))
+        if not omitted:
+            return dict(self)
+        return {k: v for k, v in self if v or k not in omitted}
@@ -0,0 +1,100 @@
+"""
+Helpers for reading ClickHouse columnar results into the Pydantic models.
+
+ClickHouse returns Nested columns flattened into one array column per sub-field (`involves.id`,
+`involves.role`, ...). `column_rows` turns a columnar result (`FORMAT JSONColumns`, or any
+{column: values} mapping) into one values dict per row, rebuilding the Nested groups column by
+column so the per-row model validators have no indexed lookups left to do for them.
+
+A Nested sub-column holds an array per row, or a `NestedColumn` with the flattened values of all
+rows and the ClickHouse array offsets (the end position of each row's array), as returned by
+native and Arrow based clients.
+"""
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterable, Iterator, Sequence
+
+# Top-level Nested columns of the events table, rebuilt into lists of dicts keyed by sub-field.
+# commerce.products.* is part of the commerce object and is rebuilt by SemanticEvent.pre_init.
+NESTED_GROUPS = (
+    "involves", "classification", "analysis", "sentiment", "entity_linking",
+    "contextual_awareness", "base_events", "access", "location",
+)
+
+@dataclass
+class NestedColumn:
+    values: Sequence[Any] # The array elements of all rows, concatenated
+    offsets: Sequence[int] # The end position of each row's array in `values`
+
+    def rows(self) -> list[Sequence[Any]]:
+        return split_offsets(self.values, self.offsets)
+
+    def iter_rows(self) -> Iterator[Sequence[Any]]:
+        return iter_offsets(self.values, self.offsets)
+
+
+def iter_offsets(values: Sequence[Any], offsets: Sequence[int]) -> Iterator[Sequence[Any]]:
+    """
+    Yields the array of each row from flattened array values and their ClickHouse array offsets.
+    """
+    start = 0
+    for end in offsets:
+        yield values[start:end]
+        start = end
+
+
+def split_offsets(values: Sequence[Any], offsets: Sequence[int]) -> list[Sequence[Any]]:
+    """
+    Slices flattened array values into one array per row using ClickHouse array offsets.
+    """
+    return list(iter_offsets(values, offsets))
+
+
+def _row_arrays(column: Any) -> Iterator[Sequence[Any]]:
+    return column.iter_rows() if isinstance(column, NestedColumn) else iter(column)
+
+
+def _group_rows(keys: list[str], arrays: list[Iterator[Sequence[Any]]]) -> Iterator[list[dict]]:
+    for row in zip(*arrays):
+        yield [dict(zip(keys, item)) for item in zip(*(array or () for array in row))]
+
+
+def _nested_rows(columns: dict[str, Any], groups: Iterable[str]) -> dict[str, Iterator[list[dict]]]:
+    """
+    The Nested groups present in `columns`, each as an iterator rebuilding the items of one row at a time.
+    """
+    rebuilt = {}
+    for group in groups:
+        prefix = f"{group}."
+        sub_fields = [name for name in columns if name.startswith(prefix)]
+        if sub_fields:
+            rebuilt[group] = _group_rows([name[len(prefix):] for name in sub_fields],
+                                         [_row_arrays(columns[name]) for name in sub_fields])
+    return rebuilt
+
+
+def nested_groups(columns: dict[str, Any], groups: Iterable[str] = NESTED_GROUPS) -> dict[str, list[list[dict]]]:
+    """
+    The items of every Nested group present in `columns`, per row: {group: [[{sub-field: value}, ...] per row]}.
+    """
+    return {group: list(rows) for group, rows in _nested_rows(columns, groups).items()}
+
+
+def column_rows(columns: dict[str, Any], groups: Iterable[str] = NESTED_GROUPS) -> Iterator[dict]:
+    """
+    Yields one values dict per row of a columnar result, with the Nested groups already rebuilt.
+    Rows are built as they are consumed, Nested items included.
+    """
+    nested = _nested_rows(columns, tuple(groups))
+    nested_prefixes = tuple(f"{group}." for group in nested)
+    plain = {name: column for name, column in columns.items() if not name.startswith(nested_prefixes)}
+
+    names = list(plain) + list(nested)
+    for values in zip(*plain.values(), *nested.values()):
+        yield dict(zip(names, values))
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
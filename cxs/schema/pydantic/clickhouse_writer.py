@@ -0,0 +1,451 @@
+"""
+Writes batches of Pydantic models (SemanticEvents) as ClickHouse insert payloads.
+
+`ColumnarWriter` turns a list or stream of events into columnar buffers laid out like the events table:
+- context objects flattened into dotted columns (`app.name`, `commerce.order_id`, ...)
+- Nested groups flattened into one array column per sub-field (`involves.role`, `commerce.products.sku`, ...)
+- dicts as Map columns (key/value pairs) and `context.location` as a Point
+
+and encodes them as `FORMAT JSONCompactColumns` or `FORMAT RowBinary`, optionally pre-sorted by the
+table's ORDER BY key so the inserted parts need no re-sorting.
+
+The column types are derived from the model annotations (Optional fields defaulting to None are Nullable,
+Enums are LowCardinality(String), ...). Pass the columns of `DESCRIBE TABLE` to write the exact table types
+(Enum8, Int16, Float32, DateTime64(6), ...) and only the columns the table accepts on insert.
+"""
+import enum
+import json
+import struct
+import typing
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Sequence
+
+from pydantic import BaseModel
+
+from .clickhouse import chunked
+
+# Fields whose column is not named after the field alias
+COLUMN_NAMES = {"os": "os"}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NIL_UUID = uuid.UUID(int=0)
+
+_STRUCTS = {
+    "Int8": "<b", "Int16": "<h", "Int32": "<i", "Int64": "<q",
+    "UInt8": "<B", "UInt16": "<H", "UInt32": "<I", "UInt64": "<Q",
+    "Float32": "<f", "Float64": "<d", "Bool": "<?",
+}
+_SCALAR_TYPES = {str: "String", int: "Int64", float: "Float64", bool: "Bool", uuid.UUID: "UUID",
+                 datetime: "DateTime64(3, 'UTC')", date: "Date"}
+_NOT_NULLABLE = ("Array(", "Map(", "Tuple(", "Point")
+
+
+class Column(NamedTuple):
+    name: str
+    type: str
+    get: Callable[[Any], Any] # Reads the column value from a model instance
+
+
+class Codec(NamedTuple):
+    write: Callable[[Any, bytearray], None] # Appends the RowBinary encoding of a value
+    json: Callable[[Any], Any] # The JSON value of a value
+
+
+# Column layout
+
+def _unwrap_optional(annotation) -> tuple[Any, bool]:
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return annotation, False
+
+
+def _is_model(annotation) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _scalar_type(annotation) -> str:
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return "LowCardinality(String)"
+    if typing.get_origin(annotation) is tuple and typing.get_args(annotation) == (float, float):
+        return "Point"
+    if typing.get_origin(annotation) in (dict, typing.Dict):
+        _, value_type = typing.get_args(annotation)
+        return f"Map(String, {_scalar_type(value_type)})"
+    if typing.get_origin(annotation) is list:
+        return f"Array({_scalar_type(typing.get_args(annotation)[0])})"
+    return _SCALAR_TYPES.get(annotation, "String") # Anything else is written as JSON
+
+
+def _attribute_getter(path: tuple[str, ...], nested_at: Optional[int]) -> Callable[[Any], Any]:
+    """
+    Reads `path` from a model, returning one value per item of the list at `path[nested_at]` (a Nested group).
+    """
+    def get(obj):
+        for idx, name in enumerate(path):
+            if obj is None:
+                return [] if nested_at is not None else None
+            obj = getattr(obj, name)
+            if idx == nested_at:
+                return [get_item(item) for item in obj or ()]
+        return obj
+
+    if nested_at is not None:
+        get_item = _attribute_getter(path[nested_at + 1:], None)
+    return get
+
+
+def _model_columns(model_cls: type, prefix: str, path: tuple, nested_at: Optional[int]) -> Iterator[Column]:
+    for name, field in model_cls.model_fields.items():
+        column = prefix + COLUMN_NAMES.get(name, field.alias or name)
+        annotation, optional = _unwrap_optional(field.annotation)
+        field_path = path + (name,)
+
+        if _is_model(annotation) and nested_at is None:
+            yield from _model_columns(annotation, f"{column}.", field_path, None)
+            continue
+        if typing.get_origin(annotation) is list and _is_model(typing.get_args(annotation)[0]) and nested_at is None:
+            yield from _model_columns(typing.get_args(annotation)[0], f"{column}.", field_path, len(field_path) - 1)
+            continue
+
+        column_type = _scalar_type(annotation)
+        if optional and field.default is None and not column_type.startswith(_NOT_NULLABLE):
+            column_type = f"Nullable({column_type})"
+        if nested_at is not None:
+            column_type = f"Array({column_type})"
+        yield Column(column, column_type, _attribute_getter(field_path, nested_at))
+
+
+@lru_cache(maxsize=None)
+def model_columns(model_cls: type) -> tuple[Column, ...]:
+    """
+    The columns of the table layout of `model_cls`, in field order.
+    """
+    return tuple(_model_columns(model_cls, "", (), None))
+
+
+# Types and codecs
+
+def split_type(type_name: str) -> tuple[str, list[str]]:
+    """
+    Splits a ClickHouse type into its name and arguments: "Map(String, Array(UInt8))" -> ("Map", ["String", "Array(UInt8)"]).
+    """
+    name, parenthesis, rest = type_name.strip().partition("(")
+    if not parenthesis:
+        return name, []
+    body = rest[:rest.rindex(")")]
+    args, depth, quoted, start = [], 0, False, 0
+    for idx, char in enumerate(body):
+        if quoted:
+            quoted = not (char == "'" and body[idx - 1] != "\\")
+        elif char == "'":
+            quoted = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            args.append(body[start:idx].strip())
+            start = idx + 1
+    args.append(body[start:].strip())
+    return name.strip(), args
+
+
+def _write_varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _plain(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _micros(value: Optional[datetime]) -> int:
+    return (_utc(value) - _EPOCH) // timedelta(microseconds=1) if value is not None else 0
+
+
+def _string_codec() -> Codec:
+    def text(value):
+        value = _plain(value)
+        if value is None:
+            return ""
+        return value if isinstance(value, (str, bytes)) else json.dumps(value, default=str)
+
+    def write(value, out):
+        value = text(value)
+        data = value if isinstance(value, bytes) else value.encode()
+        _write_varint(len(data), out)
+        out += data
+
+    def as_json(value):
+        value = text(value)
+        return value.decode() if isinstance(value, bytes) else value
+
+    return Codec(write, as_json)
+
+
+def _fixed_string_codec(length: int) -> Codec:
+    string = _string_codec()
+
+    def write(value, out):
+        data = string.json(value).encode()
+        out += data[:length].ljust(length, b"\0")
+
+    return Codec(write, string.json)
+
+
+def _number_codec(type_name: str) -> Codec:
+    packer = struct.Struct(_STRUCTS[type_name])
+    cast = float if type_name.startswith("Float") else bool if type_name == "Bool" else int
+    default = cast(0)
+
+    def write(value, out):
+        out += packer.pack(default if value is None else cast(value))
+
+    return Codec(write, lambda value: default if value is None else cast(value))
+
+
+def _uuid_codec() -> Codec:
+    def as_uuid(value):
+        if value is None:
+            return _NIL_UUID
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+    def write(value, out):
+        data = as_uuid(value).bytes
+        out += data[7::-1] + data[:7:-1] # Two little-endian UInt64 halves
+
+    return Codec(write, lambda value: str(as_uuid(value)))
+
+
+def _datetime_codec(precision: int) -> Codec:
+    packer = struct.Struct("<q" if precision else "<I")
+
+    def write(value, out):
+        out += packer.pack(_micros(value) * 10 ** precision // 10 ** 6)
+
+    def as_json(value):
+        value = _utc(value) if value is not None else _EPOCH
+        text = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        return text[:20 + precision] if precision else text[:19]
+
+    return Codec(write, as_json)
+
+
+def _date_codec(type_name: str) -> Codec:
+    packer = struct.Struct("<i" if type_name == "Date32" else "<H")
+
+    def as_date(value):
+        if value is None:
+            return _EPOCH.date()
+        return _utc(value).date() if isinstance(value, datetime) else value
+
+    def write(value, out):
+        out += packer.pack((as_date(value) - _EPOCH.date()).days)
+
+    return Codec(write, lambda value: as_date(value).isoformat())
+
+
+def _enum_codec(type_name: str, members: list[str]) -> Codec:
+    codes = {}
+    for member in members:
+        label, _, code = member.rpartition("=")
+        codes[label.strip()[1:-1].replace("\\'", "'")] = int(code)
+    default = 0 if 0 in codes.values() else next(iter(codes.values()))
+    packer = struct.Struct("<b" if type_name == "Enum8" else "<h")
+
+    def code_of(value):
+        value = _plain(value)
+        if value is None:
+            return default
+        if isinstance(value, int):
+            return value
+        try:
+            return codes[value]
+        except KeyError:
+            raise ValueError(f"{value!r} is not a member of {type_name}({', '.join(members)})") from None
+
+    def write(value, out):
+        out += packer.pack(code_of(value))
+
+    labels = {code: label for label, code in codes.items()}
+    return Codec(write, lambda value: labels[code_of(value)])
+
+
+def _nullable_codec(inner: Codec) -> Codec:
+    def write(value, out):
+        if value is None:
+            out.append(1)
+        else:
+            out.append(0)
+            inner.write(value, out)
+
+    return Codec(write, lambda value: None if value is None else inner.json(value))
+
+
+def _array_codec(inner: Codec) -> Codec:
+    def write(value, out):
+        value = value or ()
+        _write_varint(len(value), out)
+        for item in value:
+            inner.write(item, out)
+
+    return Codec(write, lambda value: [inner.json(item) for item in value or ()])
+
+
+def _map_codec(keys: Codec, values: Codec) -> Codec:
+    def write(value, out):
+        value = value or {}
+        _write_varint(len(value), out)
+        for key, item in value.items():
+            keys.write(key, out)
+            values.write(item, out)
+
+    return Codec(write, lambda value: {str(keys.json(key)): values.json(item) for key, item in (value or {}).items()})
+
+
+def _tuple_codec(elements: list[Codec]) -> Codec:
+    def write(value, out):
+        for element, item in zip(elements, value or (None,) * len(elements)):
+            element.write(item, out)
+
+    return Codec(write, lambda value: [element.json(item) for element, item in zip(elements, value or (None,) * len(elements))])
+
+
+@lru_cache(maxsize=None)
+def codec(type_name: str) -> Codec:
+    """
+    The RowBinary and JSON encoders of a ClickHouse type.
+    Missing values of non-Nullable types are written as the type default (0, "", nil UUID, epoch, ...).
+    """
+    name, args = split_type(type_name)
+    if name in ("String", "JSON"):
+        return _string_codec()
+    if name == "FixedString":
+        return _fixed_string_codec(int(args[0]))
+    if name in _STRUCTS:
+        return _number_codec(name)
+    if name == "UUID":
+        return _uuid_codec()
+    if name == "DateTime":
+        return _datetime_codec(0)
+    if name == "DateTime64":
+        return _datetime_codec(int(args[0]))
+    if name in ("Date", "Date32"):
+        return _date_codec(name)
+    if name in ("Enum8", "Enum16"):
+        return _enum_codec(name, args)
+    if name == "Point":
+        return codec("Tuple(Float64, Float64)")
+    if name == "LowCardinality":
+        return codec(args[0])
+    if name == "Nullable":
+        return _nullable_codec(codec(args[0]))
+    if name == "Array":
+        return _array_codec(codec(args[0]))
+    if name == "Map":
+        return _map_codec(codec(args[0]), codec(args[1]))
+    if name == "Tuple":
+        return _tuple_codec([codec(arg) for arg in args])
+    raise ValueError(f"Unsupported ClickHouse type: {type_name}")
+
+
+# Batches
+
+def _sort_value(value):
+    value = _plain(value)
+    return (value is None, value if value is not None else 0) # NULLs last
+
+
+@dataclass
+class ColumnarBatch:
+    names: list[str]
+    types: list[str]
+    data: list[list] # The values of each column, one per row
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def as_dict(self) -> dict[str, list]:
+        return dict(zip(self.names, self.data))
+
+    def json_compact_columns(self) -> bytes:
+        """
+        The batch as `FORMAT JSONCompactColumns`: a JSON array of column value arrays, in column order.
+        """
+        encoders = [codec(type_name).json for type_name in self.types]
+        return json.dumps(
+            [[encode(value) for value in values] for encode, values in zip(encoders, self.data)],
+            separators=(",", ":"), ensure_ascii=False,
+        ).encode()
+
+    def row_binary(self) -> bytes:
+        """
+        The batch as `FORMAT RowBinary`.
+        """
+        writers = [codec(type_name).write for type_name in self.types]
+        out = bytearray()
+        for row in zip(*self.data):
+            for write, value in zip(writers, row):
+                write(value, out)
+        return bytes(out)
+
+    def insert_query(self, table: str, format: str = "RowBinary") -> str:
+        columns = ", ".join(f"`{name}`" for name in self.names)
+        return f"INSERT INTO {table} ({columns}) FORMAT {format}"
+
+
+class ColumnarWriter:
+    """
+    Writes model instances as ColumnarBatches.
+
+    columns: the (name, type) pairs to write, e.g. from `DESCRIBE TABLE`. Defaults to all columns of the model layout.
+    order_by: the column names of the table's ORDER BY key to pre-sort the rows by.
+    """
+
+    def __init__(self, model_cls: type = None, columns: Sequence[tuple[str, str]] = None, order_by: Sequence[str] = ()):
+        if model_cls is None:
+            from .semantic_event import SemanticEvent
+            model_cls = SemanticEvent
+        layout = {column.name: column for column in model_columns(model_cls)}
+        if columns is None:
+            self.columns = list(layout.values())
+        else:
+            unknown = [name for name, _ in columns if name not in layout]
+            if unknown:
+                raise ValueError(f"No {model_cls.__name__} field for columns: {', '.join(unknown)}")
+            self.columns = [Column(name, type_name, layout[name].get) for name, type_name in columns]
+        for column in self.columns:
+            codec(column.type) # Fail on unsupported types before writing
+
+        names = [column.name for column in self.columns]
+        missing = [name for name in order_by if name not in names]
+        if missing:
+            raise ValueError(f"ORDER BY columns are not written: {', '.join(missing)}")
+        self.sort_positions = [names.index(name) for name in order_by]
+
+    def write(self, items: Iterable[Any]) -> ColumnarBatch:
+        items = list(items)
+        data = [[column.get(item) for item in items] for column in self.columns]
+        if self.sort_positions and len(items) > 1:
+            keys = [data[position] for position in self.sort_positions]
+            order = sorted(range(len(items)), key=lambda row: tuple(_sort_value(key[row]) for key in keys))
+            data = [[values[row] for row in order] for values in data]
+        return ColumnarBatch([column.name for column in self.columns], [column.type for column in self.columns], data)
+
+    def batches(self, items: Iterable[Any], batch_size: int = 10000) -> Iterator[ColumnarBatch]:
+        """
+        Writes a stream of model instances as batches of up to `batch_size` rows (each sorted on its own).
+        """
+        for chunk in chunked(items, batch_size):
+            yield self.write(chunk)
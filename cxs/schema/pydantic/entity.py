@@ -249,6 +249,16 @@ class Entity(BaseModel):
 
         return values
 
+    @classmethod
+    def from_trusted(cls, values: dict) -> "Entity":
+        """
+        Builds an entity from a row of our entities table (flattened keys) without validation or pre_init.
+        Not faster than the constructor, entities are small: it skips the validators, not their cost.
+        Only safe for data that was validated when it was first written. Raises ValueError for nested input.
+        """
+        from .trusted import construct_row
+        return construct_row(cls, values)
+
     @classmethod
     def from_clickhouse(cls, values):
 
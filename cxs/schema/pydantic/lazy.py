@@ -0,0 +1,123 @@
+"""
+Lazy views of models over raw data.
+
+`LazyModel` wraps a raw values dict (a wire format dict or a row of our tables, flattened or not) and
+builds each field only when it is first read: a job reading `event`, `timestamp` and `metrics` never
+builds the products, locations or traits of the event. Fields are converted and defaulted the way
+`construct_trusted` does and cached on the view, so the same rules apply: only use it for our own
+canonical data, nothing is validated.
+
+`model()` materializes the full model (reusing the fields already built) and `model_dump` /
+`model_dump_json` serialize it, identically to the model built from the same values.
+"""
+from typing import Any, Callable, Mapping, NamedTuple, Optional
+
+from .trusted import _plan, construct_trusted
+
+_MISSING = object()
+
+
+class _LazyField(NamedTuple):
+    keys: tuple[str, ...] # The field name and alias
+    coerce: Optional[Callable[[Any], Any]]
+    default: Any # _MISSING for required fields
+    factory: Optional[Callable[[], Any]]
+
+
+_lazy_fields: dict[type, dict[str, _LazyField]] = {}
+
+
+def _fields(model_cls: type) -> dict[str, _LazyField]:
+    fields = _lazy_fields.get(model_cls)
+    if fields is None:
+        plan = _plan(model_cls)
+        coercers, factories = dict(plan.coercers), dict(plan.factories)
+        fields = _lazy_fields[model_cls] = {
+            name: _LazyField(
+                tuple(key for key, field_name in plan.names.items() if field_name == name),
+                coercers.get(name),
+                _MISSING if name in plan.required else default,
+                factories.get(name),
+            )
+            for name, default in plan.template.items()
+        }
+    return fields
+
+
+class LazyModel:
+    """
+    A read-mostly view of `model_cls` over raw values, building and caching each field on first access.
+    Fields can be assigned, the assigned values are used by `model()`.
+    """
+
+    def __init__(self, model_cls: type, values: Mapping[str, Any]):
+        self._model_cls = model_cls
+        self._values = values
+        self._groups = None
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not built yet. Private ones are never fields, and are looked up before
+        # `__init__` has run when the view is copied or unpickled: reading `_model_cls` here would recurse.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        field = _fields(self._model_cls).get(name)
+        if field is None:
+            raise AttributeError(f"'{type(self).__name__}' of {self._model_cls.__name__} has no attribute '{name}'")
+
+        value = _MISSING
+        for key in field.keys:
+            if key in self._values:
+                value = self._values[key]
+                break
+        else:
+            value = self._flattened().get(name, _MISSING)
+
+        if value is _MISSING:
+            if field.factory is not None:
+                value = field.factory()
+            elif field.default is _MISSING:
+                raise AttributeError(f"{self._model_cls.__name__}.{name} is not set")
+            else:
+                value = field.default
+        elif value is not None and field.coerce is not None:
+            value = field.coerce(value)
+        self.__dict__[name] = value
+        return value
+
+    def _flattened(self) -> dict[str, dict]:
+        """
+        The flattened keys of the values (`app.name`, `involves.role`, ...) grouped by field, collected once.
+        """
+        if self._groups is None:
+            names = _plan(self._model_cls).names
+            self._groups = {}
+            for key, value in self._values.items():
+                prefix, dot, rest = key.partition(".")
+                if dot and prefix in names:
+                    self._groups.setdefault(names[prefix], {})[rest] = value
+        return self._groups
+
+    def built_fields(self) -> list[str]:
+        """
+        The fields built (or assigned) so far.
+        """
+        fields = _fields(self._model_cls)
+        return [name for name in self.__dict__ if name in fields]
+
+    def model(self):
+        """
+        The full model, built from the raw values and the fields built so far.
+        """
+        names = _plan(self._model_cls).names
+        built = {name: self.__dict__[name] for name in self.built_fields()}
+        raw = {key: value for key, value in self._values.items() if names.get(key.partition(".")[0]) not in built}
+        return construct_trusted(self._model_cls, {**raw, **built})
+
+    def model_dump(self, **kwargs) -> dict:
+        return self.model().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        return self.model().model_dump_json(**kwargs)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._model_cls.__name__}, built={self.built_fields()})"
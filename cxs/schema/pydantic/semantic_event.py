@@ -7,7 +7,7 @@ from typing import Dict
 
 import logging
 from pydantic import Field, model_validator, BaseModel
-from .base import CXSBase, OmitIfNone
+from .base import CXSBase, OmitIfNone, list_adapter
 from cxs.core.utils.event_utils import calculate_event_id
 
 logger = logging.getLogger(__name__)
@@ -448,6 +448,128 @@ class SourceInfo(CXSBase):
     access_gid: Annotated[Optional[uuid.UUID], OmitIfNone()] = Field(default=None, description="The Graph UUID of the authentication details of the source of the event") # SQL Nullable
 
 
+NIL_UUID = uuid.UUID("00000000-0000-0000-0000-000000000000")
+
+# Fields rebuilt from the flattened ClickHouse keys of each context object, resolved once at import
+PRODUCT_FIELDS = tuple(Product.model_fields)
+_FLAT_OBJECT_FIELDS = {
+    "campaign": (Campaign, ("campaign", "source", "medium", "term", "content")),
+    "app": (App, ("build", "name", "namespace", "version")),
+    "os": (OS, ("name", "version")), # SQL os.name, os.version. The Pydantic field is os: Optional[OS]
+    "library": (Library, ("name", "version")),
+    "network": (Network, ("cellular", "bluetooth", "wifi", "carrier")),
+    "page": (Page, ("encoding", "host", "path", "referrer", "referring_domain", "search", "title", "url")),
+    "referrer": (Referrer, ("id", "type")),
+    "screen": (Screen, ("density", "height", "width", "inner_height", "inner_width")),
+    # mac_address, brand, variant and advertising_id are in the Pydantic model but not in the SQL device.* list
+    "device": (Device, ("ad_tracking_enabled", "id", "version", "mac_address", "manufacturer", "model", "name", "type",
+                        "token", "locale", "timezone", "brand", "variant", "advertising_id")),
+}
+_CONTEXT_FIELDS = ("active", "ip", "ipv6", "locale", "group_id", "timezone")
+_TRAITS_FIELDS = ("id", "name", "first_name", "last_name", "social_security_nr", "social_security_nr_family", "email",
+                  "phone", "avatar", "username", "website", "age", "birthday", "created_at", "company", "title",
+                  "pronouns", "salutation", "description", "industry", "employees", "plan", "total_billed", "logins")
+_COMMERCE_FIELDS = ("details", "checkout_id", "order_id", "cart_id", "employee_id", "external_order_id", "terminal_id",
+                    "affiliation_id", "affiliation", "agent", "agent_id", "sold_location", "sold_location_id",
+                    "business_day", "revenue", "tax", "discount", "cogs", "commission", "currency")
+_COMMERCE_PAYMENT_FIELDS = ("coupon", "payment_type", "payment_sub_type", "payment_details")
+
+
+def _pop_prefixed(values: dict, prefix: str, fields: tuple) -> dict:
+    return {field: values.pop(f"{prefix}.{field}", None) for field in fields}
+
+
+def _object_builder(prefix: str, model: type, fields: tuple):
+    def rebuild(values: dict) -> None:
+        values[prefix] = model(**_pop_prefixed(values, prefix, fields))
+    return rebuild
+
+
+def _rebuild_source(values: dict) -> None:
+    # SourceInfo replaces the old source: str field
+    values["source_info"] = SourceInfo(**_pop_prefixed(values, "source", ("type", "label", "source_gid", "access_gid")))
+    values.pop("source", None) # Remove the old 'source' string field if it's present from older data
+
+
+def _rebuild_user_agent(values: dict) -> None:
+    ua_data_dict = {}
+    if "user_agent.data.brand" in values: # Check if sub-fields exist
+        ua_data_dict = _pop_prefixed(values, "user_agent.data", ("brand", "version"))
+    values["user_agent"] = UserAgent(
+        **_pop_prefixed(values, "user_agent", ("mobile", "platform", "signature")),
+        data=UserAgentData(**ua_data_dict) if ua_data_dict else None
+    )
+
+
+def _rebuild_context(values: dict) -> None:
+    loc_tuple = None
+    # Assuming context.location might come as separate lat/lon or a pre-formed tuple/list
+    # Based on SQL 'Point' type, it would be (lon, lat)
+    if "context.location.longitude" in values and "context.location.latitude" in values: # Example if they came flat
+        lon = values.pop("context.location.longitude")
+        lat = values.pop("context.location.latitude")
+        if lon is not None and lat is not None:
+            loc_tuple = (float(lon), float(lat))
+    elif "context.location" in values and isinstance(values["context.location"], (list, tuple)) and len(values["context.location"]) == 2:
+        # if it comes as [lon, lat] or (lon, lat)
+        raw_loc = values.pop("context.location")
+        loc_tuple = (float(raw_loc[0]), float(raw_loc[1]))
+
+    # context.ip is context_ip in SQL top level, and context.ip in context map.
+    values["context"] = Context(**_pop_prefixed(values, "context", _CONTEXT_FIELDS), location=loc_tuple,
+                                extras=values.pop("context.extras", None))
+
+
+def _rebuild_traits(values: dict) -> None:
+    address_dict = {}
+    # traits.address is Map(String, String), so it won't be like traits.address.city
+    # It will be traits.address = {'city': 'Reykjavik', 'street': 'Laugavegur'} if CH client supports map directly
+    if "traits.address" in values and isinstance(values["traits.address"], dict):
+        address_dict = values.pop("traits.address")
+    values["traits"] = Traits(
+        **_pop_prefixed(values, "traits", _TRAITS_FIELDS),
+        address=address_dict if address_dict else None,
+        gender=values.pop("traits.gender", None) # Added in Pydantic
+    )
+
+
+def _rebuild_commerce(values: dict) -> None:
+    commerce_products = []
+    product_ids = values.get("commerce.products.product_id")
+    if product_ids is not None: # Check if product fields exist
+        product_columns = {field_name: values.get(f"commerce.products.{field_name}") for field_name in PRODUCT_FIELDS}
+        for idx_prod in range(len(product_ids)):
+            # Fields missing in a CH row item take the Product model defaults
+            prod_data = {
+                field_name: column[idx_prod]
+                for field_name, column in product_columns.items()
+                if column is not None and idx_prod < len(column)
+            }
+            commerce_products.append(Product(**prod_data))
+
+    # Pop all commerce.products keys, so they are not misinterpreted by Pydantic strict validation
+    for field_name in PRODUCT_FIELDS:
+        values.pop(f"commerce.products.{field_name}", None)
+
+    values["commerce"] = Commerce(
+        **_pop_prefixed(values, "commerce", _COMMERCE_FIELDS),
+        exchange_rate=values.pop("commerce.exchange_rate", 1.0), # Default from model
+        **_pop_prefixed(values, "commerce", _COMMERCE_PAYMENT_FIELDS),
+        products=commerce_products if commerce_products else None
+    )
+
+
+# Flattened key prefix -> rebuild function, applied in this order by SemanticEvent.pre_init
+_FLAT_OBJECT_BUILDERS = {
+    "source": _rebuild_source,
+    **{prefix: _object_builder(prefix, model, fields) for prefix, (model, fields) in _FLAT_OBJECT_FIELDS.items()},
+    "user_agent": _rebuild_user_agent,
+    "context": _rebuild_context,
+    "traits": _rebuild_traits,
+    "commerce": _rebuild_commerce,
+}
+
+
 class SemanticEvent(BaseModel):
 
     type: EventType = Field(..., description="The event type (e.g. \"track, page, identify, group, alias, screen etc.\")")
@@ -542,13 +664,18 @@ class SemanticEvent(BaseModel):
             if values.get("entity_gid") is None:
                 values["entity_gid"] = default_gid
 
-        if values.get("event_gid") is None or values.get("event_gid") == uuid.UUID("00000000-0000-0000-0000-000000000000"):
+        if values.get("event_gid") is None or values.get("event_gid") == NIL_UUID:
             values["event_gid"] = calculate_event_id(values)
 
         for check_uuid in ["entity_gid", "event_gid"]:
             if isinstance(values.get(check_uuid), str):
                 values[check_uuid] = uuid.UUID(values.get(check_uuid))
 
+        # One pass over the keys: the prefixes of the flattened (dotted) ClickHouse keys. Nested input has none.
+        prefixes = {key.partition(".")[0] for key in values if "." in key}
+        if not prefixes:
+            return values
+
         if values.get("involves.id") is not None:
             involves = []
             idx = 0
@@ -700,237 +827,58 @@ class SemanticEvent(BaseModel):
                 location_items.append(location_item)
             values["location"] = location_items
 
-        # Reconstruct Context Objects from flattened ClickHouse data
-        # SourceInfo (replaces source: str)
-        if any(k.startswith("source.") for k in values.keys()):
-            values["source_info"] = SourceInfo(
-                type=values.pop("source.type", None),
-                label=values.pop("source.label", None),
-                source_gid=values.pop("source.source_gid", None),
-                access_gid=values.pop("source.access_gid", None)
-            )
-            # Remove the old 'source' string field if it's present from older data
-            values.pop("source", None)
-
-        if any(k.startswith("campaign.") for k in values.keys()):
-            values["campaign"] = Campaign(
-                campaign=values.pop("campaign.campaign", None),
-                source=values.pop("campaign.source", None),
-                medium=values.pop("campaign.medium", None),
-                term=values.pop("campaign.term", None),
-                content=values.pop("campaign.content", None)
-            )
-
-        if any(k.startswith("app.") for k in values.keys()):
-            values["app"] = App(
-                build=values.pop("app.build", None),
-                name=values.pop("app.name", None),
-                namespace=values.pop("app.namespace", None),
-                version=values.pop("app.version", None)
-            )
-
-        if any(k.startswith("os.") for k in values.keys()): # SQL os.name, os.version
-            values["os"] = OS( # Pydantic field is os: Optional[OS]
-                name=values.pop("os.name", None),
-                version=values.pop("os.version", None)
-            )
-
-        if any(k.startswith("library.") for k in values.keys()):
-            values["library"] = Library(
-                name=values.pop("library.name", None),
-                version=values.pop("library.version", None)
-            )
-
-        if any(k.startswith("network.") for k in values.keys()):
-            values["network"] = Network(
-                cellular=values.pop("network.cellular", None),
-                bluetooth=values.pop("network.bluetooth", None),
-                wifi=values.pop("network.wifi", None),
-                carrier=values.pop("network.carrier", None)
-            )
-
-        if any(k.startswith("page.") for k in values.keys()):
-            values["page"] = Page(
-                encoding=values.pop("page.encoding", None),
-                host=values.pop("page.host", None),
-                path=values.pop("page.path", None),
-                referrer=values.pop("page.referrer", None),
-                referring_domain=values.pop("page.referring_domain", None),
-                search=values.pop("page.search", None),
-                title=values.pop("page.title", None),
-                url=values.pop("page.url", None)
-            )
+        # Rebuild the context objects from their flattened ClickHouse keys (source.*, app.*, context.*, ...)
+        for prefix, rebuild in _FLAT_OBJECT_BUILDERS.items():
+            if prefix in prefixes:
+                rebuild(values)
 
-        if any(k.startswith("referrer.") for k in values.keys()):
-            values["referrer"] = Referrer(
-                id=values.pop("referrer.id", None),
-                type=values.pop("referrer.type", None)
-            )
-
-        if any(k.startswith("screen.") for k in values.keys()):
-            values["screen"] = Screen(
-                density=values.pop("screen.density", None),
-                height=values.pop("screen.height", None),
-                width=values.pop("screen.width", None),
-                inner_height=values.pop("screen.inner_height", None),
-                inner_width=values.pop("screen.inner_width", None)
-            )
-
-        if any(k.startswith("device.") for k in values.keys()):
-            values["device"] = Device(
-                ad_tracking_enabled=values.pop("device.ad_tracking_enabled", None),
-                id=values.pop("device.id", None),
-                version=values.pop("device.version", None),
-                mac_address=values.pop("device.mac_address", None), # This field is in Pydantic but not explicitly in SQL device.* list
-                manufacturer=values.pop("device.manufacturer", None),
-                model=values.pop("device.model", None),
-                name=values.pop("device.name", None),
-                type=values.pop("device.type", None),
-                token=values.pop("device.token", None),
-                locale=values.pop("device.locale", None),
-                timezone=values.pop("device.timezone", None),
-                brand=values.pop("device.brand", None), # Added in Pydantic
-                variant=values.pop("device.variant", None), # Added in Pydantic
-                advertising_id=values.pop("device.advertising_id", None) # Added in Pydantic
-            )
-
-        if any(k.startswith("user_agent.") for k in values.keys()):
-            ua_data_dict = {}
-            if "user_agent.data.brand" in values: # Check if sub-fields exist
-                ua_data_dict["brand"] = values.pop("user_agent.data.brand", None)
-                ua_data_dict["version"] = values.pop("user_agent.data.version", None)
-
-            values["user_agent"] = UserAgent(
-                mobile=values.pop("user_agent.mobile", None),
-                platform=values.pop("user_agent.platform", None),
-                signature=values.pop("user_agent.signature", None),
-                data=UserAgentData(**ua_data_dict) if ua_data_dict else None
-            )
+        return values
 
-        if any(k.startswith("context.") for k in values.keys()):
-            loc_tuple = None
-            # Assuming context.location might come as separate lat/lon or a pre-formed tuple/list
-            # Based on SQL 'Point' type, it would be (lon, lat)
-            if "context.location.longitude" in values and "context.location.latitude" in values: # Example if they came flat
-                lon = values.pop("context.location.longitude")
-                lat = values.pop("context.location.latitude")
-                if lon is not None and lat is not None:
-                    loc_tuple = (float(lon), float(lat))
-            elif "context.location" in values and isinstance(values["context.location"], (list, tuple)) and len(values["context.location"]) == 2:
-                 # if it comes as [lon, lat] or (lon, lat)
-                raw_loc = values.pop("context.location")
-                loc_tuple = (float(raw_loc[0]), float(raw_loc[1]))
-
-            values["context"] = Context(
-                active=values.pop("context.active", None),
-                ip=values.pop("context.ip", None), # This is context_ip in SQL top level, and context.ip in context map.
-                ipv6=values.pop("context.ipv6", None),
-                locale=values.pop("context.locale", None),
-                group_id=values.pop("context.group_id", None),
-                timezone=values.pop("context.timezone", None),
-                location=loc_tuple,
-                extras=values.pop("context.extras", None)
-            )
+    @classmethod
+    def from_columns(cls, columns: dict, chunk_size: int = None, lazy: bool = False):
+        """
+        Builds events from a ClickHouse columnar result ({column: [value per row]}, e.g. FORMAT JSONColumns).
+        Nested columns (involves.*, classification.*, ...) are rebuilt column by column instead of per row.
+        Yields the events one by one, or lists of `chunk_size` events validated in one call.
+        With `lazy`, yields unvalidated views building their fields on first access (see SemanticEvent.lazy).
+        """
+        from .clickhouse import chunked, column_rows
+        if lazy:
+            from .lazy import LazyModel
+            return (LazyModel(cls, row) for row in column_rows(columns, groups=()))
+        rows = column_rows(columns)
+        if not chunk_size:
+            return (cls.model_validate(row) for row in rows)
+        adapter = list_adapter(cls)
+        return (adapter.validate_python(chunk) for chunk in chunked(rows, chunk_size))
 
-        if any(k.startswith("traits.") for k in values.keys()):
-            address_dict = {}
-            # traits.address is Map(String, String), so it won't be like traits.address.city
-            # It will be traits.address = {'city': 'Reykjavik', 'street': 'Laugavegur'} if CH client supports map directly
-            # Or potentially traits.address.key = [...] traits.address.value = [...] if fully flattened
-            # For now, assume traits.address comes as a dict if present, or handle specific keys if known
-            if "traits.address" in values and isinstance(values["traits.address"], dict) :
-                 address_dict = values.pop("traits.address")
-            # else: # If address is flattened like traits.address.city, traits.address.country
-            #    if values.get("traits.address.city"): address_dict["city"] = values.pop("traits.address.city")
-            #    ... etc. for all known address keys
-
-            values["traits"] = Traits(
-                id=values.pop("traits.id", None),
-                name=values.pop("traits.name", None),
-                first_name=values.pop("traits.first_name", None),
-                last_name=values.pop("traits.last_name", None),
-                social_security_nr=values.pop("traits.social_security_nr", None),
-                social_security_nr_family=values.pop("traits.social_security_nr_family", None),
-                email=values.pop("traits.email", None),
-                phone=values.pop("traits.phone", None),
-                avatar=values.pop("traits.avatar", None),
-                username=values.pop("traits.username", None),
-                website=values.pop("traits.website", None),
-                age=values.pop("traits.age", None),
-                birthday=values.pop("traits.birthday", None),
-                created_at=values.pop("traits.created_at", None),
-                company=values.pop("traits.company", None),
-                title=values.pop("traits.title", None),
-                pronouns=values.pop("traits.pronouns", None),
-                salutation=values.pop("traits.salutation", None),
-                description=values.pop("traits.description", None),
-                industry=values.pop("traits.industry", None),
-                employees=values.pop("traits.employees", None),
-                plan=values.pop("traits.plan", None),
-                total_billed=values.pop("traits.total_billed", None),
-                logins=values.pop("traits.logins", None),
-                address=address_dict if address_dict else None,
-                gender=values.pop("traits.gender", None) # Added in Pydantic
-            )
+    @classmethod
+    def to_columns(cls, events: list, columns: list = None, order_by: tuple = ()):
+        """
+        Writes events as a ClickHouse columnar batch (see ColumnarWriter), encoded with `.json_compact_columns()`
+        or `.row_binary()`. `columns` are the (name, type) pairs of the table, `order_by` its sorting key columns.
+        """
+        from .clickhouse_writer import ColumnarWriter
+        return ColumnarWriter(cls, columns, order_by).write(events)
 
-        if any(k.startswith("commerce.") for k in values.keys()):
-            commerce_products = []
-            if values.get("commerce.products.product_id") is not None: # Check if product fields exist
-                num_products = len(values.get("commerce.products.product_id"))
-                for idx_prod in range(num_products):
-                    prod_data = {}
-                    for field_name in Product.__fields__.keys():
-                        ch_key = f"commerce.products.{field_name}"
-                        # Check if the key exists and the current index is valid for its list
-                        if values.get(ch_key) is not None and idx_prod < len(values.get(ch_key)):
-                            prod_data[field_name] = values.get(ch_key)[idx_prod]
-                        else:
-                            # Field might be optional in Product model or missing in this specific CH row item
-                            # Pydantic model's defaults for optional fields will apply if not provided here
-                            pass
-                    commerce_products.append(Product(**prod_data))
-
-            # Pop all potentially used commerce.products keys after processing
-            # This avoids them being misinterpreted by subsequent logic or Pydantic strict validation
-            if values.get("commerce.products.product_id") is not None: # Ensure we only pop if they existed
-                for field_name_to_pop in Product.__fields__.keys():
-                    values.pop(f"commerce.products.{field_name_to_pop}", None)
-
-            values["commerce"] = Commerce(
-                details=values.pop("commerce.details", None),
-                checkout_id=values.pop("commerce.checkout_id", None),
-                order_id=values.pop("commerce.order_id", None),
-                cart_id=values.pop("commerce.cart_id", None),
-                employee_id=values.pop("commerce.employee_id", None),
-                external_order_id=values.pop("commerce.external_order_id", None),
-                terminal_id=values.pop("commerce.terminal_id", None),
-                affiliation_id=values.pop("commerce.affiliation_id", None),
-                affiliation=values.pop("commerce.affiliation", None),
-                agent=values.pop("commerce.agent", None),
-                agent_id=values.pop("commerce.agent_id", None),
-                sold_location=values.pop("commerce.sold_location", None),
-                sold_location_id=values.pop("commerce.sold_location_id", None),
-                business_day=values.pop("commerce.business_day", None),
-                revenue=values.pop("commerce.revenue", None),
-                tax=values.pop("commerce.tax", None),
-                discount=values.pop("commerce.discount", None),
-                cogs=values.pop("commerce.cogs", None),
-                commission=values.pop("commerce.commission", None),
-                currency=values.pop("commerce.currency", None),
-                exchange_rate=values.pop("commerce.exchange_rate", 1.0), # Default from model
-                coupon=values.pop("commerce.coupon", None),
-                payment_type=values.pop("commerce.payment_type", None),
-                payment_sub_type=values.pop("commerce.payment_sub_type", None),
-                payment_details=values.pop("commerce.payment_details", None),
-                products=commerce_products if commerce_products else None
-            )
-            # Remove commerce.products.* keys manually as they are not popped by simple key access
-            # This is a bit verbose, might need a helper if many such structures
-            product_field_keys = [f"commerce.products.{k}" for k in Product.__fields__.keys()]
-            for pk in product_field_keys:
-                values.pop(pk, None)
+    @classmethod
+    def from_trusted(cls, values: dict) -> "SemanticEvent":
+        """
+        Builds an event from a row of our events table (flattened keys) without validation or pre_init, about 1.5x
+        faster than the constructor. Only safe for data that was validated when it was first written.
+        Raises ValueError for nested input, it validates about as fast as it would be built.
+        """
+        from .trusted import construct_row
+        return construct_row(cls, values)
 
-        return values
+    @classmethod
+    def lazy(cls, values: dict):
+        """
+        A view of an event over our own canonical data (see from_trusted) that builds each field, e.g. the
+        products or traits, only when it is first read. `.model()` returns the full event.
+        """
+        from .lazy import LazyModel
+        return LazyModel(cls, values)
 
     @classmethod
     def coalesce(cls, *args):
@@ -0,0 +1,195 @@
+"""
+Construction of models from trusted data, without validation.
+
+`construct_trusted` builds the full object tree of a model the way `model_construct` does: no field
+validation and no `model_validator`s (`pre_init` normalization, UUID re-parsing, warnings, ...).
+The field defaults are resolved once per class: `model_construct` walks every field in Python and
+inspects every default factory on every call, which costs more than validating. Whether the instances
+built that way are the ones `model_construct` builds is checked once per class, models for which
+they are not (private attributes, extra fields, post-init hooks) are built with `model_construct`.
+Only UUID, datetime, Enum and tuple values given as their JSON representation are converted.
+
+Only use it for our own canonical data, read back from our own tables. Anything else must go through
+the model constructor, malformed values are not detected here and fail later.
+
+Flattened ClickHouse keys are regrouped by prefix: `app.name` into the `app` object and Nested
+sub-columns (`involves.role`: [...]) into lists of items. That regrouping is what makes `SemanticEvent.pre_init`
+expensive, event rows are built about 1.5x faster than by the constructor (benchmarks/semantic_event_pre_init.py).
+Nested input is not: pydantic-core validates it about as fast as it is built here in Python, so
+`construct_row` only takes rows. Small models (entities) are validated faster than they are built here.
+"""
+import copy
+import enum
+import typing
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Mapping, NamedTuple, Optional
+
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+
+class _Plan(NamedTuple):
+    names: dict[str, str] # Field names by name and alias
+    coercers: tuple[tuple[str, Callable[[Any], Any]], ...] # Fields whose values need a conversion
+    template: dict[str, Any] # All fields in field order, with their default (or a placeholder) as value
+    factories: tuple[tuple[str, Callable[[], Any]], ...] # Fields with a default factory or a mutable default
+    required: frozenset # Fields without a default
+    constructible: bool # False when the instances would differ from model_construct's, built with it instead
+
+
+_plans: dict[type, _Plan] = {}
+
+
+_parse_uuid = lru_cache(maxsize=65536)(uuid.UUID) # gids repeat across rows (tenants, involved entities), UUIDs are immutable
+
+
+def _uuid(value):
+    return value if isinstance(value, uuid.UUID) else _parse_uuid(value)
+
+
+def _datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if value.endswith("Z"): # Only accepted by fromisoformat from Python 3.11 on
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def _columns_to_items(columns: Mapping[str, list]) -> list[dict]:
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def _coercer(annotation) -> Optional[Callable[[Any], Any]]:
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None
+        annotation = args[0]
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return lambda value: construct_trusted(annotation, value) if isinstance(value, dict) else value
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        members = {member.value: member for member in annotation}
+        return lambda value: members.get(value, value) # Field defaults may not be members (e.g. Product.entry_type)
+    if annotation is uuid.UUID:
+        return _uuid
+    if annotation is datetime:
+        return _datetime
+    if typing.get_origin(annotation) is tuple:
+        return tuple
+    if typing.get_origin(annotation) is list:
+        coerce_item = _coercer(typing.get_args(annotation)[0])
+        if coerce_item is None:
+            return None
+
+        def coerce_list(value):
+            if isinstance(value, dict): # Flattened Nested sub-columns
+                value = _columns_to_items(value)
+            return [coerce_item(item) if item is not None else item for item in value]
+        return coerce_list
+    return None
+
+
+def _plan(model_cls: type) -> _Plan:
+    """
+    The fields of `model_cls` with the conversion their values need and their defaults (computed once per class).
+    """
+    plan = _plans.get(model_cls)
+    if plan is None:
+        names, coercers, template, factories, required = {}, [], {}, [], set()
+        for name, field in model_cls.model_fields.items():
+            names[name] = name
+            if field.alias:
+                names[field.alias] = name
+            coerce = _coercer(field.annotation)
+            if coerce is not None:
+                coercers.append((name, coerce))
+            template[name] = field.default
+            if field.default_factory is not None:
+                factories.append((name, field.default_factory))
+            elif field.default is PydanticUndefined:
+                required.add(name)
+            elif isinstance(field.default, (list, dict, set)):
+                factories.append((name, lambda default=field.default: copy.deepcopy(default)))
+        plan = _Plan(names, tuple(coercers), template, tuple(factories), frozenset(required), False)
+        plan = _plans[model_cls] = plan._replace(constructible=_builds_like_model_construct(model_cls, plan))
+    return plan
+
+
+def _builds_like_model_construct(model_cls: type, plan: _Plan) -> bool:
+    """
+    Whether the instances built from the plan are those `model_construct` builds, compared on the defaults.
+    """
+    if model_cls.__private_attributes__ or model_cls.__pydantic_post_init__ or model_cls.model_config.get("extra") == "allow":
+        return False
+    fields = {name: value for name, value in plan.template.items() if name not in plan.required}
+    fields.update((name, factory()) for name, factory in plan.factories)
+    try:
+        expected = model_cls.model_construct(set(), **fields) # Given every field, no default is resolved
+        built = _instance(model_cls, fields, set())
+        return built == expected and built.model_fields_set == expected.model_fields_set
+    except Exception:
+        return False
+
+
+def _instance(model_cls: type, fields: dict, fields_set: set):
+    instance = object.__new__(model_cls)
+    object.__setattr__(instance, "__dict__", fields)
+    object.__setattr__(instance, "__pydantic_fields_set__", fields_set)
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
+def is_row(values: Mapping[str, Any]) -> bool:
+    """
+    Whether the values are a row of our tables, with flattened keys.
+    """
+    return any("." in key for key in values)
+
+
+def construct_row(model_cls: type, values: Mapping[str, Any]):
+    """
+    Builds `model_cls` from a row of our tables (see `construct_trusted`). Other input is refused, it is
+    built as fast by the model constructor.
+    """
+    if not is_row(values):
+        raise ValueError(f"{model_cls.__name__}: trusted construction takes rows with flattened keys, "
+                         f"validate nested input with the constructor")
+    return construct_trusted(model_cls, values)
+
+
+def construct_trusted(model_cls: type, values: Mapping[str, Any]):
+    """
+    Builds `model_cls` and its nested models from trusted values without validating them.
+    Unknown keys are ignored, missing fields get their defaults.
+    """
+    plan = _plan(model_cls)
+    names = plan.names
+    data = {names[key]: value for key, value in values.items() if key in names}
+    if len(data) < len(values): # Flattened keys (or unknown ones, ignored)
+        groups = {}
+        for key, value in values.items():
+            prefix, dot, rest = key.partition(".")
+            if dot and prefix in names:
+                groups.setdefault(names[prefix], {})[rest] = value
+        data.update(groups)
+    for name, coerce in plan.coercers:
+        value = data.get(name)
+        if value is not None:
+            data[name] = coerce(value)
+
+    if not plan.constructible:
+        return model_cls.model_construct(**data)
+    instance_dict = plan.template.copy()
+    for name, factory in plan.factories:
+        if name not in data:
+            instance_dict[name] = factory()
+    instance_dict.update(data)
+    if plan.required:
+        for name in plan.required.difference(data): # Left unset, as by model_construct
+            del instance_dict[name]
+    return _instance(model_cls, instance_dict, set(data))
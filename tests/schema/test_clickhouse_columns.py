@@ -0,0 +1,86 @@
+"""
+Tests for building SemanticEvents from ClickHouse columnar results
+"""
+import unittest
+import uuid
+
+from cxs.schema.pydantic.clickhouse import NestedColumn, column_rows, split_offsets
+from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+ENTITY_GID = "4f1b2c3d-0000-4000-8000-000000000001"
+
+
+def flat_rows():
+    """
+    Rows as ClickHouse returns them, with the Nested groups flattened into array sub-columns.
+    """
+    return [
+        {
+            "type": "track", "event": "Order Completed", "timestamp": f"2024-01-01T12:00:0{idx}+00:00",
+            "entity_gid": ENTITY_GID, "event_gid": str(uuid.UUID(int=100 + idx)), "message_id": f"msg-{idx}",
+            "involves.label": [f"Customer {idx}"] * idx, "involves.role": ["Buyer"] * idx,
+            "involves.entity_type": ["Person"] * idx, "involves.entity_gid": [str(uuid.UUID(int=idx + 1))] * idx,
+            "involves.id": [f"c-{idx}"] * idx, "involves.id_type": ["CRM"] * idx, "involves.capacity": [1.0] * idx,
+            "classification.type": ["Intent"], "classification.value": [f"buy-{idx}"], "classification.reasoning": [""],
+            "classification.score": [0.5], "classification.confidence": [0.9], "classification.weight": [1.0],
+            "app.name": "orders", "app.version": "2.4.1",
+            "commerce.order_id": f"order-{idx}", "commerce.products.product_id": ["p1", "p2"],
+            "commerce.products.units": [1.0, 2.0],
+        }
+        for idx in range(3)
+    ]
+
+
+def to_columns(rows):
+    return {name: [row[name] for row in rows] for name in rows[0]}
+
+
+def dumped(events):
+    return [event.model_dump(mode="json", by_alias=True) for event in events]
+
+
+class TestFromColumns(unittest.TestCase):
+
+    def test_events_match_row_by_row_construction(self):
+        expected = dumped(SemanticEvent(**row) for row in flat_rows())
+        self.assertEqual(dumped(SemanticEvent.from_columns(to_columns(flat_rows()))), expected)
+
+        chunks = list(SemanticEvent.from_columns(to_columns(flat_rows()), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual(dumped(event for chunk in chunks for event in chunk), expected)
+
+    def test_nested_groups_are_rebuilt_per_row(self):
+        row, = list(column_rows(to_columns(flat_rows()[2:])))
+        self.assertNotIn("involves.id", row)
+        self.assertEqual([item["id"] for item in row["involves"]], ["c-2", "c-2"])
+        self.assertEqual(row["commerce.products.product_id"], ["p1", "p2"]) # Left to SemanticEvent.pre_init
+
+    def test_nested_columns_with_offsets(self):
+        self.assertEqual(split_offsets(["a", "b", "c"], [0, 1, 3]), [[], ["a"], ["b", "c"]])
+
+        columns = to_columns(flat_rows())
+        for name in [name for name in columns if name.startswith("involves.")]:
+            arrays = columns[name]
+            offsets = [sum(len(array) for array in arrays[:idx + 1]) for idx in range(len(arrays))]
+            columns[name] = NestedColumn([value for array in arrays for value in array], offsets)
+        self.assertEqual(dumped(SemanticEvent.from_columns(columns)), dumped(SemanticEvent(**row) for row in flat_rows()))
+
+    def test_events_are_built_lazily(self):
+        events = SemanticEvent.from_columns({"type": ["track", "invalid"], "event": ["A", "B"], "entity_gid": [ENTITY_GID] * 2})
+        self.assertEqual(next(events).event, "A")
+        with self.assertRaises(ValueError):
+            next(events)
+
+    def test_nested_groups_are_built_lazily(self):
+        def roles():
+            yield ["Buyer"]
+            raise AssertionError("The second row was built up front")
+
+        columns = {"type": ["track", "track"], "event": ["A", "B"], "entity_gid": [ENTITY_GID] * 2,
+                   "involves.role": roles(), "involves.id": NestedColumn(["c-1", "c-2"], [1, 2])}
+        event = next(SemanticEvent.from_columns(columns))
+        self.assertEqual([(item.role, item.id) for item in event.involves], [("Buyer", "c-1")])
+
+
+if __name__ == '__main__':
+    unittest.main()
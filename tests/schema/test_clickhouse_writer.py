@@ -0,0 +1,101 @@
+"""
+Tests for writing SemanticEvents as ClickHouse JSONCompactColumns and RowBinary payloads
+"""
+import json
+import struct
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from cxs.schema.pydantic.clickhouse_writer import ColumnarWriter, codec, model_columns, split_type
+from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+ENTITY_GID = "4f1b2c3d-0000-4000-8000-000000000001"
+
+
+def make_event(idx: int, **values) -> SemanticEvent:
+    return SemanticEvent(**{
+        "type": "track", "event": "Order Completed", "timestamp": datetime(2024, 1, 1, 12, 0, idx, tzinfo=timezone.utc),
+        "entity_gid": ENTITY_GID, "event_gid": str(uuid.UUID(int=100 + idx)), "message_id": f"msg-{idx}",
+        "app": {"name": "orders"}, "context": {"location": (-21.9, 64.1)},
+        "commerce": {"order_id": f"order-{idx}", "products": [{"entry_type": "Line Item", "product_id": "p1", "units": 1.0}]},
+        "involves": [{"role": "Buyer", "entity_gid": str(uuid.UUID(int=idx + 1))}] * idx,
+        "dimensions": {"channel": "web"}, "metrics": {"items": float(idx)},
+        **values,
+    })
+
+
+class TestColumnarWriter(unittest.TestCase):
+
+    def test_layout_flattens_objects_nested_groups_and_maps(self):
+        types = {column.name: column.type for column in model_columns(SemanticEvent)}
+        self.assertEqual(types["event_gid"], "UUID")
+        self.assertEqual(types["anonymous_gid"], "Nullable(UUID)")
+        self.assertEqual(types["os.name"], "String")
+        self.assertEqual(types["source.type"], "Nullable(String)")
+        self.assertEqual(types["context.location"], "Point")
+        self.assertEqual(types["involves.entity_gid"], "Array(Nullable(UUID))")
+        self.assertEqual(types["commerce.products.units"], "Array(Nullable(Float64))")
+        self.assertEqual(types["metrics"], "Map(String, Float64)")
+        self.assertNotIn("involves", types)
+
+    def test_json_compact_columns_read_back_with_from_columns(self):
+        events = [make_event(idx) for idx in range(3)]
+        batch = SemanticEvent.to_columns(events)
+        columns = dict(zip(batch.names, json.loads(batch.json_compact_columns())))
+        self.assertEqual(columns["timestamp"][1], "2024-01-01 12:00:01.000")
+        self.assertEqual(columns["involves.role"], [[], ["Buyer"], ["Buyer", "Buyer"]])
+
+        for event, read in zip(events, SemanticEvent.from_columns(columns)):
+            self.assertEqual(read.event_gid, event.event_gid)
+            self.assertEqual(read.context.location, (-21.9, 64.1))
+            self.assertEqual(read.commerce.products, event.commerce.products)
+            self.assertEqual(read.involves, event.involves)
+            self.assertEqual((read.dimensions, read.metrics), (event.dimensions, event.metrics))
+
+    def test_row_binary(self):
+        columns = [
+            ("event", "String"), ("event_gid", "UUID"), ("timestamp", "DateTime64(3, 'UTC')"),
+            ("importance", "Nullable(Int8)"), ("involves.role", "Array(LowCardinality(String))"),
+            ("dimensions", "Map(String, String)"), ("type", "Enum8('track' = 1, 'page' = 2)"),
+        ]
+        batch = SemanticEvent.to_columns([make_event(1)], columns=columns)
+        expected = b"".join([
+            b"\x0fOrder Completed",
+            bytes(8) + b"\x65" + bytes(7), # UUID(int=101), as two little-endian UInt64
+            struct.pack("<q", 1704110401000),
+            b"\x01", # NULL
+            b"\x01\x05Buyer",
+            b"\x01\x07channel\x03web",
+            b"\x01",
+        ])
+        self.assertEqual(batch.row_binary(), expected)
+        self.assertEqual(batch.insert_query("events").split(" FORMAT ")[1], "RowBinary")
+
+    def test_rows_are_sorted_by_the_order_by_key(self):
+        events = [make_event(idx, event=name) for idx, name in enumerate(["B", "A", "B"])]
+        batch = SemanticEvent.to_columns(events, order_by=("event", "timestamp"))
+        self.assertEqual(batch.as_dict()["message_id"], ["msg-1", "msg-0", "msg-2"])
+
+        writer = ColumnarWriter(SemanticEvent, columns=[("message_id", "String")])
+        self.assertEqual([len(batch) for batch in writer.batches(iter(events), batch_size=2)], [2, 1])
+
+    def test_unknown_columns_and_types_are_rejected(self):
+        with self.assertRaises(ValueError):
+            ColumnarWriter(SemanticEvent, columns=[("no_such_column", "String")])
+        with self.assertRaises(ValueError):
+            ColumnarWriter(SemanticEvent, columns=[("event", "Variant(String, UInt64)")])
+        with self.assertRaises(ValueError):
+            ColumnarWriter(SemanticEvent, order_by=("event",), columns=[("message_id", "String")])
+
+    def test_codecs(self):
+        self.assertEqual(split_type("Map(String, Array(Enum8('a,b' = 1)))"), ("Map", ["String", "Array(Enum8('a,b' = 1))"]))
+        self.assertEqual(codec("Enum8('Intent' = 1, 'Other' = 0)").json(None), "Other")
+        self.assertEqual(codec("Nullable(Float32)").json(None), None)
+        out = bytearray()
+        codec("String").write("x" * 200, out)
+        self.assertEqual(bytes(out[:2]), b"\xc8\x01") # LEB128 length
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for the lazy SemanticEvent views
+"""
+import copy
+import pickle
+import unittest
+import uuid
+
+from cxs.schema.pydantic.lazy import LazyModel
+from cxs.schema.pydantic.semantic_event import SemanticEvent
+
+ENTITY_GID = "4f1b2c3d-0000-4000-8000-000000000001"
+
+
+def wire_event() -> dict:
+    event = SemanticEvent(
+        type="track", event="Order Completed", timestamp="2024-01-01T12:00:00+00:00", entity_gid=ENTITY_GID,
+        message_id="msg-1", app={"name": "orders"}, traits={"email": "jane@example.com"}, metrics={"items": 2.0},
+        commerce={"order_id": "order-1", "products": [{"entry_type": "Line Item", "product_id": "p1", "units": 2.0}]},
+        location=[{"label": "Store", "country": "Iceland"}],
+    )
+    return event.model_dump(mode="json", by_alias=True, exclude_none=True)
+
+
+def dumped(event) -> dict:
+    return event.model_dump(mode="json", by_alias=True, exclude_none=True)
+
+
+class TestLazyModel(unittest.TestCase):
+
+    def test_fields_are_built_on_first_access(self):
+        event = SemanticEvent.lazy(wire_event())
+        self.assertEqual((event.event, event.metrics), ("Order Completed", {"items": 2.0}))
+        self.assertEqual(event.entity_gid, uuid.UUID(ENTITY_GID))
+        self.assertEqual(event.timestamp.year, 2024)
+        self.assertEqual(event.built_fields(), ["event", "metrics", "entity_gid", "timestamp"])
+
+        products = event.commerce.products
+        self.assertIs(event.commerce.products, products) # Cached
+        self.assertEqual(products[0].product_id, "p1")
+        with self.assertRaises(AttributeError):
+            event.no_such_field
+
+    def test_serializes_like_the_full_event(self):
+        wire = wire_event()
+        event = SemanticEvent.lazy(wire)
+        self.assertEqual(dumped(event), wire)
+
+        commerce = event.commerce
+        self.assertIs(event.model().commerce, commerce)
+        self.assertEqual(dumped(event), wire)
+
+        event.event = "Order Refunded"
+        self.assertEqual(dumped(event), {**wire, "event": "Order Refunded"})
+
+    def test_lazy_rows_from_columns(self):
+        columns = {
+            "type": ["track"], "event": ["Order Completed"], "timestamp": ["2024-01-01 12:00:00.000"],
+            "entity_gid": [ENTITY_GID], "event_gid": [str(uuid.UUID(int=1))], "app.name": ["orders"],
+            "involves.role": [["Buyer", "Seller"]], "involves.id": [["c-1", "c-2"]],
+        }
+        event, = SemanticEvent.from_columns(columns, lazy=True)
+        self.assertIsInstance(event, LazyModel)
+        self.assertEqual([(item.role, item.id) for item in event.involves], [("Buyer", "c-1"), ("Seller", "c-2")])
+        self.assertEqual(event.app.name, "orders")
+
+        row = {name: values[0] for name, values in columns.items()}
+        self.assertEqual(dumped(event), dumped(SemanticEvent.from_trusted(row)))
+
+    def test_copies_and_pickles(self):
+        wire = wire_event()
+        event = SemanticEvent.lazy(wire)
+        event.metrics # Built before copying
+        for other in (copy.copy(event), copy.deepcopy(event), pickle.loads(pickle.dumps(event))):
+            self.assertEqual(other.built_fields(), ["metrics"])
+            self.assertEqual(other.event, "Order Completed")
+            self.assertEqual(dumped(other), wire)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,8 @@ import unittest
 import pytest
 from datetime import datetime, timezone
 
-from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType, SourceInfo
+from cxs.schema.pydantic.base import omit_if_none_fields
+from cxs.schema.pydantic.semantic_event import SemanticEvent, EventType, SourceInfo, Involved, Commerce
 from cxs.schema.pydantic.entity import Entity
 
 class TestPydanticModels(unittest.TestCase):
@@ -24,6 +25,84 @@ class TestPydanticModels(unittest.TestCase):
         self.assertEqual(event.type, EventType.track)
         self.assertEqual(event.event, "Test Event")
     
+    def test_semantic_event_from_flattened_keys(self):
+        """Test rebuilding the context objects from flattened ClickHouse keys"""
+        event = SemanticEvent(**{
+            "type": "track", "event": "Order Completed", "timestamp": "2024-01-01T12:00:00+00:00",
+            "entity_gid": "4f1b2c3d-0000-4000-8000-000000000001",
+            "app.name": "orders", "context.location.longitude": "-21.9", "context.location.latitude": "64.1",
+            "user_agent.platform": "macOS", "user_agent.data.brand": "Chrome", "user_agent.data.version": "120",
+            "commerce.order_id": "order-1", "commerce.products.product_id": ["p1", "p2"], "commerce.products.units": [1.0, 2.0],
+        })
+        self.assertEqual(event.app.name, "orders")
+        self.assertEqual(event.context.location, (-21.9, 64.1))
+        self.assertEqual(event.user_agent.platform, "macOS")
+        self.assertEqual(event.commerce.exchange_rate, 1.0)
+        self.assertEqual([(p.product_id, p.units) for p in event.commerce.products], [("p1", 1.0), ("p2", 2.0)])
+
+    def test_omit_if_none_fields_are_cached_per_class(self):
+        """Test the OmitIfNone fields are computed once per class and still omitted when empty"""
+        self.assertIs(omit_if_none_fields(Involved), omit_if_none_fields(Involved))
+        self.assertIn("capacity", omit_if_none_fields(Involved))
+        self.assertNotIn("exchange_rate", omit_if_none_fields(Commerce))
+
+        dumped = Involved(label="Jane Doe", role="Buyer", id="c-1", capacity=None).model_dump()
+        self.assertEqual(dumped, {"label": "Jane Doe", "role": "Buyer", "id": "c-1"})
+        self.assertEqual(Commerce(exchange_rate=0.0).model_dump(), {"exchange_rate": 0.0}) # Not OmitIfNone, kept when falsy
+
+    def test_semantic_event_from_trusted(self):
+        """Test building events from rows of our own tables without validation"""
+        event = SemanticEvent(
+            type="track", event="Order Completed", timestamp="2024-01-01T12:00:00+00:00",
+            entity_gid="4f1b2c3d-0000-4000-8000-000000000001", event_gid="4f1b2c3d-0000-4000-8000-000000000003",
+            app={"name": "orders"}, os={"name": "Linux"}, commerce={"products": [{"product_id": "p1", "units": 1.0}, {"product_id": "p2", "units": 2.0}]},
+            involves=[{"role": "Buyer", "id": "c-1", "entity_gid": "4f1b2c3d-0000-4000-8000-000000000002"}],
+        )
+        row = SemanticEvent.from_trusted({
+            "type": "track", "event": "Order Completed", "timestamp": "2024-01-01T12:00:00Z",
+            "entity_gid": "4f1b2c3d-0000-4000-8000-000000000001", "event_gid": "4f1b2c3d-0000-4000-8000-000000000003",
+            "app.name": "orders", "os.name": "Linux", "commerce.products.product_id": ["p1", "p2"],
+            "commerce.products.units": [1.0, 2.0], "involves.role": ["Buyer"], "involves.id": ["c-1"],
+            "involves.entity_gid": ["4f1b2c3d-0000-4000-8000-000000000002"],
+        })
+        self.assertEqual(row.type, EventType.track)
+        self.assertEqual(row.timestamp, event.timestamp) # "Z" parsed on every supported Python version
+        self.assertEqual((row.app.name, row.os.name), ("orders", "Linux"))
+        self.assertEqual([(p.product_id, p.units) for p in row.commerce.products], [("p1", 1.0), ("p2", 2.0)])
+        self.assertEqual([(i.role, i.id) for i in row.involves], [("Buyer", "c-1")])
+        self.assertEqual(row.involves[0].entity_gid, event.involves[0].entity_gid)
+        self.assertEqual(row.model_dump(mode="json", by_alias=True, exclude_none=True)["commerce"],
+                         event.model_dump(mode="json", by_alias=True, exclude_none=True)["commerce"])
+
+        with self.assertRaises(ValueError): # Nested input validates about as fast, it is left to the constructor
+            SemanticEvent.from_trusted(event.model_dump(mode="json", by_alias=True, exclude_none=True))
+
+    def test_trusted_instances_match_model_construct(self):
+        """Test trusted construction builds what model_construct builds, or falls back to it"""
+        from pydantic import BaseModel, PrivateAttr
+        from cxs.schema.pydantic.trusted import _plan, construct_trusted
+
+        class WithPrivate(BaseModel):
+            name: str = ""
+            _cache: dict = PrivateAttr(default_factory=dict)
+
+        self.assertTrue(_plan(SemanticEvent).constructible)
+        self.assertFalse(_plan(WithPrivate).constructible)
+        self.assertEqual(construct_trusted(WithPrivate, {"name": "x"})._cache, {})
+        row = {"type": "track", "event": "Order Completed", "app.name": "orders"}
+        self.assertEqual(construct_trusted(SemanticEvent, row), SemanticEvent.model_construct(
+            type=EventType.track, event="Order Completed", app=construct_trusted(SemanticEvent, row).app))
+
+    def test_entity_from_trusted(self):
+        """Test building entities from rows of our own tables without validation"""
+        entity = Entity(gid_url="https://example.com/entities/test-entity-id", label="Test Entity", type="test-type",
+                        ids=[{"id": "e-1", "id_type": "CRM"}])
+        trusted = Entity.from_trusted({"gid_url": entity.gid_url, "gid": str(entity.gid), "label": "Test Entity",
+                                       "type": "test-type", "ids.id": ["e-1"], "ids.id_type": ["CRM"], "ids.label": ["e-1"]})
+        self.assertEqual(trusted.gid, entity.gid)
+        self.assertEqual((trusted.ids[0].id, trusted.ids[0].id_type), ("e-1", "CRM"))
+        self.assertEqual(trusted.model_dump(mode="json")["ids"], entity.model_dump(mode="json")["ids"])
+
     def test_entity_basic(self):
         """Test creating a basic entity"""
         entity = Entity(